@@ -0,0 +1,189 @@
+# app/async_api.py
+# async def versions of issue / verify / status under /async/*.
+#
+# Same request/response shapes as app.main. Nothing here holds a threadpool
+# worker while waiting: DB I/O goes through the async engine (app.async_db),
+# QR rendering runs in the default executor, printing goes to the print queue
+# or the asyncio printer client (app.async_printer); with WORKERS > 1 the
+# shared queue's DB insert runs in a worker thread.
+#
+# Verification always uses the single-statement atomic consume
+# (app.atomic_verify) - one awaited round trip per allowed scan - unless the
+# hot token index is running (VERIFY_MODE="index").
+
+from datetime import datetime, timezone
+import asyncio
+
+from fastapi import APIRouter, BackgroundTasks, Form
+from sqlalchemy import insert, select
+
+from app import (async_printer, atomic_verify, image_store, metrics, print_dispatch, print_queue, qr_render,
+                 scan_analytics, scan_log_sink, token_index)
+from app.async_db import AsyncSessionLocal, async_engine
+from app.config import settings
+from app.models import QRToken, ScanLog
+from app.tickets import POOLED, expiry_local_str, gate_of, qr_payload, split_payload, ticket_info, token_row
+
+router = APIRouter(prefix="/async", tags=["async"])
+
+_printer_link: async_printer.AsyncPrinterLink | None = None
+_tasks: set[asyncio.Task] = set()     # keep fire-and-forget prints alive
+
+
+def _submit(queue, payload: str, info: dict):
+    if queue.submit(payload, info) is None:
+        print("Printer error: print queue full")
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def _dispatch_print(payload: str, info: dict):
+    global _printer_link
+    queue = print_queue.queue
+    if isinstance(queue, print_dispatch.SharedPrintQueue):     # submit() is a DB round trip
+        _spawn(asyncio.to_thread(_submit, queue, payload, info))
+        return
+    if queue is not None:                                       # in-memory enqueue
+        _submit(queue, payload, info)
+        return
+    if _printer_link is None:
+        _printer_link = async_printer.AsyncPrinterLink(settings.PRINTER_HOST, settings.PRINTER_PORT,
+                                                       timeout=settings.PRINTER_TIMEOUT_SEC)
+    _spawn(async_printer.print_ticket(_printer_link, payload, info))
+
+
+async def _log_scan(token: str | None, result: str, user_hint: str | None = None, gate: str | None = None):
+    metrics.scan_result(result)
+    if scan_log_sink.sink is not None:
+        scan_log_sink.sink.put(token or "", result, user_hint or "", gate)
+        return
+    rows = [{"token": token or "", "result": result, "user_hint": user_hint or "", "gate": gate,
+             "ts": datetime.utcnow()}]
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(ScanLog), rows)
+        await db.execute(scan_analytics.rollup_upsert(async_engine.dialect.name),
+                         scan_analytics.rollup_params(rows))
+        await db.commit()
+
+
+# ---------- Issue ----------
+@router.post("/qr/issue")
+async def issue_qr_async(
+    employee_id: str | None = Form(None),
+    full_name:   str | None = Form(None),
+    email:       str | None = Form(None),
+    role:        str | None = Form(None),
+    department:  str | None = Form(None),
+    minutes_valid: int = Form(60),    # 0 = no expiry
+    max_scans:     int = Form(2),     # >=1
+    background: BackgroundTasks = None,
+):
+    row, exp = token_row(datetime.now(timezone.utc), minutes_valid, max_scans, {
+        "employee_id": employee_id,
+        "full_name": full_name,
+        "email": email,
+        "role": role,
+        "department": department,
+    })
+    token = row["token"]
+    payload = qr_payload(token, row["expires_at"], max_scans)
+
+    # render while the INSERT is in flight
+    png_job = asyncio.get_running_loop().run_in_executor(None, qr_render.cached_png, payload)
+    async with AsyncSessionLocal() as db:
+        with metrics.stage("db_insert"):
+            db.add(QRToken(**row))
+            await db.commit()
+    png = await png_job
+    if token_index.index is not None:
+        token_index.index.put(row)
+
+    print_info = ticket_info(row, expiry_local_str(exp))
+    _dispatch_print(payload, print_info)
+
+    img_path = image_store.store.path(token) if settings.QR_SAVE_PNG else None
+    if img_path is not None:
+        if background is not None:
+            background.add_task(image_store.store.write, token, png)   # runs in the threadpool
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, image_store.store.write, token, png)
+
+    return {
+        "ok": True,
+        "token": token,
+        "payload": payload,
+        "png_path": str(img_path) if img_path else None,
+        "qr_b64": qr_render.png_b64(png),
+        "print_info": print_info,
+    }
+
+
+# ---------- Verify ----------
+@router.post("/qr/verify")
+@metrics.timed("verify")
+async def verify_qr_async(payload: dict):
+    token, reason = split_payload(payload.get("payload", ""))
+    gate = gate_of(payload)
+    if reason:
+        await _log_scan(token, f"denied:{reason}", gate=gate)
+        return {"ok": False, "reason": reason}
+
+    index = token_index.index
+    if index is not None:
+        if token in index:
+            body, result, hint = index.verify(token)        # memory only
+        else:
+            body, result, hint = await asyncio.get_running_loop().run_in_executor(None, index.verify, token)
+        await _log_scan(token, result, hint, gate)
+        return body
+
+    now = atomic_verify.utcnow_naive()
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(atomic_verify.consume_stmt(token, now))).first()
+        await db.commit()
+        if row:
+            body, result, hint = atomic_verify.allowed(row)
+        else:
+            rec = (await db.execute(atomic_verify.lookup_stmt(token))).first()
+            body, result, hint, flip = atomic_verify.denial(rec, now)
+            if flip:
+                await db.execute(atomic_verify.passivate_stmt(token))
+                await db.commit()
+    await _log_scan(token, result, hint, gate)
+    return body
+
+
+# ---------- Status ----------
+@router.get("/qr/status/{token}")
+async def qr_status_async(token: str):
+    async with AsyncSessionLocal() as db:
+        rec = (await db.execute(
+            select(QRToken).where(QRToken.token == token, QRToken.status.is_distinct_from(POOLED))
+        )).scalar_one_or_none()
+    if not rec:
+        return {"ok": False, "reason": "not_found"}
+    return {
+        "ok": True,
+        "status": rec.status,
+        "scan_count": rec.scan_count,
+        "max_scans": rec.max_scans,
+        "expires_at": rec.expires_at.isoformat() if rec.expires_at else None,
+        "employee_id": rec.employee_id,
+        "full_name": rec.full_name,
+        "role": rec.role,
+        "department": rec.department,
+    }
+
+
+async def shutdown():
+    """Close the asyncio printer connection and the async engine's pool."""
+    from app.async_db import async_engine
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+    if _printer_link is not None:
+        await _printer_link.close()
+    await async_engine.dispose()
@@ -0,0 +1,34 @@
+# app/async_db.py
+# Async engine for app.async_api (same database as app.db, async driver).
+# Needs aiosqlite (SQLite) or asyncpg (PostgreSQL).
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.db import apply_sqlite_profile, engine_kwargs
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+psycopg",   # psycopg 3 does both
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    """sqlite:///./app.db -> sqlite+aiosqlite:///./app.db (etc.)"""
+    scheme, rest = url.split("://", 1)
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+_url = settings.ASYNC_DB_URL or async_url(settings.DB_URL)
+_kwargs = engine_kwargs(_url)
+if _url.startswith("sqlite"):
+    _kwargs.pop("connect_args", None)    # aiosqlite keeps each connection on its own thread
+async_engine = create_async_engine(_url, **_kwargs)
+
+if async_engine.dialect.name == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_profile)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
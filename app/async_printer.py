@@ -0,0 +1,59 @@
+# app/async_printer.py
+# asyncio-native ESC/POS client for the async API when the threaded print
+# queue is off (PRINT_QUEUE=false): one persistent StreamWriter per printer,
+# writes serialised with a lock, reconnect once on a broken connection.
+# With the print queue on, the async API submits to it instead - a printer
+# should only ever have one connection feeding it.
+
+import asyncio
+
+from app import metrics
+from app.printer import render_ticket
+
+
+class AsyncPrinterLink:
+    def __init__(self, host: str, port: int, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        _, self._writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+
+    async def send(self, data: bytes):
+        async with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._writer is None or self._writer.is_closing():
+                        with metrics.stage("print_connect"):
+                            await self._connect()
+                    with metrics.stage("print_send"):
+                        self._writer.write(data)
+                        await asyncio.wait_for(self._writer.drain(), self.timeout)
+                    return
+                except (OSError, asyncio.TimeoutError):
+                    await self.close()
+                    if attempt == 2:
+                        raise
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._writer = None
+
+
+async def print_ticket(link: AsyncPrinterLink, payload: str, info: dict) -> bool:
+    """Render off the event loop, send on it. Returns True if printed."""
+    try:
+        data = await asyncio.get_running_loop().run_in_executor(None, render_ticket, payload, info)
+        await link.send(data)
+        return True
+    except Exception as e:
+        print("Printer error:", e)
+        return False
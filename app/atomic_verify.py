@@ -0,0 +1,90 @@
+# app/atomic_verify.py
+# Race-free scan consumption for /qr/verify (settings.VERIFY_MODE = "atomic").
+#
+# One conditional UPDATE both checks and consumes the scan, so two turnstiles
+# reading the same pass at the same moment cannot both get through a
+# max_scans=1 token. The denial reason is only worked out when the UPDATE
+# matched nothing (the rare path).
+#
+# The statements are plain SQLAlchemy Core, shared with the async path
+# (app.async_api), which awaits the same statements on an AsyncSession.
+
+from datetime import datetime, timezone
+
+from sqlalchemy import case, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models import QRToken
+from app.tickets import POOLED
+
+_t = QRToken.__table__
+
+
+def utcnow_naive(now: datetime | None = None) -> datetime:
+    return (now or datetime.now(timezone.utc)).replace(tzinfo=None)   # naive UTC, as stored
+
+
+def consume_stmt(token: str, now: datetime):
+    """UPDATE ... SET scan_count = scan_count + 1 WHERE <still usable> RETURNING ..."""
+    return (
+        update(_t)
+        .where(
+            _t.c.token == token,
+            _t.c.status == "active",
+            _t.c.scan_count < _t.c.max_scans,
+            or_(_t.c.expires_at.is_(None), _t.c.expires_at >= now),
+        )
+        .values(
+            scan_count=_t.c.scan_count + 1,
+            status=case((_t.c.scan_count + 1 >= _t.c.max_scans, "passive"), else_=_t.c.status),
+        )
+        .returning(_t.c.scan_count, _t.c.status, _t.c.employee_id, _t.c.full_name)
+    )
+
+
+def allowed(row):
+    return {"ok": True, "scan_count": row[0], "status": row[1]}, "allowed", row[2] or row[3] or ""
+
+
+def lookup_stmt(token: str):
+    return (select(_t.c.status, _t.c.expires_at, _t.c.scan_count, _t.c.max_scans)
+            .where(_t.c.token == token, _t.c.status.is_distinct_from(POOLED)))   # pooled = not handed out
+
+
+def passivate_stmt(token: str):
+    return update(_t).where(_t.c.token == token, _t.c.status == "active").values(status="passive")
+
+
+def denial(rec, now: datetime):
+    """
+    Reason for a failed consume, from lookup_stmt's row.
+    -> (response_body, scan_log_result, user_hint, flip_to_passive)
+    """
+    if not rec:
+        return {"ok": False, "reason": "not_found"}, "denied:not_found", None, False
+
+    status, expires_at, scan_count, max_scans = rec
+    if status != "active":
+        return {"ok": False, "reason": "passive"}, "denied:passive", None, False
+
+    # still "active" but unusable: flip it to passive like the classic path does
+    if expires_at and now > expires_at:
+        return {"ok": False, "reason": "expired"}, "denied:expired", None, True
+    return {"ok": False, "reason": "max_scans_reached"}, "denied:max_scans_reached", None, True
+
+
+def consume_scan(db: Session, token: str, now: datetime | None = None):
+    """
+    Same rules as verify_qr. Returns (response_body, scan_log_result, user_hint).
+    """
+    now = utcnow_naive(now)
+    row = db.execute(consume_stmt(token, now)).first()
+    db.commit()
+    if row:
+        return allowed(row)
+
+    body, result, hint, flip = denial(db.execute(lookup_stmt(token)).first(), now)
+    if flip:
+        db.execute(passivate_stmt(token))
+        db.commit()
+    return body, result, hint
@@ -0,0 +1,136 @@
+# app/batch_verify.py
+# /qr/verify/batch - many scans from a multi-lane gate controller per request.
+#
+# All tokens are read with ONE "WHERE token IN (...)" and decided in request
+# order against in-memory copies of the rows, so a token that appears twice
+# behaves exactly like two sequential /qr/verify calls (max_scans=1: first
+# allowed, second denied:passive). State changes and scan logs are written
+# in the same transaction.
+#
+# Concurrency: the rows are read FOR UPDATE where the database supports it,
+# and the write-back is guarded (WHERE scan_count = <read> AND status = <read>).
+# If another verify got in between (guard miss, or SQLite refusing to upgrade
+# a stale read snapshot), the batch is rolled back and decided again.
+
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app import metrics, scan_analytics, scan_log_sink, token_index
+from app.models import QRToken, ScanLog
+from app.tickets import POOLED
+
+BATCH_VERIFY_MAX = 500
+RETRIES = 3
+
+_t = QRToken.__table__
+
+_write_back = (
+    update(_t)
+    .where(_t.c.id == bindparam("_id"), _t.c.scan_count == bindparam("_c0"),
+           _t.c.status == bindparam("_s0"))
+    .values(scan_count=bindparam("c"), status=bindparam("s"))
+)
+
+
+class _Conflict(Exception):
+    pass
+
+
+def _decide(rec: dict | None, now: datetime):
+    """verify_qr's rules on a row dict (mutated). -> (body, scan_log_result, user_hint)"""
+    if rec is None:
+        return {"ok": False, "reason": "not_found"}, "denied:not_found", None
+    if rec["status"] != "active":
+        return {"ok": False, "reason": "passive"}, "denied:passive", None
+    if rec["expires_at"] and now > rec["expires_at"]:
+        rec["status"] = "passive"
+        return {"ok": False, "reason": "expired"}, "denied:expired", None
+    if rec["scan_count"] >= rec["max_scans"]:
+        rec["status"] = "passive"
+        return {"ok": False, "reason": "max_scans_reached"}, "denied:max_scans_reached", None
+    rec["scan_count"] += 1
+    if rec["scan_count"] >= rec["max_scans"]:
+        rec["status"] = "passive"
+    return ({"ok": True, "scan_count": rec["scan_count"], "status": rec["status"]},
+            "allowed", rec["hint"])
+
+
+def _load(db: Session, tokens: set[str]) -> dict[str, dict]:
+    rows = db.execute(
+        select(_t.c.id, _t.c.token, _t.c.status, _t.c.expires_at, _t.c.scan_count,
+               _t.c.max_scans, _t.c.employee_id, _t.c.full_name)
+        .where(_t.c.token.in_(tokens), _t.c.status.is_distinct_from(POOLED))
+        .with_for_update()
+    ).all()
+    return {
+        r.token: {"id": r.id, "status": r.status or "active", "expires_at": r.expires_at,
+                  "scan_count": r.scan_count or 0, "max_scans": r.max_scans or 1,
+                  "hint": r.employee_id or r.full_name or "",
+                  "_c0": r.scan_count, "_s0": r.status}
+        for r in rows
+    }
+
+
+def _decide_all(db: Session, items, now: datetime):
+    """One attempt: read, decide, write back + log. Raises _Conflict on a lost race."""
+    recs = _load(db, {t for t, reason in items if not reason})
+    out = []
+    for token, reason in items:
+        if reason:
+            out.append(({"ok": False, "reason": reason}, f"denied:{reason}", None))
+        else:
+            out.append(_decide(recs.get(token), now))
+
+    changed = [{"_id": r["id"], "_c0": r["_c0"], "_s0": r["_s0"],
+                "c": r["scan_count"], "s": r["status"]}
+               for r in recs.values() if (r["scan_count"], r["status"]) != (r["_c0"], r["_s0"])]
+    if changed:
+        res = db.execute(_write_back, changed)
+        if db.get_bind().dialect.supports_sane_multi_rowcount and res.rowcount != len(changed):
+            raise _Conflict()
+    return out
+
+
+def _log(db: Session, items, decisions, gate: str | None):
+    ts = datetime.utcnow()
+    rows = [{"token": token or "", "result": result, "user_hint": hint or "", "gate": gate, "ts": ts}
+            for (token, _), (_, result, hint) in zip(items, decisions)]
+    for r in rows:
+        metrics.scan_result(r["result"])
+    if scan_log_sink.sink is not None:
+        for r in rows:
+            scan_log_sink.sink.put(r["token"], r["result"], r["user_hint"], gate)
+    elif rows:
+        db.execute(insert(ScanLog), rows)
+        scan_analytics.record_rollup(db, rows)
+
+
+def verify_batch(db: Session, items: list[tuple[str | None, str | None]],
+                 now: datetime | None = None, gate: str | None = None) -> list[dict]:
+    """
+    items = [(token, denial_reason_or_None)] as returned by tickets.split_payload.
+    gate = scanner id stored with the scan logs.
+    Returns one response body per item, in order.
+    """
+    now = (now or datetime.now(timezone.utc)).replace(tzinfo=None)   # naive UTC, as stored
+
+    if token_index.index is not None:      # decisions in memory; index serialises them
+        decisions = [({"ok": False, "reason": reason}, f"denied:{reason}", None) if reason
+                     else token_index.index.verify(token, now) for token, reason in items]
+        _log(db, items, decisions, gate)
+        db.commit()
+        return [body for body, _, _ in decisions]
+
+    for attempt in range(RETRIES + 1):
+        try:
+            decisions = _decide_all(db, items, now)
+            _log(db, items, decisions, gate)
+            db.commit()
+            return [body for body, _, _ in decisions]
+        except (_Conflict, OperationalError):
+            db.rollback()
+            if attempt == RETRIES:
+                raise
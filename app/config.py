@@ -1,12 +1,114 @@
 # app/config.py
 # Central place for simple settings
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 
+class PrinterConfig(BaseModel):
+    name: str | None = None
+    host: str
+    port: int = 9100
+    weight: float = 1.0             # relative share of the load
+    department: str | None = None   # affinity: tickets whose Bölüm matches
+    role: str | None = None         # affinity: tickets whose Görev matches
+
 class Settings(BaseSettings):
     DB_URL: str = "sqlite:///./app.db"      # DB file in project root
+    ASYNC_DB_URL: str | None = None         # /async/* API; default = DB_URL with an async driver
+
+    # SQLite performance profile, applied on every new connection (app/db.py)
+    DB_PROFILE: str = "wal"                 # default | wal
+    DB_JOURNAL_MODE: str | None = None      # per-pragma overrides of the profile
+    DB_SYNCHRONOUS: str | None = None
+    DB_BUSY_TIMEOUT_MS: int | None = None
+    DB_MMAP_SIZE: int | None = None
+    DB_CACHE_SIZE: int | None = None
+    # connection pool: ~ turnstiles + web UI workers hitting the DB at once
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SEC: float = 30.0       # wait for a free pooled connection
+    # server databases (PostgreSQL) only, see app/db.py
+    DB_POOL_RECYCLE_SEC: int = 1800         # reconnect before the server / proxy drops idle conns
+    DB_STATEMENT_TIMEOUT_MS: int | None = None
     ISSUER_NAME: str = "BenimGiriş"
 
+    # /qr/verify decision path:
+    #   "auto"  - "atomic" on a server database or with WORKERS > 1, else "db"
+    #   "db"    - read/modify/commit qr_tokens per scan
+    #   "index" - in-memory hot index, async write-back (single worker only,
+    #             see app/token_index.py)
+    #   "atomic" - one conditional UPDATE ... RETURNING per scan, no
+    #             read-modify-write race (see app/atomic_verify.py)
+    VERIFY_MODE: str = "auto"
+    INDEX_FLUSH_MS: int = 200               # index write-back interval
+
+    # scan_logs write-behind buffer (see app/scan_log_sink.py)
+    SCANLOG_BUFFERED: bool = True
+    SCANLOG_FLUSH_MS: int = 250             # flush at least this often...
+    SCANLOG_BATCH: int = 200                # ...or when this many rows are waiting
+    SCANLOG_QUEUE_MAX: int = 10000
+    SCANLOG_POLICY: str = "drop"            # drop | block (when the queue is full)
+    SCANLOG_BLOCK_MS: int = 50              # max wait for "block"
+
+    # Expiry sweeper + retention (see app/expiry_sweeper.py)
+    EXPIRY_SWEEP_SEC: int = 60              # mark expired tokens passive; 0 = off
+    EXPIRY_SWEEP_BATCH: int = 500           # rows per UPDATE / archive transaction
+    RETENTION_DAYS: float = 0               # move older passive tokens + scan logs out; 0 = keep
+    RETENTION_MODE: str = "archive"         # archive (to *_archive tables) | purge
+    PRINT_JOBS_KEEP_HOURS: float = 24       # finished print_jobs rows (WORKERS > 1); 0 = keep
+
+    # Signed payloads (ISSUER|token|exp|max|sig, see app/signed_payload.py) that
+    # scanners can validate offline; empty = plain ISSUER|token payloads
+    QR_SIGNING_KEY: str = ""
+
+    # QR images: /qr/png/{token} renders on demand, so the per-token PNG file is optional
+    QR_SAVE_PNG: bool = True
+    IMAGE_DIR: str = "qr_images"            # sharded store, see app/image_store.py
+    IMAGE_SWEEP_SEC: int = 3600             # retention pass interval; 0 = off
+    IMAGE_PACK_AFTER_DAYS: float = 0        # pack older loose images into archive.zip; 0 = off
+
+    # ESC/POS network printer + print queue (see app/print_queue.py)
+    PRINTER_HOST: str = "192.168.2.169"
+    PRINTER_PORT: int = 9100
+    PRINTER_TIMEOUT_SEC: float = 5.0
+    PRINT_QR_MODE: str = "bitmap"           # bitmap | native (printer-side QR, GS ( k)
+    # bitmap QR as: raster (GS v 0, packed with NumPy when installed) | column (ESC *, older printers)
+    PRINT_BITMAP: str = "raster"
+    # Several printers (JSON list of PrinterConfig); empty = just PRINTER_HOST/PORT
+    #   PRINTERS='[{"host": "192.168.2.169"}, {"host": "192.168.2.170", "department": "HR"}]'
+    PRINTERS: list[PrinterConfig] = []
+    PRINT_QUEUE: bool = True                # False = connect per ticket in BackgroundTasks
+    PRINT_QUEUE_MAX: int = 500
+    PRINT_RETRIES: int = 3
+    PRINT_BACKOFF_MS: int = 500             # doubles per retry
+    PRINT_BREAKER_THRESHOLD: int = 3        # consecutive failures before failing fast
+    PRINT_BREAKER_RESET_SEC: float = 30.0
+
+    # Startup warm-ups (see app/warmup.py): background | blocking | off
+    WARMUP: str = "background"
+
+    # GET /metrics: stage timers + verify outcome counters (see app/metrics.py)
+    METRICS: bool = True
+
+    # Processes sharing DB_URL and IMAGE_DIR (uvicorn --workers x gate hosts).
+    # > 1: atomic verify, printers and sweepers run by the holder of a DB lease
+    # (see app/leases.py, app/print_dispatch.py)
+    WORKERS: int = 1
+    LEASE_TTL_SEC: float = 15               # a dead holder's printers move on after this
+    PRINT_POLL_MS: int = 200                # lease holder polls print_jobs this often
+
+    # Pre-issued tokens for /qr/issue, QR rendered ahead (see app/token_pool.py)
+    TOKEN_POOL_HIGH: int = 0                # tokens kept ready per worker; 0 = off
+    TOKEN_POOL_LOW: int = 0                 # refill (up to HIGH) below this; default HIGH / 4
+    TOKEN_POOL_BATCH: int = 50              # rows per refill INSERT
+    TOKEN_POOL_IDLE_MS: int = 250           # refill only after this long without an issue
+
 settings = Settings()
+if settings.VERIFY_MODE == "auto":
+    settings.VERIFY_MODE = "db" if settings.DB_URL.startswith("sqlite") and settings.WORKERS == 1 else "atomic"
+elif settings.WORKERS > 1 and settings.VERIFY_MODE != "atomic":
+    # "db" reads then writes, "index" decides in process memory: both over-admit across processes
+    print(f"VERIFY_MODE={settings.VERIFY_MODE} is single-process; using atomic (WORKERS={settings.WORKERS})")
+    settings.VERIFY_MODE = "atomic"
 
 # Your local timezone for display/printing
 TIMEZONE = "Europe/Istanbul"
\ No newline at end of file
@@ -1,14 +1,117 @@
-import os
-
-# Always keep the DB in the root folder (F:\gate-entry-system\app.db)
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(BASE_DIR, "app.db")
-
 # app/db.py
-from sqlalchemy import create_engine
+# Engine + sessions for whatever DB_URL points at (SQLite file by default,
+# PostgreSQL for several gate nodes sharing one database).
+#
+#   SQLite      connections cross threadpool threads (check_same_thread off),
+#               storage profile pragmas on connect (see below)
+#   PostgreSQL  pool_pre_ping (survive server restarts / idle-killed
+#               connections), pool_recycle, optional statement_timeout so a
+#               stuck query fails a scan fast instead of holding the gate
+#
+# Every app process has its own pool of DB_POOL_SIZE + DB_MAX_OVERFLOW
+# connections: size it so nodes x workers x pool stays under the server's
+# max_connections (or put PgBouncer in front).
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import settings
 
-engine = create_engine(settings.DB_URL, connect_args={"check_same_thread": False})
+# ---------- SQLite storage profiles (settings.DB_PROFILE) ----------
+# "default": SQLite's own defaults (rollback journal, synchronous=FULL):
+#            every writer blocks all readers.
+# "wal":     readers never block the writer and vice versa; synchronous=NORMAL
+#            only fsyncs at checkpoints (safe against app crashes; a power cut
+#            can lose the last few commits, never corrupt the file).
+SQLITE_PROFILES = {
+    "default": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,          # ms to wait on a lock instead of failing
+        "mmap_size": 268435456,        # 256 MB memory-mapped reads
+        "cache_size": -65536,          # 64 MB page cache (negative = KiB)
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def sqlite_pragmas() -> dict:
+    """Profile pragmas with any DB_* overrides from settings applied."""
+    pragmas = dict(SQLITE_PROFILES.get(settings.DB_PROFILE, {}))
+    overrides = {
+        "journal_mode": settings.DB_JOURNAL_MODE,
+        "synchronous": settings.DB_SYNCHRONOUS,
+        "busy_timeout": settings.DB_BUSY_TIMEOUT_MS,
+        "mmap_size": settings.DB_MMAP_SIZE,
+        "cache_size": settings.DB_CACHE_SIZE,
+    }
+    pragmas.update({k: v for k, v in overrides.items() if v is not None})
+    return pragmas
+
+
+def _sqlite_memory(u) -> bool:
+    """sqlite:// , sqlite:///:memory: or a mode=memory URI."""
+    db = u.database or ""
+    return db in ("", ":memory:") or db.startswith("file::memory:") or u.query.get("mode") == "memory"
+
+
+def engine_kwargs(url: str) -> dict:
+    """create_engine / create_async_engine options for the backend and driver in url."""
+    u = make_url(url)
+    backend, driver = u.get_backend_name(), u.get_driver_name()
+    kw = {}
+    if not (backend == "sqlite" and _sqlite_memory(u)):
+        # in-memory SQLite gets a one-connection pool that rejects these
+        kw.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW,
+                  pool_timeout=settings.DB_POOL_TIMEOUT_SEC)
+    if backend == "sqlite":
+        # sessions are created in one threadpool thread and may be used/closed in another
+        kw["connect_args"] = {"check_same_thread": False}
+        return kw
+
+    kw["pool_pre_ping"] = True
+    kw["pool_recycle"] = settings.DB_POOL_RECYCLE_SEC
+    if backend == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        ms = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        kw["connect_args"] = ({"server_settings": {"statement_timeout": ms}} if driver == "asyncpg"
+                              else {"options": f"-c statement_timeout={ms}"})
+    return kw
+
+
+def apply_sqlite_profile(dbapi_conn, _record=None):
+    """"connect" event hook: set the profile pragmas on a new DB-API connection."""
+    cur = dbapi_conn.cursor()
+    for name, value in sqlite_pragmas().items():
+        cur.execute(f"PRAGMA {name}={value}")
+    cur.close()
+
+
+def make_engine(url: str):
+    eng = create_engine(url, **engine_kwargs(url))
+    if eng.dialect.name == "sqlite":
+        event.listen(eng, "connect", apply_sqlite_profile)
+    return eng
+
+
+engine = make_engine(settings.DB_URL)
+
+
+def storage_report() -> dict:
+    """Effective storage settings, as read back from a live connection (for /health)."""
+    report = {"backend": engine.dialect.name, "pool_size": settings.DB_POOL_SIZE,
+              "max_overflow": settings.DB_MAX_OVERFLOW, "pool": engine.pool.status()}
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            report["profile"] = settings.DB_PROFILE
+            for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size"):
+                report[name] = conn.execute(text(f"PRAGMA {name}")).scalar()
+        elif engine.dialect.name == "postgresql":
+            report["server_version"] = ".".join(map(str, conn.dialect.server_version_info or ()))
+            for name in ("max_connections", "statement_timeout"):
+                report[name] = conn.execute(text(f"SHOW {name}")).scalar()
+    return report
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
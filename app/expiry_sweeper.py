@@ -0,0 +1,153 @@
+# app/expiry_sweeper.py
+# Periodic state transitions for qr_tokens / scan_logs.
+#
+# Expiry: tokens used to turn passive only when scanned after expires_at.
+# Every EXPIRY_SWEEP_SEC the sweeper marks expired active tokens passive in
+# UPDATEs of at most EXPIRY_SWEEP_BATCH rows, one short transaction each, so
+# it never holds the write lock long enough to stall /qr/verify. The
+# (status, expires_at) index makes finding each batch a range scan.
+#
+# Retention (RETENTION_DAYS > 0): passive tokens issued before the cutoff
+# and scan logs older than it leave the hot tables, in batches too:
+#   "archive" - copied to qr_tokens_archive / scan_logs_archive, then deleted
+#   "purge"   - deleted
+# Archived tokens answer not_found on /qr/verify and /qr/status.
+#
+# Finished print_jobs rows (printed / failed, WORKERS > 1, see
+# app/print_dispatch.py) are deleted PRINT_JOBS_KEEP_HOURS after their last
+# update, so the table only holds recent history.
+
+from datetime import datetime, timedelta, timezone
+import threading
+
+from sqlalchemy import delete, insert, literal, select, update
+
+from app.db import engine
+from app.models import PrintJobRecord, QRToken, ScanLog, qr_tokens_archive, scan_logs_archive
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)   # stored as naive UTC
+
+
+class ExpirySweeper:
+    def __init__(self, interval_sec: float = 60, batch: int = 500,
+                 retention_days: float = 0, retention_mode: str = "archive",
+                 print_jobs_keep_hours: float = 24):
+        if retention_mode not in ("archive", "purge"):
+            raise ValueError(f"unknown retention mode: {retention_mode}")
+        self.interval_sec = interval_sec
+        self.batch = batch
+        self.retention_days = retention_days
+        self.retention_mode = retention_mode
+        self.print_jobs_keep_hours = print_jobs_keep_hours
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.expired = 0
+        self.archived_tokens = 0
+        self.archived_logs = 0
+        self.pruned_print_jobs = 0
+
+    # ---------- expiry ----------
+    def expire(self, now: datetime | None = None) -> int:
+        """Mark every expired active token passive, batch by batch. Returns rows updated."""
+        now = now or _utcnow()
+        t = QRToken.__table__
+        total = 0
+        while not self._stop.is_set():
+            ids = (select(t.c.id)
+                   .where(t.c.status == "active", t.c.expires_at < now)
+                   .limit(self.batch)
+                   .scalar_subquery())
+            with engine.begin() as conn:
+                n = conn.execute(
+                    update(t)
+                    .where(t.c.id.in_(ids), t.c.status == "active")
+                    .values(status="passive")
+                ).rowcount
+            total += n
+            if n < self.batch:
+                break
+        self.expired += total
+        return total
+
+    # ---------- archive / purge ----------
+    def _move(self, src, dst, cond) -> int:
+        moved = 0
+        while not self._stop.is_set():
+            with engine.begin() as conn:
+                ids = conn.execute(select(src.c.id).where(cond).limit(self.batch)).scalars().all()
+                if not ids:
+                    break
+                if self.retention_mode == "archive":
+                    cols = [c.name for c in src.columns]
+                    conn.execute(insert(dst).from_select(
+                        cols + ["archived_at"],
+                        select(*src.columns, literal(_utcnow())).where(src.c.id.in_(ids)),
+                    ))
+                conn.execute(delete(src).where(src.c.id.in_(ids)))
+            moved += len(ids)
+            if len(ids) < self.batch:
+                break
+        return moved
+
+    def retain(self, now: datetime | None = None) -> tuple[int, int]:
+        """Archive/purge old passive tokens and scan logs. Returns (tokens, logs)."""
+        if self.retention_days <= 0:
+            return 0, 0
+        cutoff = (now or _utcnow()) - timedelta(days=self.retention_days)
+        t, s = QRToken.__table__, ScanLog.__table__
+        tokens = self._move(t, qr_tokens_archive, (t.c.status == "passive") & (t.c.issued_at < cutoff))
+        logs = self._move(s, scan_logs_archive, s.c.ts < cutoff)
+        self.archived_tokens += tokens
+        self.archived_logs += logs
+        return tokens, logs
+
+    # ---------- print_jobs ----------
+    def prune_print_jobs(self, now: datetime | None = None) -> int:
+        """Delete printed / failed print_jobs rows older than print_jobs_keep_hours. Returns rows deleted."""
+        if self.print_jobs_keep_hours <= 0:
+            return 0
+        cutoff = (now or _utcnow()) - timedelta(hours=self.print_jobs_keep_hours)
+        j = PrintJobRecord.__table__
+        total = 0
+        while not self._stop.is_set():
+            ids = (select(j.c.id)
+                   .where(j.c.status.in_(("printed", "failed")), j.c.updated_at < cutoff)
+                   .limit(self.batch)
+                   .scalar_subquery())
+            with engine.begin() as conn:
+                n = conn.execute(delete(j).where(j.c.id.in_(ids))).rowcount
+            total += n
+            if n < self.batch:
+                break
+        self.pruned_print_jobs += total
+        return total
+
+    def sweep(self) -> dict:
+        expired = self.expire()
+        tokens, logs = self.retain()
+        jobs = self.prune_print_jobs()
+        return {"expired": expired, "archived_tokens": tokens, "archived_logs": logs, "pruned_print_jobs": jobs}
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="expiry-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_sec):
+            try:
+                self.sweep()
+            except Exception as e:
+                print("Expiry sweep fail:", e)
+
+
+sweeper: ExpirySweeper | None = None
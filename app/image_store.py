@@ -0,0 +1,270 @@
+# app/image_store.py
+# On-disk store for issued QR PNGs (settings.IMAGE_DIR, default qr_images/).
+#
+# Layout:  qr_images/ab/cd/<token>.png   ab/cd = first 4 hex of sha1(token)
+#          qr_images/archive.zip         packed old images (ZIP_STORED; the zip
+#                                        central directory is the index)
+#
+# 256*256 shards keep every directory small even with millions of tickets.
+# ImageSweeper periodically:
+#   - deletes images whose token is passive, expired or gone from the DB,
+#   - rewrites the archive without such tokens,
+#   - packs loose images older than IMAGE_PACK_AFTER_DAYS into the archive.
+# With several workers / hosts (WORKERS > 1) IMAGE_DIR may be a shared mount:
+# writes are atomic renames and only the holder of the "image-sweeper" lease
+# sweeps, packs or migrates.
+# Older installs wrote qr_images/<token>.png; migrate_flat() moves those into
+# their shards - on the sweeper thread before its first pass, so a big flat
+# directory never holds up startup (or: python -m app.image_store migrate).
+# Until an image is moved read() still finds it at the old path.
+
+from datetime import datetime, timezone
+from hashlib import sha1
+from pathlib import Path
+import os
+import sys
+import threading
+import time
+import zipfile
+
+from sqlalchemy import or_, select
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import QRToken
+
+ARCHIVE_NAME = "archive.zip"
+LIVE_CHECK_BATCH = 500      # tokens per IN (...) query
+
+
+class ImageStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.archive_path = self.root / ARCHIVE_NAME
+        self._shards: set[Path] = set()       # shard dirs known to exist
+        self._lock = threading.Lock()         # archive reader / writer
+        self._reader: zipfile.ZipFile | None = None
+        self._reader_mtime = 0.0
+
+    # ---------- paths ----------
+    def path(self, token: str) -> Path:
+        h = sha1(token.encode("utf-8")).hexdigest()
+        return self.root / h[:2] / h[2:4] / f"{token}.png"
+
+    def _loose(self):
+        """Every sharded image file."""
+        return self.root.glob("??/??/*.png")
+
+    # ---------- read / write ----------
+    def write(self, token: str, png: bytes) -> Path:
+        path = self.path(token)
+        if path.parent not in self._shards:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._shards.add(path.parent)
+        # write + rename: with IMAGE_DIR on a shared mount (WORKERS > 1) another
+        # process never sees a half-written file
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(png)
+        os.replace(tmp, path)
+        return path
+
+    def read(self, token: str) -> bytes | None:
+        """Image bytes from the shard, else from the archive, else None."""
+        try:
+            return self.path(token).read_bytes()
+        except FileNotFoundError:
+            pass
+        try:
+            return (self.root / f"{token}.png").read_bytes()   # flat layout, not migrated yet
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            try:
+                zf = self._archive()
+                if zf is None:
+                    return None
+                return zf.read(f"{token}.png")
+            except KeyError:
+                return None
+            except (zipfile.BadZipFile, OSError):   # another process is packing it right now
+                self._close_reader()
+                return None
+
+    def delete(self, token: str) -> bool:
+        try:
+            self.path(token).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _archive(self) -> zipfile.ZipFile | None:
+        """Open archive reader, reopened when the file changed (call with _lock held)."""
+        try:
+            mtime = self.archive_path.stat().st_mtime
+        except FileNotFoundError:
+            self._close_reader()
+            return None
+        if self._reader is None or mtime != self._reader_mtime:
+            self._close_reader()
+            self._reader = zipfile.ZipFile(self.archive_path)
+            self._reader_mtime = mtime
+        return self._reader
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def archived(self) -> list[str]:
+        with self._lock:
+            zf = self._archive()
+            return [n[:-4] for n in zf.namelist()] if zf is not None else []
+
+    # ---------- maintenance ----------
+    def migrate_flat(self, stop: threading.Event | None = None) -> int:
+        """Move qr_images/<token>.png (old flat layout) into shards until stop is set. Returns files moved."""
+        moved = 0
+        for old in self.root.glob("*.png"):
+            if stop is not None and stop.is_set():
+                break
+            new = self.path(old.stem)
+            new.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(old, new)
+            moved += 1
+        return moved
+
+    def pack(self, older_than_sec: float) -> int:
+        """Append loose images not modified for older_than_sec to the archive, then unlink them."""
+        cutoff = time.time() - older_than_sec
+        old = [p for p in self._loose() if p.stat().st_mtime < cutoff]
+        if not old:
+            return 0
+        with self._lock:
+            self._close_reader()
+            with zipfile.ZipFile(self.archive_path, "a", zipfile.ZIP_STORED) as zf:
+                have = set(zf.namelist())
+                for p in old:
+                    if p.name not in have:
+                        zf.write(p, p.name)
+        for p in old:
+            p.unlink(missing_ok=True)
+        return len(old)
+
+    def compact(self, keep: set[str]) -> int:
+        """Rewrite the archive with only the tokens in keep. Returns entries dropped."""
+        with self._lock:
+            zf = self._archive()
+            if zf is None:
+                return 0
+            names = zf.namelist()
+            drop = [n for n in names if n[:-4] not in keep]
+            if not drop:
+                return 0
+            tmp = self.archive_path.with_suffix(".tmp")
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as out:
+                for n in names:
+                    if n[:-4] in keep:
+                        out.writestr(zf.getinfo(n), zf.read(n))
+            self._close_reader()
+            os.replace(tmp, self.archive_path)
+        return len(drop)
+
+
+def live_tokens(tokens: list[str], now: datetime | None = None) -> set[str]:
+    """The subset of tokens that are still active and not expired."""
+    now = (now or datetime.now(timezone.utc)).replace(tzinfo=None)
+    live = set()
+    with SessionLocal() as db:
+        for i in range(0, len(tokens), LIVE_CHECK_BATCH):
+            chunk = tokens[i:i + LIVE_CHECK_BATCH]
+            live.update(db.execute(
+                select(QRToken.token).where(
+                    QRToken.token.in_(chunk),
+                    QRToken.status == "active",
+                    or_(QRToken.expires_at.is_(None), QRToken.expires_at > now),
+                )
+            ).scalars())
+    return live
+
+
+class ImageSweeper:
+    """Background retention for ImageStore (every IMAGE_SWEEP_SEC)."""
+
+    def __init__(self, store: ImageStore, interval_sec: float = 3600, pack_after_days: float = 0,
+                 migrate: bool = False):
+        self.store = store
+        self.interval_sec = interval_sec
+        self.pack_after_sec = pack_after_days * 86400
+        self.migrate = migrate        # migrate_flat() first, on the sweeper thread
+        self.migrated = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.deleted = 0
+        self.packed = 0
+        self.compacted = 0
+
+    def sweep(self) -> dict:
+        """One retention pass. Returns what it did."""
+        loose = list(self.store._loose())
+        live = live_tokens([p.stem for p in loose])
+        deleted = 0
+        for p in loose:
+            if p.stem not in live:
+                p.unlink(missing_ok=True)
+                deleted += 1
+
+        compacted = 0
+        archived = self.store.archived()
+        if archived:
+            compacted = self.store.compact(live_tokens(archived))
+
+        packed = self.store.pack(self.pack_after_sec) if self.pack_after_sec > 0 else 0
+
+        self.deleted += deleted
+        self.compacted += compacted
+        self.packed += packed
+        return {"deleted": deleted, "compacted": compacted, "packed": packed}
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="image-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        if self.migrate:
+            try:
+                self.migrated = self.store.migrate_flat(self._stop)
+                if self.migrated:
+                    print("Moved", self.migrated, "QR images into the sharded layout")
+            except Exception as e:
+                print("Image migrate fail:", e)
+        if self.interval_sec <= 0:      # sweeping off: the migration was all there was to do
+            return
+        while not self._stop.wait(self.interval_sec):
+            try:
+                self.sweep()
+            except Exception as e:
+                print("Image sweep fail:", e)
+
+
+store = ImageStore(Path(settings.IMAGE_DIR))
+sweeper: ImageSweeper | None = None
+
+
+if __name__ == "__main__":
+    # python -m app.image_store migrate | sweep
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if cmd == "migrate":
+        print("moved:", store.migrate_flat())
+    elif cmd == "sweep":
+        print(ImageSweeper(store, pack_after_days=settings.IMAGE_PACK_AFTER_DAYS).sweep())
+    else:
+        sys.exit(f"unknown command: {cmd}")
@@ -1,8 +1,14 @@
-from app.db import Base, engine
-from app import models  # ensure models are imported and registered
+# app/init_db.py
+# Brings the database schema up to date - see app/migrations.py.
+
+from app import migrations
+
 
 def init():
-    Base.metadata.create_all(bind=engine)
+    applied = migrations.upgrade()
+    if applied:
+        print("Schema migrations applied:", applied)
+
 
 if __name__ == "__main__":
     init()
@@ -0,0 +1,141 @@
+# app/leases.py
+# DB leases: "only one process runs this" across uvicorn workers and gate hosts
+# that share one database (settings.WORKERS > 1).
+#
+# A lease is a row in `leases` (name, holder, expires_at). LeaseKeeper, one per
+# process, tries every LEASE_TTL_SEC / 3 to take or renew each of its names
+# with a single conditional UPDATE (mine, or expired) - or an INSERT for a
+# name never seen before - so two processes can never both win. A process
+# that dies simply stops renewing, and its leases move on after LEASE_TTL_SEC.
+#
+# Callbacks fire on the keeper thread when a lease is won or lost; main.py
+# uses them to start/stop the per-printer dispatcher and the sweepers. A
+# callback that raises is logged and never kills the keeper thread; a failed
+# on_acquired is retried on the next round (the lease is still renewed).
+# on_lost after a failed renewal runs with held(name) already False; on stop()
+# it runs before the release, with held(name) still True.
+
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from uuid import uuid4
+import os
+import socket
+import threading
+
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.db import engine
+from app.models import Lease
+
+_l = Lease.__table__
+
+HOLDER = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"   # this process
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def acquire(name: str, holder: str = HOLDER, ttl_sec: float = 15, now: datetime | None = None) -> bool:
+    """Take or renew `name` for ttl_sec. True if holder owns it afterwards."""
+    now = now or _utcnow()
+    expires = now + timedelta(seconds=ttl_sec)
+    with engine.begin() as conn:
+        won = conn.execute(
+            update(_l)
+            .where(_l.c.name == name, or_(_l.c.holder == holder, _l.c.expires_at < now))
+            .values(holder=holder, expires_at=expires)
+        ).rowcount
+    if won:
+        return True
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(_l).values(name=name, holder=holder, expires_at=expires))
+        return True
+    except IntegrityError:          # somebody else holds it
+        return False
+
+
+def release(name: str, holder: str = HOLDER):
+    with engine.begin() as conn:
+        conn.execute(delete(_l).where(_l.c.name == name, _l.c.holder == holder))
+
+
+def _call(event: str, name: str, fn: Callable[[], None] | None) -> bool:
+    """Run a lease callback; False (logged) if it raised."""
+    if fn is None:
+        return True
+    try:
+        fn()
+        return True
+    except Exception as e:
+        print(f"Lease {event} callback fail:", name, e)
+        return False
+
+
+class LeaseKeeper:
+    def __init__(self, ttl_sec: float = 15, holder: str = HOLDER):
+        self.ttl_sec = ttl_sec
+        self.holder = holder
+        self._names: dict[str, tuple[Callable[[], None] | None, Callable[[], None] | None]] = {}
+        self._held: set[str] = set()
+        self._halt = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def want(self, name: str, on_acquired: Callable[[], None] | None = None,
+             on_lost: Callable[[], None] | None = None):
+        """Compete for `name` (register before start())."""
+        self._names[name] = (on_acquired, on_lost)
+
+    def held(self, name: str) -> bool:
+        return name in self._held
+
+    def tick(self):
+        """One renew/acquire round over every wanted name."""
+        for name, (on_acquired, on_lost) in self._names.items():
+            try:
+                ok = acquire(name, self.holder, self.ttl_sec)
+            except Exception as e:      # DB unreachable: we can't prove we still own it
+                print("Lease fail:", name, e)
+                ok = False
+            if ok and name not in self._held:
+                if _call("acquired", name, on_acquired):
+                    self._held.add(name)
+            elif not ok and name in self._held:
+                self._held.discard(name)
+                _call("lost", name, on_lost)
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self._halt.clear()
+        self.tick()         # settle ownership before the first request
+        self._thread = threading.Thread(target=self._run, name="lease-keeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._halt.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for name in list(self._held):
+            _call("lost", name, self._names[name][1])
+            try:
+                release(name, self.holder)      # hand over now instead of after the TTL
+            except Exception as e:
+                print("Lease release fail:", name, e)
+        self._held.clear()
+
+    def _run(self):
+        while not self._halt.wait(self.ttl_sec / 3):
+            try:
+                self.tick()
+            except Exception as e:
+                print("Lease keeper fail:", e)
+
+    def status(self) -> dict:
+        return {"holder": self.holder, "ttl_sec": self.ttl_sec,
+                "held": sorted(self._held), "wanted": sorted(self._names)}
+
+
+keeper: LeaseKeeper | None = None
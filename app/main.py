@@ -2,21 +2,30 @@
 # Backend that issues QR WITHOUT requiring a pre-existing user.
 # All person fields are OPTIONAL and stored on the QRToken row.
 
-from fastapi import FastAPI, Form, Depends, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse, RedirectResponse
+from fastapi import FastAPI, Form, Depends, HTTPException, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from uuid import uuid4
-from datetime import datetime, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
-from zoneinfo import ZoneInfo
-import qrcode
-from app.db import SessionLocal
+from app.db import SessionLocal, storage_report
 from app.models import QRToken, ScanLog
-from app.config import TIMEZONE
+from app.config import PrinterConfig, settings
 from app.printer import print_qr_ticket  # uses your network printer
-from io import BytesIO
-import base64
+from app.tickets import (PERSON_FIELDS, POOLED, expiry_local_str, gate_of, payload_tag, qr_payload,
+                         split_payload, ticket_info, token_row)
+from app import (atomic_verify, batch_verify, expiry_sweeper, image_store, leases, metrics, migrations,
+                 print_dispatch, print_queue, qr_render, scan_analytics, scan_log_sink, token_index,
+                 token_pool, warmup)
+import csv
+import io
+import json
+import multiprocessing
+import os
+import zipfile
 
 app = FastAPI(title="QR KODU OLUŞTURMA")
 
@@ -28,44 +37,217 @@ def get_db():
     finally:
         db.close()
 
-# ---------- Constants / folders ----------
-QR_DIR = Path("qr_images")
-QR_DIR.mkdir(exist_ok=True)
-
-ISSUER = "BenimGiriş"  # payload issuer string for QR data
-
 # ---------- Health ----------
 @app.get("/health")
 def health():
-    return {"ok": True, "service": "gate-entry", "status": "running"}
+    try:
+        storage = {**storage_report(), "schema_version": migrations.current()}
+    except Exception as e:
+        storage = {"error": str(e)}
+    body = {"ok": True, "service": "gate-entry", "status": "running", "storage": storage}
+    if leases.keeper is not None:
+        body["workers"] = {"configured": settings.WORKERS, **leases.keeper.status()}
+    if token_pool.pool is not None:
+        body["token_pool"] = token_pool.pool.status()
+    return body
 
 # ---------- Warmup on startup (faster first request) ----------
+# DB, timezone, qrcode/Pillow and the ESC/POS template warm up concurrently;
+# in "background" mode the server takes requests meanwhile (see app/warmup.py).
 @app.on_event("startup")
 def _warm_up():
-    try:
-        with SessionLocal() as db:
-            db.execute("SELECT 1")
-    except Exception as e:
-        print("Warm DB fail:", e)
+    if settings.WARMUP == "off":
+        warmup.runner = warmup.Warmup({})
+        return
+    warmup.runner = warmup.Warmup().start()
+    if settings.WARMUP == "blocking":
+        warmup.runner.wait()
+
+@app.get("/ready")
+def ready():
+    report = warmup.runner.report() if warmup.runner is not None else {"ready": False, "steps": {}}
+    return JSONResponse({"ok": report["ready"], **report}, status_code=200 if report["ready"] else 503)
+
+# ---------- Hot token index (VERIFY_MODE="index") ----------
+@app.on_event("startup")
+def _start_token_index():
+    if settings.VERIFY_MODE == "index":
+        token_index.index = token_index.TokenIndex(flush_ms=settings.INDEX_FLUSH_MS)
+        token_index.index.start()
+
+@app.on_event("shutdown")
+def _stop_token_index():
+    if token_index.index is not None:
+        token_index.index.stop()     # drains pending write-backs
+        token_index.index = None
+
+# ---------- Buffered scan log writer ----------
+@app.on_event("startup")
+def _start_scan_log_sink():
+    if settings.SCANLOG_BUFFERED:
+        scan_log_sink.sink = scan_log_sink.ScanLogSink(
+            flush_ms=settings.SCANLOG_FLUSH_MS,
+            batch=settings.SCANLOG_BATCH,
+            queue_max=settings.SCANLOG_QUEUE_MAX,
+            policy=settings.SCANLOG_POLICY,
+            block_ms=settings.SCANLOG_BLOCK_MS,
+        )
+        scan_log_sink.sink.start()
+
+@app.on_event("shutdown")
+def _stop_scan_log_sink():
+    if scan_log_sink.sink is not None:
+        scan_log_sink.sink.stop()    # drains queued rows
+        scan_log_sink.sink = None
+
+# ---------- Multi-worker leases (WORKERS > 1) ----------
+# Jobs that must run in one process only (printers, sweepers) register here and
+# are started / stopped as this process wins / loses their lease (app/leases.py).
+@app.on_event("startup")
+def _create_lease_keeper():
+    if settings.WORKERS > 1:
+        leases.keeper = leases.LeaseKeeper(ttl_sec=settings.LEASE_TTL_SEC)
+
+@app.on_event("shutdown")
+def _stop_lease_keeper():
+    if leases.keeper is not None:
+        leases.keeper.stop()         # stops what it started, hands the leases over
+        leases.keeper = None
+
+def _singleton(name: str, start, stop):
+    """start() now in a single process; with WORKERS > 1 whenever this process holds lease `name`."""
+    if leases.keeper is None:
+        start()
+    else:
+        leases.keeper.want(name, start, stop)
 
-    # warm tz
-    try:
-        ZoneInfo(TIMEZONE)
-    except Exception as e:
-        print("Warm tz fail:", e)
+# ---------- Expiry sweeper / row retention ----------
+@app.on_event("startup")
+def _start_expiry_sweeper():
+    if settings.EXPIRY_SWEEP_SEC > 0:
+        _singleton("expiry-sweeper", _run_expiry_sweeper, _stop_expiry_sweeper)
+
+def _run_expiry_sweeper():
+    expiry_sweeper.sweeper = expiry_sweeper.ExpirySweeper(
+        interval_sec=settings.EXPIRY_SWEEP_SEC,
+        batch=settings.EXPIRY_SWEEP_BATCH,
+        retention_days=settings.RETENTION_DAYS,
+        retention_mode=settings.RETENTION_MODE,
+        print_jobs_keep_hours=settings.PRINT_JOBS_KEEP_HOURS,
+    )
+    expiry_sweeper.sweeper.start()
 
-    # warm qrcode + pillow
-    try:
-        qrcode.make("warmup-payload")
-    except Exception as e:
-        print("Warm QR fail:", e)
+@app.on_event("shutdown")
+def _stop_expiry_sweeper():
+    if expiry_sweeper.sweeper is not None:
+        expiry_sweeper.sweeper.stop()
+        expiry_sweeper.sweeper = None
 
-    # warm printer (optional; use if app.printer has _warm_printer)
-    try:
-        from app.printer import _warm_printer
-        _warm_printer()
-    except Exception:
-        pass
+# ---------- QR image store retention ----------
+@app.on_event("startup")
+def _start_image_sweeper():
+    _singleton("image-sweeper", _run_image_sweeper, _stop_image_sweeper)
+
+def _run_image_sweeper():
+    # the old flat layout is migrated on the sweeper thread, not here: startup
+    # and /health don't wait for hundreds of thousands of renames
+    image_store.sweeper = image_store.ImageSweeper(
+        image_store.store,
+        interval_sec=settings.IMAGE_SWEEP_SEC,
+        pack_after_days=settings.IMAGE_PACK_AFTER_DAYS,
+        migrate=True,
+    )
+    image_store.sweeper.start()
+
+@app.on_event("shutdown")
+def _stop_image_sweeper():
+    if image_store.sweeper is not None:
+        image_store.sweeper.stop()
+        image_store.sweeper = None
+
+# ---------- Print queue (persistent printer connection) ----------
+@app.on_event("startup")
+def _start_print_queue():
+    if settings.PRINT_QUEUE:
+        printers = settings.PRINTERS or [PrinterConfig(host=settings.PRINTER_HOST, port=settings.PRINTER_PORT)]
+        queues = [
+            print_queue.PrintQueue(
+                print_queue.PrinterLink(pc.host, pc.port, timeout=settings.PRINTER_TIMEOUT_SEC),
+                max_jobs=settings.PRINT_QUEUE_MAX,
+                max_retries=settings.PRINT_RETRIES,
+                backoff_sec=settings.PRINT_BACKOFF_MS / 1000.0,
+                breaker=print_queue.CircuitBreaker(settings.PRINT_BREAKER_THRESHOLD,
+                                                   settings.PRINT_BREAKER_RESET_SEC),
+                name=pc.name, weight=pc.weight, department=pc.department, role=pc.role,
+            )
+            for pc in printers
+        ]
+        if leases.keeper is not None:    # one dispatcher per printer across all workers
+            print_queue.queue = print_dispatch.SharedPrintQueue(queues, leases.keeper,
+                                                                poll_ms=settings.PRINT_POLL_MS)
+        else:
+            print_queue.queue = print_queue.PrinterPool(queues)
+        print_queue.queue.start()
+
+@app.on_event("startup")
+def _start_lease_keeper():
+    if leases.keeper is not None:     # after every _singleton / printer registered
+        leases.keeper.start()
+
+@app.on_event("shutdown")
+def _stop_print_queue():
+    if print_queue.queue is not None:
+        print_queue.queue.stop()
+        print_queue.queue = None
+
+def _dispatch_print(payload: str, print_info: dict, background: BackgroundTasks | None):
+    """Queue the ticket; without the queue fall back to connect-per-ticket printing."""
+    if print_queue.queue is not None:
+        if print_queue.queue.submit(payload, print_info) is None:
+            print("Printer error: print queue full")
+    elif background:
+        background.add_task(print_qr_ticket, payload, print_info)
+    else:
+        print_qr_ticket(payload, print_info)
+
+# ---------- Pre-issued token pool (TOKEN_POOL_HIGH > 0) ----------
+@app.on_event("startup")
+def _start_token_pool():
+    if settings.TOKEN_POOL_HIGH <= 0:
+        try:
+            n = token_pool.discard_all()      # left over from a run with the pool on
+            if n:
+                print("Discarded", n, "pooled tokens (TOKEN_POOL_HIGH=0)")
+        except Exception as e:
+            print("Token pool discard fail:", e)
+        return
+    token_pool.pool = token_pool.TokenPool(
+        high=settings.TOKEN_POOL_HIGH,
+        low=settings.TOKEN_POOL_LOW or settings.TOKEN_POOL_HIGH // 4,
+        batch=settings.TOKEN_POOL_BATCH,
+        idle_ms=settings.TOKEN_POOL_IDLE_MS,
+        workers=settings.WORKERS,
+        # with WORKERS > 1 another process may print the ticket
+        prime_tickets=settings.PRINT_QR_MODE == "bitmap" and leases.keeper is None,
+    )
+    token_pool.pool.start()
+
+@app.on_event("shutdown")
+def _stop_token_pool():
+    if token_pool.pool is not None:
+        token_pool.pool.stop()         # unused tokens stay pooled, adopted on next start
+        token_pool.pool = None
+
+# ---------- Metrics (Prometheus text format) ----------
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/print/queue")
+def print_queue_status():
+    if print_queue.queue is None:
+        return {"ok": True, "enabled": False}
+    return {"ok": True, "enabled": True, **print_queue.queue.status()}
 
 # ---------- Issue QR WITHOUT user_id ----------
 @app.post("/qr/issue")
@@ -84,122 +266,280 @@ def issue_qr(
     background: BackgroundTasks = None,
     db: Session = Depends(get_db),
 ):
-    token = str(uuid4())
-
     # Use UTC-aware timestamps
     now = datetime.now(timezone.utc)
-    exp = (now + timedelta(minutes=minutes_valid)) if minutes_valid and minutes_valid > 0 else None
-
-    # Create row containing both token + person info
-    rec = QRToken(
-        token=token,
-        issued_at=now.replace(tzinfo=None),       # store naive UTC in SQLite
-        expires_at=exp.replace(tzinfo=None) if exp else None,
-        status="active",
-        max_scans=max_scans,
-        scan_count=0,
-
-        employee_id=employee_id,
-        full_name=full_name,
-        email=email,
-        role=role,
-        department=department,
-    )
-    db.add(rec)
-    db.commit()
-    db.refresh(rec)
-
-    payload = f"{ISSUER}|{token}"
-    # make small PNG in memory for instant web preview
-    def _png_b64():
-        buf = BytesIO()
-        qrcode.make(payload).save(buf, format="PNG")
-        return base64.b64encode(buf.getvalue()).decode("ascii")
-
-    # Save PNG (in background for speed)
-    img_path = QR_DIR / f"{token}.png"
-    def _render_png():
-        qrcode.make(payload).save(img_path)
-
-    # Build LOCAL time string for UI/print
-    if exp:
-        try:
-            local_tz = ZoneInfo(TIMEZONE)
-        except Exception:
-            local_tz = datetime.now().astimezone().tzinfo
-        exp_local = exp.astimezone(local_tz)
-        exp_local_str = exp_local.strftime("%Y-%m-%d %H:%M:%S")
-    else:
-        exp_local_str = "No expiry"
-
-    print_info = {
-        "Kullancı Adı": rec.full_name,
-        "Eposta": rec.email,
-        "Görev": rec.role,
-        "Kullancı No": rec.employee_id,
-        "Bölüm": rec.department,
-        "Aktif Okuma Sureci(Local)": exp_local_str,
-        "Maksımum Okuma": rec.max_scans,
+    person = {
+        "employee_id": employee_id,
+        "full_name": full_name,
+        "email": email,
+        "role": role,
+        "department": department,
     }
 
-    # Background: print + render PNG (non-blocking)
-    '''  if background:
-        background.add_task(print_qr_ticket, payload, print_info)
-        background.add_task(_render_png)
+    # A pre-issued token (QR already rendered) if the pool has one
+    pooled = None
+    if token_pool.pool is not None:
+        pooled = token_pool.pool.take(now, minutes_valid, max_scans, person)
+    if pooled is not None:
+        row, exp, png = pooled
     else:
-        print_qr_ticket(payload, print_info)
-        _render_png()'''
-  
-    def _render_png_to_disk():
-        qrcode.make(payload).save(img_path)
-
-    if background:
-        background.add_task(print_qr_ticket, payload, print_info)
-        background.add_task(_render_png_to_disk)
-    else:
-        print_qr_ticket(payload, print_info)
-        _render_png_to_disk()
+        # Create row containing both token + person info
+        row, exp = token_row(now, minutes_valid, max_scans, person)
+        rec = QRToken(**row)
+        with metrics.stage("db_insert"):
+            db.add(rec)
+            db.commit()
+        db.refresh(rec)
+        png = None
+    token = row["token"]
+    if token_index.index is not None:
+        token_index.index.put(row)
+
+    payload = qr_payload(token, row["expires_at"], max_scans)
+    # encode once; preview, /qr/png, disk file and printer bitmap all reuse the cached matrix
+    if png is None:
+        png = qr_render.cached_png(payload)
+    img_path = image_store.store.path(token) if settings.QR_SAVE_PNG else None
+
+    print_info = ticket_info(row, expiry_local_str(exp))
+
+    # Background: print + write PNG (non-blocking)
+    _dispatch_print(payload, print_info, background)
+    if img_path is not None:
+        if background:
+            background.add_task(image_store.store.write, token, png)
+        else:
+            image_store.store.write(token, png)
 
     return {
         "ok": True,
         "token": token,
         "payload": payload,
-        "png_path": str(img_path),
-        "qr_b64": _png_b64(),       # <— NEW: inline image for the web preview
+        "png_path": str(img_path) if img_path else None,
+        "qr_b64": qr_render.png_b64(png),   # inline image for the web preview
         "print_info": print_info,
     }
 
+# ---------- Bulk issue (events / HR exports) ----------
+# Body: JSON array of person records, {"records": [...]}, a text/csv body,
+# or a multipart upload in field "file". Columns/keys = PERSON_FIELDS, plus
+# optional per-row minutes_valid / max_scans overriding the query defaults.
+BATCH_MAX = 20000
+BATCH_POOL_MIN = 200   # below this, rendering inline beats process pool startup
+BATCH_CHUNK = 64
+BATCH_WORKERS = os.cpu_count() or 1
+
+_render_pool: ProcessPoolExecutor | None = None
+
+@app.on_event("startup")
+def _start_render_pool():
+    # "spawn": forking a process that already runs sink / printer / index threads
+    # could hand the child a lock held by one of them (metrics, LRU caches)
+    global _render_pool
+    if BATCH_WORKERS >= 2:
+        _render_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS,
+                                           mp_context=multiprocessing.get_context("spawn"))
+
+def _render_pngs(payloads: list[str]):
+    """PNG bytes for each payload, in order; big batches go across the process pool."""
+    if len(payloads) < BATCH_POOL_MIN or _render_pool is None:
+        return map(qr_render.png_bytes, payloads)
+    return _render_pool.map(qr_render.png_bytes, payloads, chunksize=BATCH_CHUNK)
+
+@app.on_event("shutdown")
+def _stop_render_pool():
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(cancel_futures=True)
+        _render_pool = None
+
+def _parse_batch(body: bytes, content_type: str) -> list[dict]:
+    if "csv" in content_type:
+        records = list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+    else:
+        records = json.loads(body or b"[]")
+        if isinstance(records, dict):
+            records = records.get("records", [])
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ValueError("expected a list of records")
+    return records
+
+def _opt_int(value, default: int) -> int:
+    return default if value in (None, "") else int(value)
+
+def _insert_batch(db: Session, records: list[dict], minutes_valid: int, max_scans: int) -> list[dict]:
+    """One bulk INSERT + one commit for the whole batch."""
+    now = datetime.now(timezone.utc)
+    rows, tickets = [], []
+    for r in records:
+        person = {f: (str(r[f]).strip() or None) if r.get(f) not in (None, "") else None
+                  for f in PERSON_FIELDS}
+        row, exp = token_row(now, _opt_int(r.get("minutes_valid"), minutes_valid),
+                              _opt_int(r.get("max_scans"), max_scans), person)
+        rows.append(row)
+        tickets.append({
+            "token": row["token"],
+            "payload": qr_payload(row["token"], row["expires_at"], row["max_scans"]),
+            "print_info": ticket_info(row, expiry_local_str(exp)),
+        })
+    if rows:
+        with metrics.stage("db_insert"):
+            db.execute(insert(QRToken), rows)
+            db.commit()
+        if token_index.index is not None:
+            for row in rows:
+                token_index.index.put(row)
+    return tickets
+
+def _batch_ndjson(tickets: list[dict]):
+    pngs = _render_pngs([t["payload"] for t in tickets])
+    for t, png in zip(tickets, pngs):
+        if settings.QR_SAVE_PNG:
+            image_store.store.write(t["token"], png)
+        yield json.dumps({**t, "qr_b64": qr_render.png_b64(png)}, ensure_ascii=False) + "\n"
+
+class _ZipSink:
+    """Write-only, unseekable file object: zipfile streams into it and we drain per entry."""
+    def __init__(self):
+        self._chunks = []
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+    def flush(self):
+        pass
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+def _batch_zip(tickets: list[dict]):
+    sink = _ZipSink()
+    manifest = io.StringIO()
+    w = csv.writer(manifest)
+    w.writerow(["token", "payload", *PERSON_FIELDS])
+    # PNGs are already compressed; ZIP_STORED keeps this cheap
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        pngs = _render_pngs([t["payload"] for t in tickets])
+        for t, png in zip(tickets, pngs):
+            if settings.QR_SAVE_PNG:
+                image_store.store.write(t["token"], png)
+            zf.writestr(f"{t['token']}.png", png)
+            info = t["print_info"]
+            w.writerow([t["token"], t["payload"], info["Kullancı No"], info["Kullancı Adı"],
+                        info["Eposta"], info["Görev"], info["Bölüm"]])
+            yield sink.drain()
+        zf.writestr("manifest.csv", manifest.getvalue().encode("utf-8"))
+    yield sink.drain()
+
+@app.post("/qr/issue/batch")
+async def issue_qr_batch(
+    request: Request,
+    minutes_valid: int = 60,      # default for rows without their own value
+    max_scans: int = 2,
+    format: str = "ndjson",       # ndjson | zip
+    print_tickets: bool = False,
+    background: BackgroundTasks = None,
+    db: Session = Depends(get_db),
+):
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None:
+            return JSONResponse({"ok": False, "error": "missing_file"}, status_code=400)
+        body = await upload.read()
+        content_type = "text/csv" if (upload.filename or "").lower().endswith(".csv") else (upload.content_type or "")
+    else:
+        body = await request.body()
+
+    try:
+        records = _parse_batch(body, content_type)
+    except ValueError as e:   # includes JSON / int() / unicode errors
+        return JSONResponse({"ok": False, "error": f"bad_batch:{e}"}, status_code=400)
+    if len(records) > BATCH_MAX:
+        return JSONResponse({"ok": False, "error": "batch_too_large", "max": BATCH_MAX}, status_code=413)
+    if format not in ("ndjson", "zip"):
+        return JSONResponse({"ok": False, "error": "bad_format"}, status_code=400)
+
+    try:
+        tickets = await run_in_threadpool(_insert_batch, db, records, minutes_valid, max_scans)
+    except ValueError as e:
+        return JSONResponse({"ok": False, "error": f"bad_batch:{e}"}, status_code=400)
+
+    if print_tickets:
+        for t in tickets:
+            _dispatch_print(t["payload"], t["print_info"], background)
+
+    if format == "zip":
+        return StreamingResponse(_batch_zip(tickets), media_type="application/zip",
+                                 headers={"Content-Disposition": 'attachment; filename="qr_batch.zip"'})
+    return StreamingResponse(_batch_ndjson(tickets), media_type="application/x-ndjson")
+
 # ---------- Serve QR PNG by token ----------
+# Rendered on demand from the token (the image only depends on it), so there is
+# no race with the disk write and browsers may cache it forever.
+QR_IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def _token_payload(db: Session, token: str) -> str | None:
+    """The payload the token's QR encodes, or None for an unknown token."""
+    r = db.execute(select(QRToken.expires_at, QRToken.max_scans)
+                   .where(QRToken.token == token, QRToken.status.is_distinct_from(POOLED))).first()
+    return qr_payload(token, r.expires_at, r.max_scans) if r else None
+
 @app.get("/qr/png/{token}")
-def get_qr_png(token: str):
-    path = QR_DIR / f"{token}.png"
-    if not path.exists():
+def get_qr_png(token: str, request: Request, size: int | None = None, format: str = "png",
+               db: Session = Depends(get_db)):
+    if format not in ("png", "svg"):
+        return JSONResponse({"ok": False, "error": "bad_format"}, status_code=400)
+    etag = f'"{token}-{size or 0}-{payload_tag()}.{format}"'
+    headers = {"ETag": etag, "Cache-Control": QR_IMAGE_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    payload = _token_payload(db, token)
+    if payload is None:
         return JSONResponse({"ok": False, "error": "not_found"}, status_code=404)
-    return FileResponse(path, media_type="image/png")
 
-# ---------- Verify QR (payload = 'ISSUER|token') ----------
+    if format == "svg":
+        return Response(qr_render.svg_bytes(payload, size), media_type="image/svg+xml", headers=headers)
+    png = qr_render.cached_png(payload, qr_render.box_for_size(payload, size))
+    return Response(png, media_type="image/png", headers=headers)
+
+# ---------- Verify QR (payload = 'ISSUER|token' or signed 'ISSUER|token|exp|max|sig') ----------
 @app.post("/qr/verify")
+@metrics.timed("verify")
 def verify_qr(payload: dict, db: Session = Depends(get_db)):
     p = payload.get("payload", "")
-    # Parse
-    try:
-        issuer, token = p.split("|", 1)
-    except ValueError:
-        _log_scan(db, token=None, result="denied:bad_payload")
-        return {"ok": False, "reason": "bad_payload"}
-
-    if issuer != ISSUER:
-        _log_scan(db, token=token, result="denied:wrong_issuer")
-        return {"ok": False, "reason": "wrong_issuer"}
-
-    rec = db.query(QRToken).filter(QRToken.token == token).first()
+    gate = gate_of(payload)
+    # Parse (+ signature check for signed payloads)
+    token, reason = split_payload(p)
+    if reason:
+        _log_scan(db, token=token, result=f"denied:{reason}", gate=gate)
+        return {"ok": False, "reason": reason}
+
+    if token_index.index is not None:
+        body, result, hint = token_index.index.verify(token)
+        _log_scan(db, token=token, result=result, user_hint=hint, gate=gate)
+        return body
+
+    if settings.VERIFY_MODE == "atomic":
+        body, result, hint = atomic_verify.consume_scan(db, token)
+        _log_scan(db, token=token, result=result, user_hint=hint, gate=gate)
+        return body
+
+    rec = db.query(QRToken).filter(QRToken.token == token, QRToken.status.is_distinct_from(POOLED)).first()
     if not rec:
-        _log_scan(db, token=token, result="denied:not_found")
+        _log_scan(db, token=token, result="denied:not_found", gate=gate)
         return {"ok": False, "reason": "not_found"}
 
     # status
     if rec.status != "active":
-        _log_scan(db, token=token, result="denied:passive")
+        _log_scan(db, token=token, result="denied:passive", gate=gate)
         return {"ok": False, "reason": "passive"}
 
     # expiry (stored as naive UTC)
@@ -208,14 +548,14 @@ def verify_qr(payload: dict, db: Session = Depends(get_db)):
         if datetime.now(timezone.utc) > exp_utc:
             rec.status = "passive"
             db.commit()
-            _log_scan(db, token=token, result="denied:expired")
+            _log_scan(db, token=token, result="denied:expired", gate=gate)
             return {"ok": False, "reason": "expired"}
 
     # scan count
     if rec.scan_count >= rec.max_scans:
         rec.status = "passive"
         db.commit()
-        _log_scan(db, token=token, result="denied:max_scans_reached")
+        _log_scan(db, token=token, result="denied:max_scans_reached", gate=gate)
         return {"ok": False, "reason": "max_scans_reached"}
 
     # allow
@@ -226,19 +566,41 @@ def verify_qr(payload: dict, db: Session = Depends(get_db)):
 
     # optional hint for logs
     hint = rec.employee_id or rec.full_name or ""
-    _log_scan(db, token=token, result="allowed", user_hint=hint)
+    _log_scan(db, token=token, result="allowed", user_hint=hint, gate=gate)
 
     return {"ok": True, "scan_count": rec.scan_count, "status": rec.status}
 
-def _log_scan(db: Session, token: str | None, result: str, user_hint: str | None = None):
-    log = ScanLog(token=token or "", result=result, user_hint=user_hint or "")
-    db.add(log)
+# ---------- Batch verify (multi-lane gate controllers) ----------
+# Body: {"payloads": ["ISSUER|token", ...]} -> {"ok": true, "results": [...]},
+# one result per payload in order, each exactly what /qr/verify would return.
+@app.post("/qr/verify/batch")
+@metrics.timed("verify_batch")
+def verify_qr_batch(body: dict, db: Session = Depends(get_db)):
+    payloads = body.get("payloads")
+    if not isinstance(payloads, list):
+        return JSONResponse({"ok": False, "error": "bad_batch"}, status_code=400)
+    if len(payloads) > batch_verify.BATCH_VERIFY_MAX:
+        return JSONResponse({"ok": False, "error": "batch_too_large",
+                             "max": batch_verify.BATCH_VERIFY_MAX}, status_code=413)
+    items = [split_payload(p if isinstance(p, str) else "") for p in payloads]
+    return {"ok": True, "results": batch_verify.verify_batch(db, items, gate=gate_of(body))}
+
+def _log_scan(db: Session, token: str | None, result: str, user_hint: str | None = None,
+              gate: str | None = None):
+    metrics.scan_result(result)
+    if scan_log_sink.sink is not None:
+        scan_log_sink.sink.put(token or "", result, user_hint or "", gate)
+        return
+    row = {"token": token or "", "result": result, "user_hint": user_hint or "", "gate": gate,
+           "ts": datetime.utcnow()}
+    db.execute(insert(ScanLog), [row])
+    scan_analytics.record_rollup(db, [row])
     db.commit()
 
 # ---------- Optional: simple status endpoint ----------
 @app.get("/qr/status/{token}")
 def qr_status(token: str, db: Session = Depends(get_db)):
-    rec = db.query(QRToken).filter(QRToken.token == token).first()
+    rec = db.query(QRToken).filter(QRToken.token == token, QRToken.status.is_distinct_from(POOLED)).first()
     if not rec:
         return {"ok": False, "reason": "not_found"}
     return {
@@ -253,6 +615,48 @@ def qr_status(token: str, db: Session = Depends(get_db)):
         "department": rec.department,
     }
 
+# ---------- Scan log analytics ----------
+# Streamed (chunked) so months of logs export at constant memory.
+#   GET /scans/export?format=csv|ndjson&since=&until=&gate=&result=&after=<ts>,<id>&limit=
+#       rows in (ts, id) order; result="denied:" matches every denial
+#   GET /scans/hourly?format=ndjson|csv&since=&until=&gate=
+#       allowed / denied per (hour, gate) from the rollup table
+# Times are ISO 8601; without an offset they are UTC.
+@app.get("/scans/export")
+def export_scans(format: str = "ndjson", since: str | None = None, until: str | None = None,
+                 gate: str | None = None, result: str | None = None, after: str | None = None,
+                 limit: int | None = None):
+    if format not in scan_analytics.EXPORT_FORMATS:
+        return JSONResponse({"ok": False, "error": "bad_format"}, status_code=400)
+    try:
+        pages = scan_analytics.iter_scans(scan_analytics.parse_ts(since), scan_analytics.parse_ts(until),
+                                          gate, result, scan_analytics.parse_cursor(after), limit)
+    except ValueError as e:
+        return JSONResponse({"ok": False, "error": f"bad_query:{e}"}, status_code=400)
+    media = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(scan_analytics.export_chunks(pages, format), media_type=media,
+                             headers={"Content-Disposition": f'attachment; filename="scans.{format}"'})
+
+@app.get("/scans/hourly")
+def hourly_scans(format: str = "ndjson", since: str | None = None, until: str | None = None,
+                 gate: str | None = None):
+    if format not in scan_analytics.EXPORT_FORMATS:
+        return JSONResponse({"ok": False, "error": "bad_format"}, status_code=400)
+    try:
+        buckets = scan_analytics.iter_hourly(scan_analytics.parse_ts(since), scan_analytics.parse_ts(until), gate)
+    except ValueError as e:
+        return JSONResponse({"ok": False, "error": f"bad_query:{e}"}, status_code=400)
+    media = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(scan_analytics.hourly_chunks(buckets, format), media_type=media)
+
+# ---------- async def API (/async/qr/...) ----------
+try:
+    from app import async_api
+    app.include_router(async_api.router)
+    app.on_event("shutdown")(async_api.shutdown)
+except ImportError as e:    # async DB driver (aiosqlite / asyncpg) not installed
+    print("Async API disabled:", e)
+
 # ---------- Redirect root to docs & serve web ----------
 '''
 @app.get("/")
@@ -0,0 +1,223 @@
+# app/metrics.py
+# In-process metrics for GET /metrics (Prometheus text format 0.0.4).
+# No client library: a histogram observation is two perf_counter() calls, a
+# bisect and a dict update under a lock (~1-2 µs), cheap enough to leave on.
+#
+#   qr_stage_seconds{stage=...}      latency per pipeline stage:
+#       db_insert, qr_encode, png_encode, base64, ticket_render,
+#       print_connect, print_send, verify, verify_batch,
+#       pool_bind, pool_refill (one refill batch, see app/token_pool.py)
+#   qr_verify_results_total{result}  one per scan, keyed like ScanLog.result
+#                                    (allowed, denied:not_found, denied:passive, ...)
+#   print queue depth, cache hit rates, token index / scan log sink / token
+#   pool counters are read from their owners at scrape time (see _app_lines).
+#
+# settings.METRICS=False turns the timers and counters into no-ops.
+
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+import inspect
+import threading
+
+from app.config import settings
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, n: float = 1):
+        if not settings.METRICS:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        out += [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}    # labels -> [per-bucket counts..., +Inf], [sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *labels):
+        if not settings.METRICS:
+            return
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += seconds
+
+    def count(self, *labels) -> int:
+        s = self._series.get(labels)
+        return sum(s[0]) if s else 0
+
+    def time(self, *labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._series.items())
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for k, (counts, total) in items:
+            acc = 0
+            for le, c in zip([*self.buckets, "+Inf"], counts):
+                acc += c
+                out.append(f"{self.name}_bucket{_labels(names, (*k, le))} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {total!r}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {acc}")
+        return out
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "t0")
+
+    def __init__(self, hist: Histogram, labels: tuple):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(perf_counter() - self.t0, *self.labels)
+        return False
+
+
+# ---------- the app's metrics ----------
+STAGES = Histogram("qr_stage_seconds", "Latency of one pipeline stage.", ("stage",))
+VERIFY_RESULTS = Counter("qr_verify_results_total", "Scans by ScanLog.result.", ("result",))
+
+
+def stage(name: str) -> _Timer:
+    """with metrics.stage("db_insert"): ..."""
+    return _Timer(STAGES, (name,))
+
+
+def timed(name: str):
+    """Decorator form of stage() for sync or async handlers; keeps the signature (FastAPI reads it)."""
+    def deco(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(STAGES, (name,)):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(STAGES, (name,)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def scan_result(result: str):
+    VERIFY_RESULTS.inc(result)
+
+
+def _gauge(name: str, help: str, samples: list[tuple[dict, float]], kind: str = "gauge") -> list[str]:
+    out = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    out += [f"{name}{_labels(tuple(l), tuple(l.values()))} {_num(v)}" for l, v in samples]
+    return out
+
+
+def _cache_lines() -> list[str]:
+    from app import qr_render, ticket_template, token_index
+
+    caches = {
+        "qr_matrix": qr_render.qr_matrix.cache_info(),
+        "png": qr_render.cached_png.cache_info(),
+        "ticket_bitmap": ticket_template._bitmap_bytes.cache_info(),
+        "ticket_text": ticket_template._FieldEncoder.write.cache_info(),
+    }
+    hits = [({"cache": name}, info.hits) for name, info in caches.items()]
+    misses = [({"cache": name}, info.misses) for name, info in caches.items()]
+    size = [({"cache": name}, info.currsize) for name, info in caches.items()]
+    idx = token_index.index
+    if idx is not None:
+        hits.append(({"cache": "token_index"}, idx.hits))
+        misses.append(({"cache": "token_index"}, idx.misses))
+        size.append(({"cache": "token_index"}, len(idx)))
+    return (_gauge("qr_cache_hits_total", "Cache lookups that hit.", hits, "counter")
+            + _gauge("qr_cache_misses_total", "Cache lookups that missed.", misses, "counter")
+            + _gauge("qr_cache_entries", "Entries currently cached.", size))
+
+
+def _app_lines() -> list[str]:
+    from app import print_queue, scan_log_sink, token_pool
+
+    out = _cache_lines()
+    pool = print_queue.queue
+    if pool is not None:
+        st = [q.status() for q in pool.queues]
+        out += _gauge("qr_print_queue_depth", "Jobs waiting per printer.",
+                      [({"printer": s["name"]}, s["depth"]) for s in st])
+        out += _gauge("qr_print_jobs_total", "Finished print jobs.",
+                      [({"printer": s["name"], "status": k}, s[k])
+                       for s in st for k in ("printed", "failed")], "counter")
+        out += _gauge("qr_print_retries_total", "Print attempts retried.",
+                      [({"printer": s["name"]}, s["retries"]) for s in st], "counter")
+        out += _gauge("qr_print_breaker_open", "1 while the printer's circuit breaker is open.",
+                      [({"printer": s["name"]}, int(s["breaker"] == "open")) for s in st])
+    sink = scan_log_sink.sink
+    if sink is not None:
+        out += _gauge("qr_scan_log_queue_depth", "Scan log rows waiting for the writer.",
+                      [({}, sink.depth())])
+        out += _gauge("qr_scan_log_rows_total", "Scan log rows by outcome.",
+                      [({"outcome": "written"}, sink.written), ({"outcome": "dropped"}, sink.dropped),
+                       ({"outcome": "failed"}, sink.failed)],
+                      "counter")
+    tp = token_pool.pool
+    if tp is not None:
+        out += _gauge("qr_token_pool_ready", "Pre-issued tokens ready to hand out.", [({}, len(tp))])
+        out += _gauge("qr_token_pool_takes_total", "Issues by pool outcome (conflict = lost to another worker).",
+                      [({"outcome": "hit"}, tp.hits), ({"outcome": "miss"}, tp.misses),
+                       ({"outcome": "conflict"}, tp.conflicts)], "counter")
+        out += _gauge("qr_token_pool_refills_total", "Refill batches inserted.", [({}, tp.refills)], "counter")
+        out += _gauge("qr_token_pool_created_total", "Tokens pre-issued by refills.", [({}, tp.created)], "counter")
+    return out
+
+
+def render() -> str:
+    lines = STAGES.lines() + VERIFY_RESULTS.lines() + _app_lines()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,170 @@
+# app/migrations.py
+# Versioned schema migrations (replaces Base.metadata.create_all).
+#
+# schema_version(version, name, applied_at) records every step that ran.
+# upgrade() applies the missing steps in order, each in its own transaction
+# together with its schema_version row. On PostgreSQL it holds an advisory
+# lock meanwhile, so many gate nodes starting at once apply each step exactly
+# once; on SQLite a second runner loses the schema_version insert and rolls back.
+#
+# Steps only ever add things and check before they do (checkfirst, "column
+# missing?"), because tables are created from the CURRENT models: on a fresh
+# database step 1 already creates the latest tables, and later steps find
+# nothing to do. A database created by an older release (create_all, no
+# schema_version table) is adopted by running all steps. No downgrades.
+#
+#   python -m app.migrations            # upgrade
+#   python -m app.migrations status
+
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable
+import sys
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.db import engine as default_engine
+
+ADVISORY_LOCK_ID = 0x51_52_47_41   # "QRGA"; any constant shared by all nodes
+
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+_tokens = models.QRToken.__table__
+_logs = models.ScanLog.__table__
+
+
+# ---------- idempotent building blocks ----------
+def create_tables(conn: Connection, *tables: Table):
+    for t in tables:
+        t.create(conn, checkfirst=True)
+
+
+def add_columns(conn: Connection, table: Table, *names: str):
+    """ALTER TABLE ... ADD COLUMN for nullable model columns missing in the DB (all of them if no names)."""
+    have = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for col in table.columns:
+        if col.name not in have and col.nullable and (not names or col.name in names):
+            ddl = col.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {ddl}"))
+
+
+def create_indexes(conn: Connection, table: Table, *names: str):
+    for idx in table.indexes:
+        if idx.name in names:
+            idx.create(conn, checkfirst=True)
+
+
+# ---------- steps (append only; never edit one that has shipped) ----------
+def _initial(conn: Connection):
+    create_tables(conn, _tokens, _logs)
+
+
+def _expiry_index_and_archives(conn: Connection):
+    create_indexes(conn, _tokens, "ix_qr_tokens_status_expires_at")
+    create_tables(conn, models.qr_tokens_archive, models.scan_logs_archive)
+
+
+def _scan_analytics(conn: Connection):
+    from app import scan_analytics
+
+    add_columns(conn, _logs, "gate")
+    add_columns(conn, models.scan_logs_archive, "gate")
+    create_indexes(conn, _logs, "ix_scan_logs_ts_id", "ix_scan_logs_result_ts")
+    create_tables(conn, models.ScanRollupHourly.__table__)
+    if scan_analytics.rollup_missing(conn):
+        scan_analytics.rebuild(conn)
+
+
+def _multi_worker(conn: Connection):
+    create_tables(conn, models.Lease.__table__, models.PrintJobRecord.__table__)
+
+
+def _print_jobs_status_index(conn: Connection):
+    create_indexes(conn, models.PrintJobRecord.__table__, "ix_print_jobs_status_printer")
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "qr_tokens + scan_logs", _initial),
+    (2, "(status, expires_at) index, archive tables", _expiry_index_and_archives),
+    (3, "scan_logs.gate, ts/result indexes, hourly rollup", _scan_analytics),
+    (4, "leases, print_jobs (multi-worker)", _multi_worker),
+    (5, "print_jobs (status, printer) index", _print_jobs_status_index),
+]
+
+
+# ---------- runner ----------
+def applied(conn: Connection) -> set[int]:
+    if not inspect(conn).has_table(schema_version.name):
+        return set()
+    return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+@contextmanager
+def _exclusive(engine: Engine):
+    """Session-level advisory lock on PostgreSQL (held on its own connection); no-op elsewhere."""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": ADVISORY_LOCK_ID})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": ADVISORY_LOCK_ID})
+            conn.commit()
+
+
+def _apply(engine: Engine) -> list[int]:
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        have = applied(conn)
+    done = []
+    for version, name, step in MIGRATIONS:
+        if version in have:
+            continue
+        try:
+            with engine.begin() as conn:
+                step(conn)
+                conn.execute(insert(schema_version),
+                             {"version": version, "name": name, "applied_at": datetime.utcnow()})
+        except IntegrityError:      # another process recorded it first (SQLite, no lock)
+            continue
+        done.append(version)
+    return done
+
+
+def upgrade(engine: Engine | None = None) -> list[int]:
+    """Apply missing steps. Returns the versions applied by this call."""
+    engine = engine or default_engine
+    with _exclusive(engine):
+        done = _apply(engine)
+    if done and engine.dialect.name == "sqlite":
+        engine.dispose()        # pooled SQLite connections can keep a stale schema cache (PRAGMA index_list)
+    return done
+
+
+def current(engine: Engine | None = None) -> int:
+    with (engine or default_engine).connect() as conn:
+        return max(applied(conn), default=0)
+
+
+def pending(engine: Engine | None = None) -> list[int]:
+    with (engine or default_engine).connect() as conn:
+        have = applied(conn)
+    return [v for v, _, _ in MIGRATIONS if v not in have]
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["status"]:
+        print("schema version:", current(), "pending:", pending() or "none")
+    else:
+        print("applied:", upgrade() or "nothing to do")
@@ -1,10 +1,14 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, Table, Text
 from datetime import datetime
 from app.db import Base
 
 class QRToken(Base):
     __tablename__ = "qr_tokens"
+    __table_args__ = (
+        # "active and expired" lookups (expiry sweeper, active-pass counts)
+        Index("ix_qr_tokens_status_expires_at", "status", "expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -25,9 +29,64 @@ class QRToken(Base):
 
 class ScanLog(Base):
     __tablename__ = "scan_logs"
+    __table_args__ = (
+        # export keyset pagination: ORDER BY ts, id / WHERE (ts, id) > (:ts, :id)
+        Index("ix_scan_logs_ts_id", "ts", "id"),
+        # "denied:* in this period" filters
+        Index("ix_scan_logs_result_ts", "result", "ts"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     token = Column(String, index=True)          # the token that was scanned
     result = Column(String)                     # "allowed" or "denied:*"
     user_hint = Column(String, nullable=True)   # e.g., employee_id/full_name (optional)
-    ts = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    ts = Column(DateTime, default=datetime.utcnow)
+    gate = Column(String, nullable=True)        # scanner id sent with /qr/verify (optional)
+
+class ScanRollupHourly(Base):
+    """Scans per (hour, gate, result), kept up to date with every scan_logs insert (app/scan_analytics.py)."""
+    __tablename__ = "scan_rollup_hourly"
+
+    hour = Column(DateTime, primary_key=True)   # naive UTC, truncated to the hour
+    gate = Column(String, primary_key=True)     # "" = no gate reported
+    result = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+# ---------- Multi-worker coordination (app/leases.py, app/print_dispatch.py) ----------
+class Lease(Base):
+    """A named job only one process may run at a time (printer dispatcher, sweepers)."""
+    __tablename__ = "leases"
+
+    name = Column(String, primary_key=True)     # "print:<printer>", "maintenance"
+    holder = Column(String, nullable=False)     # host:pid:nonce of the owning process
+    expires_at = Column(DateTime, nullable=False)
+
+class PrintJobRecord(Base):
+    """Tickets waiting for the process that holds their printer's lease."""
+    __tablename__ = "print_jobs"
+    __table_args__ = (
+        # the holder's claim query: WHERE printer = :p AND status = 'queued' ORDER BY id
+        Index("ix_print_jobs_printer_status_id", "printer", "status", "id"),
+        # waiting jobs per printer on every submit, and pruning finished jobs: WHERE status IN (...)
+        Index("ix_print_jobs_status_printer", "status", "printer"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    printer = Column(String, nullable=False)    # PrintQueue name
+    payload = Column(String, nullable=False)
+    info = Column(Text, nullable=False)         # print_info as JSON
+    status = Column(String, nullable=False, default="queued")   # queued | sending | printed | failed
+    holder = Column(String, nullable=True)      # process that claimed it
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, nullable=True)
+# ---------- Archive tables (app/expiry_sweeper.py moves old rows here) ----------
+def _archive_table(src: Table) -> Table:
+    """Same columns as src (id kept, no autoincrement) + archived_at."""
+    cols = [Column(c.name, c.type, primary_key=c.primary_key, autoincrement=False, nullable=c.nullable)
+            for c in src.columns]
+    return Table(f"{src.name}_archive", Base.metadata, *cols, Column("archived_at", DateTime))
+
+qr_tokens_archive = _archive_table(QRToken.__table__)
+scan_logs_archive = _archive_table(ScanLog.__table__)
@@ -0,0 +1,203 @@
+# app/print_dispatch.py
+# Print queue for multi-worker deployments (settings.WORKERS > 1).
+#
+# Any worker may issue a ticket, but a printer must only have one writer, so
+#   - submit() just INSERTs a print_jobs row for the chosen printer;
+#   - each process competes for the lease "print:<name>" of every printer
+#     (app/leases.py); the holder runs that printer's PrintQueue and a claim
+#     thread that moves queued rows (oldest first) into it, marking them
+#     "sending", and records "printed" / "failed" when the worker is done.
+#
+# A holder that dies leaves its rows "sending"; the next holder puts them back
+# to "queued" (a ticket that was on the wire at the crash may print twice -
+# better than not at all). When a printer's breaker opens, its holder moves the
+# waiting rows to another printer like PrinterPool's failover does.
+
+from datetime import datetime
+import json
+import threading
+
+from sqlalchemy import func, insert, select, update
+
+from app import leases
+from app.db import engine
+from app.models import PrintJobRecord
+from app.print_queue import PrintJob, PrintQueue
+
+_j = PrintJobRecord.__table__
+_WAITING = ("queued", "sending")
+
+
+class SharedPrintQueue:
+    """PrinterPool's interface (submit / depth / status / queues), backed by print_jobs."""
+
+    def __init__(self, queues: list[PrintQueue], keeper: leases.LeaseKeeper,
+                 poll_ms: int = 200, claim_batch: int = 20):
+        if not queues:
+            raise ValueError("SharedPrintQueue needs at least one printer")
+        self.printers = {q.name: q for q in queues}
+        self.keeper = keeper
+        self.poll_sec = poll_ms / 1000.0
+        self.claim_batch = claim_batch
+        self._lock = threading.Lock()
+        self._owned: dict[str, tuple[threading.Thread, threading.Event]] = {}
+        self._wake = threading.Event()
+        self.failovers = 0
+        for q in queues:
+            q.on_finish = self._record
+            q.on_unhealthy = self._failover
+
+    @property
+    def queues(self) -> list[PrintQueue]:
+        """The printers this process currently dispatches for."""
+        with self._lock:
+            return [self.printers[n] for n in self._owned]
+
+    # ---------- producer side (any worker) ----------
+    def _waiting(self) -> dict[str, int]:
+        with engine.connect() as conn:
+            rows = conn.execute(select(_j.c.printer, func.count())
+                                .where(_j.c.status.in_(_WAITING)).group_by(_j.c.printer))
+            return dict(rows.all())
+
+    def _pick(self, info: dict, exclude: str | None = None, waiting: dict[str, int] | None = None) -> str:
+        names = [n for n in self.printers if n != exclude] or list(self.printers)
+        names = [n for n in names if self.printers[n].healthy] or names   # as far as this process knows
+        waiting = self._waiting() if waiting is None else waiting
+        pools = ([n for n in names if self.printers[n].accepts(info)],
+                 [n for n in names if self.printers[n].department is None and self.printers[n].role is None],
+                 names)
+        candidates = next(p for p in pools if p)
+        return min(candidates, key=lambda n: waiting.get(n, 0) / self.printers[n].weight)
+
+    def submit(self, payload: str, info: dict) -> int | None:
+        printer = self._pick(info)
+        with engine.begin() as conn:
+            job_id = conn.execute(insert(_j).values(
+                printer=printer, payload=payload, info=json.dumps(info, ensure_ascii=False),
+                status="queued", created_at=datetime.utcnow(),
+            )).inserted_primary_key[0]
+        self._wake.set()        # the holder may be this process: no need to wait for the poll
+        return job_id
+
+    def depth(self) -> int:
+        return sum(self._waiting().values())
+
+    # ---------- holder side ----------
+    def start(self):
+        for name in self.printers:
+            self.keeper.want(f"print:{name}", lambda n=name: self._own(n), lambda n=name: self._lost(n))
+
+    def stop(self, timeout: float = 5.0):
+        for name in list(self._owned):
+            self._disown(name, timeout)
+
+    def _own(self, name: str):
+        with engine.begin() as conn:        # rows a dead holder was sending
+            conn.execute(update(_j).where(_j.c.printer == name, _j.c.status == "sending")
+                         .values(status="queued", holder=None))
+        halt = threading.Event()
+        t = threading.Thread(target=self._claim_loop, args=(name, halt), name=f"print-claim-{name}", daemon=True)
+        with self._lock:
+            self._owned[name] = (t, halt)
+        self.printers[name].start()
+        t.start()
+
+    def _lost(self, name: str):
+        """
+        on_lost. While the keeper hands the lease over on shutdown it is still ours:
+        drain. When renewing failed another process may already own the printer
+        and requeue our "sending" rows: stop at once, or both would print them.
+        """
+        self._disown(name, 5.0 if self.keeper.held(f"print:{name}") else 0)
+
+    def _disown(self, name: str, timeout: float = 5.0):
+        with self._lock:
+            owned = self._owned.pop(name, None)
+        if owned is None:
+            return
+        t, halt = owned
+        halt.set()
+        self._wake.set()
+        t.join()
+        q = self.printers[name]
+        q.stop(timeout)
+        left = [job.id for job in q.take_all()]
+        if left:                                # unprinted: the next holder takes them
+            try:
+                with engine.begin() as conn:
+                    conn.execute(update(_j).where(_j.c.id.in_(left), _j.c.status == "sending")
+                                 .values(status="queued", holder=None))
+            except Exception as e:              # DB down: the next holder's _own requeues "sending" rows
+                print("Print requeue fail:", name, e)
+
+    def _claim(self, name: str) -> int:
+        q = self.printers[name]
+        room = min(self.claim_batch, q.max_jobs - q.depth())
+        if room <= 0:
+            return 0
+        with engine.begin() as conn:
+            rows = conn.execute(select(_j.c.id, _j.c.payload, _j.c.info)
+                                .where(_j.c.printer == name, _j.c.status == "queued")
+                                .order_by(_j.c.id).limit(room)).all()
+            if not rows:
+                return 0
+            conn.execute(update(_j).where(_j.c.id.in_([r.id for r in rows]), _j.c.status == "queued")
+                         .values(status="sending", holder=self.keeper.holder, updated_at=datetime.utcnow()))
+        for r in rows:
+            q.enqueue(PrintJob(r.id, r.payload, json.loads(r.info)))
+        return len(rows)
+
+    def _claim_loop(self, name: str, halt: threading.Event):
+        while not halt.is_set():
+            try:
+                if self._claim(name):
+                    continue
+            except Exception as e:
+                print("Print claim fail:", name, e)
+            self._wake.wait(self.poll_sec)
+            self._wake.clear()
+
+    def _record(self, job: PrintJob):
+        with engine.begin() as conn:
+            conn.execute(update(_j).where(_j.c.id == job.id).values(
+                status=job.status, attempts=job.attempts, error=job.error, updated_at=datetime.utcnow()))
+
+    def _failover(self, broken: PrintQueue) -> bool:
+        """Re-assign broken's waiting rows (local and in the DB) to a healthy printer. False if there is none."""
+        if not any(q.healthy for n, q in self.printers.items() if n != broken.name):
+            return False    # nowhere to go; the broken printer keeps retrying them
+        jobs = broken.take_all()
+        try:
+            waiting = self._waiting()
+            with engine.begin() as conn:
+                rows = conn.execute(select(_j.c.id, _j.c.info)
+                                    .where(_j.c.printer == broken.name, _j.c.status == "queued")).all()
+                moves = [(job.id, job.info) for job in jobs] + [(r.id, json.loads(r.info)) for r in rows]
+                for job_id, info in moves:
+                    target = self._pick(info, exclude=broken.name, waiting=waiting)
+                    waiting[target] = waiting.get(target, 0) + 1
+                    conn.execute(update(_j).where(_j.c.id == job_id)
+                                 .values(printer=target, status="queued", holder=None))
+        except Exception:
+            broken.put_back(jobs)   # still ours and still "sending": keep retrying them here
+            raise
+        if moves:
+            self.failovers += 1
+        self._wake.set()
+        return True
+
+    # ---------- /print/queue ----------
+    def status(self) -> dict:
+        printers = [q.status() for q in self.queues]
+        waiting = self._waiting()
+        return {
+            "mode": "shared",
+            "holder": self.keeper.holder,
+            "depth": sum(waiting.values()),
+            "waiting": waiting,
+            "printed": sum(p["printed"] for p in printers),
+            "failed": sum(p["failed"] for p in printers),
+            "failovers": self.failovers,
+            "printers": printers,       # the ones dispatched from this process
+        }
@@ -0,0 +1,418 @@
+# app/print_queue.py
+# Print subsystem: one long-lived connection per printer, a FIFO job queue
+# worked by one thread per printer, retry with exponential backoff and a
+# circuit breaker so a dead printer fails fast instead of costing a timeout
+# per ticket. PrinterPool spreads jobs over several printers.
+#
+#   issue_qr -> PrinterPool.submit() -> PrintQueue (per printer) -> worker
+#            -> render_ticket() -> PrinterLink.send()
+
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Callable
+import select
+import socket
+import threading
+import time
+
+from app import metrics
+from app.printer import render_ticket
+
+
+class PrinterLink:
+    """One persistent TCP connection to an ESC/POS printer (raw port 9100)."""
+
+    def __init__(self, host: str, port: int, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock: socket.socket | None = None
+        self.connects = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def _connect(self):
+        s = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # detect a printer that silently went away (where the OS lets us tune it)
+        for opt, val in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+            if hasattr(socket, opt):
+                s.setsockopt(socket.IPPROTO_TCP, getattr(socket, opt), val)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = s
+        self.connects += 1
+
+    def _peer_closed(self) -> bool:
+        """Printers drop idle connections; notice that before writing a ticket into the void."""
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            if readable:
+                return self._sock.recv(64, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+        return False
+
+    def send(self, data: bytes):
+        """sendall on the open connection, reconnecting first if needed. Raises OSError."""
+        if self._sock is not None and self._peer_closed():
+            self.close()
+        if self._sock is None:
+            with metrics.stage("print_connect"):
+                self._connect()
+        try:
+            with metrics.stage("print_send"):
+                self._sock.sendall(data)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+
+class CircuitBreaker:
+    """closed -> (N failures) -> open -> (reset_sec) -> half_open -> 1 success -> closed"""
+
+    def __init__(self, threshold: int = 3, reset_sec: float = 30.0):
+        self.threshold = threshold
+        self.reset_sec = reset_sec
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_sec:
+            return "half_open"
+        return "open"
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_sec - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+@dataclass
+class PrintJob:
+    id: int
+    payload: str
+    info: dict
+    created: float = field(default_factory=time.time)
+    attempts: int = 0
+    status: str = "queued"        # queued | printed | failed
+    error: str | None = None
+    data: bytes | None = None     # rendered once, re-sent on retry
+    printer: str | None = None    # name of the printer that took it
+
+
+class PrintQueue:
+    def __init__(self, link: PrinterLink, max_jobs: int = 500, max_retries: int = 3,
+                 backoff_sec: float = 0.5, backoff_max_sec: float = 10.0,
+                 breaker: CircuitBreaker | None = None, name: str | None = None,
+                 weight: float = 1.0, department: str | None = None, role: str | None = None):
+        self.link = link
+        self.name = name or f"{link.host}:{link.port}"
+        self.weight = weight
+        self.department = department      # affinity: print_info "Bölüm"
+        self.role = role                  # affinity: print_info "Görev"
+        # called from the worker when the breaker opens (PrinterPool moves the jobs away)
+        self.on_unhealthy: Callable[["PrintQueue"], bool] | None = None
+        # called from the worker with every printed / failed job (print_dispatch records it)
+        self.on_finish: Callable[[PrintJob], None] | None = None
+        self.max_jobs = max_jobs
+        self.max_retries = max_retries
+        self.backoff_sec = backoff_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.breaker = breaker or CircuitBreaker()
+        self._jobs: deque[PrintJob] = deque()
+        self._recent: deque[PrintJob] = deque(maxlen=50)
+        self._printed_at: deque[float] = deque(maxlen=1000)
+        self._cv = threading.Condition()
+        self._ids = count(1)
+        self._stop = False
+        self._deadline = 0.0              # stop(): keep printing until the queue is empty or this passes
+        self._thread: threading.Thread | None = None
+        self.printed = 0
+        self.failed = 0
+        self.retries = 0
+        self.rejected = 0
+
+    # ---------- producer side ----------
+    def submit(self, payload: str, info: dict) -> int | None:
+        """Queue a ticket. Returns the job id, or None if the queue is full."""
+        job = PrintJob(next(self._ids), payload, info)
+        return job.id if self.enqueue(job) else None
+
+    def enqueue(self, job: PrintJob) -> bool:
+        with self._cv:
+            if len(self._jobs) >= self.max_jobs:
+                self.rejected += 1
+                return False
+            job.printer = self.name
+            self._jobs.append(job)
+            self._cv.notify()
+            return True
+
+    def take_all(self) -> list[PrintJob]:
+        """Remove and return every queued job (for failover)."""
+        with self._cv:
+            jobs = list(self._jobs)
+            self._jobs.clear()
+            return jobs
+
+    def put_back(self, jobs: list[PrintJob]):
+        """Return jobs from take_all() to the head of the queue, in order (failover failed)."""
+        with self._cv:
+            self._jobs.extendleft(reversed(jobs))
+            self._cv.notify()
+
+    def depth(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state != "open"
+
+    def load(self) -> float:
+        """Queued jobs per unit of weight - lower is less busy."""
+        return len(self._jobs) / self.weight
+
+    def accepts(self, info: dict) -> bool:
+        """True if this printer has an affinity and the ticket matches it."""
+        if self.department is None and self.role is None:
+            return False
+        return ((self.department is None or info.get("Bölüm") == self.department)
+                and (self.role is None or info.get("Görev") == self.role))
+
+    def rate(self, window_sec: float = 60.0) -> float:
+        """Tickets printed per minute over the last window."""
+        cutoff = time.monotonic() - window_sec
+        return round(sum(1 for t in self._printed_at if t >= cutoff) * 60.0 / window_sec, 1)
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="print-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Print what is queued, for at most `timeout` seconds, then stop the worker.
+        Jobs still queued after that stay in the queue (take_all() hands them over).
+        """
+        with self._cv:
+            self._stop = True
+            self._deadline = time.monotonic() + timeout
+            self._cv.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.link.close()
+
+    # ---------- worker ----------
+    def _wait(self, seconds: float):
+        with self._cv:
+            if self._stop:
+                seconds = min(seconds, self._deadline - time.monotonic())
+            if seconds > 0:
+                self._cv.wait(seconds)
+
+    def _draining_over(self) -> bool:
+        """Stopping, and the queue is empty or the drain time is up (call under _cv)."""
+        return self._stop and (not self._jobs or time.monotonic() >= self._deadline)
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self._jobs and not self._stop:
+                    self._cv.wait()
+                if self._draining_over():
+                    return
+                job = self._jobs[0]          # stays at the head until done: strict FIFO
+
+            if self.breaker.state == "open":
+                if self._stop:               # can't print before stopping: leave the rest queued
+                    return
+                self._wait(self.breaker.retry_in())
+                continue
+
+            if job.data is None:
+                try:
+                    job.data = render_ticket(job.payload, job.info)
+                except Exception as e:      # a bad job, not a bad printer
+                    job.error = f"render:{e}"
+                    self._finish(job, "failed")
+                    continue
+
+            try:
+                job.attempts += 1
+                self.link.send(job.data)
+            except OSError as e:
+                self.breaker.record_failure()
+                job.error = str(e)
+                if self.breaker.state == "open" and self._fail_over():
+                    continue
+                if job.attempts > self.max_retries:
+                    self._finish(job, "failed")
+                    print("Printer error:", e)
+                else:
+                    self.retries += 1
+                    self._wait(min(self.backoff_max_sec, self.backoff_sec * 2 ** (job.attempts - 1)))
+                continue
+
+            self.breaker.record_success()
+            self._finish(job, "printed")
+
+    def _fail_over(self) -> bool:
+        """on_unhealthy(self); a handler that raises is logged and the jobs stay here."""
+        if self.on_unhealthy is None:
+            return False
+        try:
+            return self.on_unhealthy(self)
+        except Exception as e:
+            print("Print failover fail:", self.name, e)
+            return False
+
+    def _finish(self, job: PrintJob, status: str):
+        job.status = status
+        job.data = None
+        with self._cv:
+            if self._jobs and self._jobs[0] is job:
+                self._jobs.popleft()
+        self._recent.append(job)
+        if status == "printed":
+            self.printed += 1
+            self._printed_at.append(time.monotonic())
+        else:
+            self.failed += 1
+        if self.on_finish is not None:
+            try:
+                self.on_finish(job)
+            except Exception as e:
+                print("Print job record fail:", e)
+
+    # ---------- /print/queue ----------
+    def status(self) -> dict:
+        with self._cv:
+            queued = [{"id": j.id, "attempts": j.attempts, "error": j.error} for j in self._jobs]
+        return {
+            "name": self.name,
+            "printer": f"{self.link.host}:{self.link.port}",
+            "weight": self.weight,
+            "department": self.department,
+            "role": self.role,
+            "connected": self.link.connected,
+            "connects": self.link.connects,
+            "breaker": self.breaker.state,
+            "breaker_retry_in": round(self.breaker.retry_in(), 1),
+            "depth": len(queued),
+            "printed": self.printed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "per_minute": self.rate(),
+            "queued": queued[:20],
+            "recent": [{"id": j.id, "status": j.status, "attempts": j.attempts, "error": j.error}
+                       for j in list(self._recent)[-10:]],
+        }
+
+
+
+class PrinterPool:
+    """
+    Several printers behind one submit():
+      - affinity: a ticket whose Bölüm/Görev matches a printer's department/role
+        goes to one of those printers while any of them is healthy;
+      - otherwise the least busy (queued / weight) healthy printer wins,
+        preferring printers without an affinity;
+      - when a printer's breaker opens, its queued jobs move to healthy ones.
+    """
+
+    def __init__(self, queues: list[PrintQueue]):
+        if not queues:
+            raise ValueError("PrinterPool needs at least one printer")
+        self.queues = queues
+        self._ids = count(1)
+        self._lock = threading.Lock()
+        self.failovers = 0
+        for q in queues:
+            q.on_unhealthy = self._failover
+
+    def _pick(self, info: dict, exclude: PrintQueue | None = None) -> PrintQueue | None:
+        live = [q for q in self.queues if q is not exclude and q.healthy]
+        if not live:
+            return None
+        pools = ([q for q in live if q.accepts(info)],
+                 [q for q in live if q.department is None and q.role is None],
+                 live)
+        for candidates in pools:
+            if candidates:
+                return min(candidates, key=lambda q: q.load())
+
+    def _dispatch(self, job: PrintJob, exclude: PrintQueue | None = None) -> bool:
+        with self._lock:
+            q = self._pick(job.info, exclude)
+            if q is None:                        # everything is down: wait on the least busy
+                q = min((q for q in self.queues if q is not exclude), default=exclude,
+                        key=lambda q: q.load())
+            return q.enqueue(job)
+
+    def submit(self, payload: str, info: dict) -> int | None:
+        job = PrintJob(next(self._ids), payload, info)
+        return job.id if self._dispatch(job) else None
+
+    def _failover(self, broken: PrintQueue) -> bool:
+        """Move broken's queued jobs to healthy printers. False if there is none."""
+        if not any(q.healthy for q in self.queues if q is not broken):
+            return False    # nowhere to go; the broken printer keeps retrying them
+        jobs = broken.take_all()
+        for job in jobs:
+            job.attempts = 0
+            if not self._dispatch(job, exclude=broken):
+                job.error = job.error or "failover: no room on another printer"
+                broken._finish(job, "failed")       # counted, and recorded via on_finish
+        if jobs:
+            self.failovers += 1
+        return True
+
+    def depth(self) -> int:
+        return sum(q.depth() for q in self.queues)
+
+    def start(self):
+        for q in self.queues:
+            q.start()
+
+    def stop(self, timeout: float = 5.0):
+        for q in self.queues:
+            q.stop(timeout)
+
+    def status(self) -> dict:
+        printers = [q.status() for q in self.queues]
+        return {
+            "depth": sum(p["depth"] for p in printers),
+            "printed": sum(p["printed"] for p in printers),
+            "failed": sum(p["failed"] for p in printers),
+            "failovers": self.failovers,
+            "printers": printers,
+        }
+
+
+queue: PrinterPool | None = None
@@ -1,63 +1,82 @@
 # app/printer.py
 # Network ESC/POS printing with native-QR (fast) and bitmap fallback.
+# python-escpos is only needed once a ticket is rendered (see app.ticket_template).
 
-from escpos.printer import Network
-from typing import Dict
-from qrcode import QRCode
-from PIL import Image
+from __future__ import annotations
 
-PRINTER_IP = "192.168.2.169"   # <-- Specify printer's IP
-PRINTER_PORT = 9100
+from typing import TYPE_CHECKING, Dict
+import socket
+from app import metrics, qr_raster, qr_render, ticket_template
+from app.config import settings
 
-def _native_qr(p: Network, payload: str):
+if TYPE_CHECKING:
+    from escpos.escpos import Escpos
+
+PRINTER_IP = settings.PRINTER_HOST     # <-- set PRINTER_HOST in env/.env
+PRINTER_PORT = settings.PRINTER_PORT
+
+def _native_qr(p: Escpos, payload: str):
     # Native QR is fastest; size 6–10 is typical
     p.qr(payload, size=8, ec="M", model=2, center=True)
 
-def _bitmap_qr(p: Network, payload: str):
-    # Slower but universal; prints a generated QR image
-    qr = QRCode(border=1, box_size=6)
-    qr.add_data(payload)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    if img.mode != "RGB":
-        img = img.convert("RGB")
-    p.image(img, impl="bitImageColumn")
+def _bitmap_qr(p: Escpos, payload: str):
+    # Slower but universal; prints the (cached) QR matrix as a bitmap
+    if settings.PRINT_BITMAP != "raster":
+        p.image(qr_render.print_image(payload), impl="bitImageColumn")
+    elif qr_raster.available():
+        p._raw(qr_render.print_raster(payload))     # GS v 0, packed by NumPy
+    else:
+        p.image(qr_render.print_image(payload), impl="bitImageRaster")
+
+def _write_ticket(p: Escpos, payload: str, info: Dict[str, str]):
+    """
+    Reference ticket layout, call by call; works on any Escpos (Network, Dummy, ...).
+    app.ticket_template precompiles the same bytes - keep the two in sync.
+    """
+    #p.charcode("CP1254")   # make sure Turkish letters print correctly (try "CP1254")
+    # Header
+    p.set(align="center", width=2, height=2, bold=True)
+    p.text("Giris QR Kodu\n")
+    p.set(align="center", bold=False)
+    p.text("-----------------------\n")
+
+    # Try native QR first, fallback to bitmap
+    try:
+        _native_qr(p, payload)
+    except Exception:
+        _bitmap_qr(p, payload)
+
+    p.text("\n")
+
+    # Details
+    p.set(align="left")
+    for k, v in info.items():
+        v = "" if v is None else str(v)
+        p.text(f"{k}: {v}\n")
+
+    p.text("-----------------------\n")
+    p.text("Teknik Departmant Destekli\n")
+
+    p.cut()
+
+def render_ticket(payload: str, info: Dict[str, str]) -> bytes:
+    """Complete ticket as one buffer, from the precompiled template."""
+    with metrics.stage("ticket_render"):
+        return ticket_template.get(settings.PRINT_QR_MODE).render(payload, info)
 
 def print_qr_ticket(payload: str, info: Dict[str, str]) -> bool:
     """
-    Print a QR 'ticket' with payload and info fields.
+    Print a QR 'ticket' with payload and info fields on a fresh connection.
     Returns True if printed, False on error.
+    (The app normally goes through app.print_queue, which keeps the connection open.)
     """
     try:
-        p = Network(PRINTER_IP, PRINTER_PORT, timeout=5)
-        
-        #p.charcode("CP1254")   # make sure Turkish letters print correctly (try "CP1254")
-        # Header
-        p.set(align="center", width=2, height=2, bold=True)
-        p.text("Giris QR Kodu\n")
-        p.set(align="center", bold=False)
-        p.text("-----------------------\n")
-
-        # Try native QR first, fallback to bitmap
-        try:
-            _native_qr(p, payload)
-        except Exception:
-            _bitmap_qr(p, payload)
-
-        p.text("\n")
-
-        # Details
-        p.set(align="left")
-        for k, v in info.items():
-            v = "" if v is None else str(v)
-            p.text(f"{k}: {v}\n")
-
-        p.text("-----------------------\n")
-        p.text("Teknik Departmant Destekli\n")
-
-        p.cut()
-        p.close()
+        data = render_ticket(payload, info)
+        with metrics.stage("print_connect"):
+            s = socket.create_connection((PRINTER_IP, PRINTER_PORT), timeout=settings.PRINTER_TIMEOUT_SEC)
+        with s, metrics.stage("print_send"):
+            s.sendall(data)
         return True
     except Exception as e:
         print("Printer error:", e)
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,86 @@
+# app/qr_raster.py
+# NumPy renderers: QR module matrix (qrcode's get_matrix(), True = dark) ->
+#   escpos_raster()  ESC/POS "GS v 0" raster bit image, packed 1 bit per dot
+#   png_1bit()       1-bit grayscale PNG (zlib only, no Pillow)
+#   svg_path()       one SVG path of horizontal runs of dark modules
+#
+# Quiet zone and module scaling are array ops (np.pad / np.repeat) and the
+# bits are packed by np.packbits, so a ticket's QR costs a few array calls
+# instead of PIL resize + RGB convert + python-escpos' per-pixel column walk.
+#
+# NumPy is optional: available() says whether it can be imported, and
+# app.qr_render / app.printer keep the Pillow / python-escpos path otherwise.
+# It is imported on first use, like qrcode and Pillow.
+
+from __future__ import annotations
+
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import TYPE_CHECKING
+import struct
+import zlib
+
+if TYPE_CHECKING:
+    import numpy as np
+
+GS_V0 = b"\x1dv0\x00"      # GS v 0, m = 0 (normal density)
+RASTER_MAX_ROWS = 960      # rows per GS v 0 block (python-escpos' fragment_height)
+
+
+@lru_cache(maxsize=1)
+def available() -> bool:
+    return find_spec("numpy") is not None
+
+
+def as_array(matrix) -> np.ndarray:
+    """get_matrix() rows (or an array) -> 2-D bool array."""
+    import numpy as np
+    return np.asarray(matrix, dtype=bool)
+
+
+def scale(matrix, box_size: int, border: int) -> np.ndarray:
+    """Quiet zone of `border` modules, then every module -> box_size x box_size dots."""
+    import numpy as np
+    m = np.pad(as_array(matrix), border, constant_values=False)
+    return m.repeat(box_size, axis=0).repeat(box_size, axis=1)
+
+
+def escpos_raster(matrix, box_size: int, border: int) -> bytes:
+    """GS v 0 command(s) printing the scaled matrix; 1 bit = 1 dot, MSB first, dark = 1."""
+    import numpy as np
+    rows = np.packbits(scale(matrix, box_size, border), axis=1)     # pads each row to whole bytes
+    width = rows.shape[1]
+    out = []
+    for start in range(0, rows.shape[0], RASTER_MAX_ROWS):
+        block = rows[start:start + RASTER_MAX_ROWS]
+        out.append(GS_V0 + struct.pack("<HH", width, block.shape[0]) + block.tobytes())
+    return b"".join(out)
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def png_1bit(matrix, box_size: int, border: int, level: int = 6) -> bytes:
+    """Grayscale, bit depth 1 (1 = white), filter 0 on every scanline."""
+    import numpy as np
+    m = np.pad(as_array(matrix), border, constant_values=False)
+    side = m.shape[0] * box_size
+    # pack one scanline per module row, then repeat it box_size times
+    lines = np.packbits(~m.repeat(box_size, axis=1), axis=1)
+    lines = np.hstack([np.zeros((lines.shape[0], 1), np.uint8), lines]).repeat(box_size, axis=0)
+    ihdr = struct.pack(">IIBBBBB", side, side, 1, 0, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _chunk(b"IHDR", ihdr)
+            + _chunk(b"IDAT", zlib.compress(lines.tobytes(), level)) + _chunk(b"IEND", b""))
+
+
+def svg_path(matrix, border: int) -> str:
+    """Path data: "M{x},{y}h{w}v1h-{w}z" per horizontal run of dark modules."""
+    import numpy as np
+    m = as_array(matrix).astype(np.int8)
+    edges = np.diff(np.pad(m, ((0, 0), (1, 1))), axis=1)     # +1 run start, -1 run end
+    ys, xs = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)                           # same row-major order as the starts
+    widths = ends - xs
+    return "".join(f"M{x},{y}h{w}v1h-{w}z" for x, y, w in
+                   zip((xs + border).tolist(), (ys + border).tolist(), widths.tolist()))
@@ -0,0 +1,145 @@
+# app/qr_render.py
+# One QR rendering pipeline for the whole app.
+# The module matrix is encoded ONCE per payload (bounded LRU) and every output
+# (PNG bytes, base64 preview, file on disk, printer bitmap) is derived from it.
+# qrcode and Pillow are imported on first use (app.warmup pre-loads them in
+# the background), so importing the app stays fast.
+# With NumPy installed, PNG, SVG and the receipt raster come straight from the
+# matrix as array ops (app/qr_raster.py); Pillow is then only used by qr_image().
+
+from __future__ import annotations
+
+from functools import lru_cache
+from io import BytesIO
+from typing import TYPE_CHECKING
+import base64
+
+from app import metrics, qr_raster
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+MATRIX_CACHE_SIZE = 1024   # payloads kept in memory (a few KB each)
+PNG_CACHE_SIZE = 512       # rendered PNGs for /qr/png (~1-2 KB each at the default size)
+
+# Same look as qrcode.make(): 10px modules, 4-module quiet zone
+PNG_BOX_SIZE = 10
+PNG_BORDER = 4
+
+# /qr/png?size= : requested width in pixels, clamped
+SIZE_MIN = 64
+SIZE_MAX = 2048
+
+# Receipt bitmap fallback: smaller modules/border to fit the paper width
+PRINT_BOX_SIZE = 6
+PRINT_BORDER = 1
+
+
+@lru_cache(maxsize=MATRIX_CACHE_SIZE)
+def qr_matrix(payload: str) -> tuple[tuple[bool, ...], ...]:
+    """Encode payload -> module matrix (True = dark), without quiet zone."""
+    from qrcode import QRCode
+    from qrcode.constants import ERROR_CORRECT_M
+
+    with metrics.stage("qr_encode"):       # cache misses only
+        qr = QRCode(error_correction=ERROR_CORRECT_M, border=0)
+        qr.add_data(payload)
+        qr.make(fit=True)
+        return tuple(tuple(row) for row in qr.get_matrix())
+
+
+@lru_cache(maxsize=MATRIX_CACHE_SIZE)
+def qr_array(payload: str) -> np.ndarray:
+    """qr_matrix() as a read-only bool array (needs NumPy)."""
+    a = qr_raster.as_array(qr_matrix(payload))
+    a.setflags(write=False)
+    return a
+
+
+def qr_image(payload: str, box_size: int = PNG_BOX_SIZE, border: int = PNG_BORDER) -> Image.Image:
+    """1-bit PIL image of the cached matrix, scaled to box_size with a quiet zone."""
+    from PIL import Image
+
+    matrix = qr_matrix(payload)
+    n = len(matrix)
+
+    modules = Image.new("1", (n, n), 255)
+    modules.putdata([0 if dark else 255 for row in matrix for dark in row])
+
+    side = (n + 2 * border) * box_size
+    img = Image.new("1", (side, side), 255)
+    img.paste(modules.resize((n * box_size, n * box_size), Image.NEAREST),
+              (border * box_size, border * box_size))
+    return img
+
+
+def png_bytes(payload: str, box_size: int = PNG_BOX_SIZE, border: int = PNG_BORDER) -> bytes:
+    if qr_raster.available():
+        matrix = qr_array(payload)
+        with metrics.stage("png_encode"):
+            return qr_raster.png_1bit(matrix, box_size, border)
+    img = qr_image(payload, box_size, border)
+    buf = BytesIO()
+    with metrics.stage("png_encode"):
+        img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=PNG_CACHE_SIZE)
+def cached_png(payload: str, box_size: int = PNG_BOX_SIZE) -> bytes:
+    """png_bytes() behind a bounded LRU (issue seeds it, /qr/png reads it)."""
+    return png_bytes(payload, box_size)
+
+
+def box_for_size(payload: str, size: int | None, border: int = PNG_BORDER) -> int:
+    """Module size in px so the image is at most `size` px wide (None = default)."""
+    if size is None:
+        return PNG_BOX_SIZE
+    size = min(SIZE_MAX, max(SIZE_MIN, size))
+    return max(1, size // (len(qr_matrix(payload)) + 2 * border))
+
+
+def svg_bytes(payload: str, size: int | None = None, border: int = PNG_BORDER) -> bytes:
+    """Scalable QR: one <path> of horizontal runs of dark modules."""
+    matrix = qr_matrix(payload)
+    side = len(matrix) + 2 * border
+    if qr_raster.available():
+        path = qr_raster.svg_path(qr_array(payload), border)
+    else:
+        path = "".join(_svg_runs(matrix, border))
+    px = min(SIZE_MAX, max(SIZE_MIN, size)) if size else side * PNG_BOX_SIZE
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{px}" height="{px}" '
+        f'viewBox="0 0 {side} {side}" shape-rendering="crispEdges">'
+        f'<rect width="{side}" height="{side}" fill="#fff"/>'
+        f'<path fill="#000" d="{path}"/></svg>'
+    ).encode("ascii")
+
+
+def _svg_runs(matrix, border: int):
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if row[x]:
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                yield f"M{start + border},{y + border}h{x - start}v1h-{x - start}z"
+            else:
+                x += 1
+
+
+def png_b64(png: bytes) -> str:
+    with metrics.stage("base64"):
+        return base64.b64encode(png).decode("ascii")
+
+
+def print_image(payload: str) -> Image.Image:
+    """Bitmap for the ESC/POS fallback (python-escpos wants RGB)."""
+    return qr_image(payload, PRINT_BOX_SIZE, PRINT_BORDER).convert("RGB")
+
+
+def print_raster(payload: str) -> bytes:
+    """The same bitmap as ready GS v 0 bytes (needs NumPy)."""
+    return qr_raster.escpos_raster(qr_array(payload), PRINT_BOX_SIZE, PRINT_BORDER)
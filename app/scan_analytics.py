@@ -0,0 +1,226 @@
+# app/scan_analytics.py
+# Read side of scan_logs: streaming exports and hourly allow/deny counts.
+#
+# Hourly rollup: every code path that inserts scan_logs rows also upserts
+# scan_rollup_hourly (hour, gate, result) += n in the same transaction
+# (record_rollup), so "per gate per hour" never scans scan_logs and survives
+# retention (app/expiry_sweeper.py only moves scan_logs).
+#
+# Export: rows come out ordered by (ts, id) and are read in pages of
+# EXPORT_PAGE with keyset pagination - WHERE (ts, id) > (last ts, last id) on
+# the ix_scan_logs_ts_id index - each page on a short-lived connection, so
+# memory stays constant and no read transaction is held for the whole export.
+# A client can resume an export with after=<ts>,<id> of the last row it got.
+#
+#   python -m app.scan_analytics rebuild    # recompute the rollup from scan_logs
+
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import groupby
+import csv
+import io
+import json
+import sys
+
+from sqlalchemy import delete, func, insert, select, tuple_
+
+from app.db import engine
+from app.models import ScanLog, ScanRollupHourly
+
+EXPORT_PAGE = 5000
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_COLUMNS = ("id", "ts", "gate", "token", "result", "user_hint")
+
+_logs = ScanLog.__table__
+_rollup = ScanRollupHourly.__table__
+
+
+# ---------- rollup maintenance ----------
+def hour_of(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_params(rows) -> list[dict]:
+    """scan_logs rows (dicts with ts / gate / result) -> one upsert parameter set per bucket."""
+    counts = Counter((hour_of(r["ts"]), r.get("gate") or "", r["result"]) for r in rows)
+    return [{"hour": h, "gate": g, "result": res, "count": n} for (h, g, res), n in counts.items()]
+
+
+@lru_cache(maxsize=4)
+def rollup_upsert(dialect: str):
+    """INSERT ... ON CONFLICT (hour, gate, result) DO UPDATE SET count = count + excluded.count"""
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"scan rollup upsert for {dialect}")
+    stmt = dialect_insert(_rollup)
+    return stmt.on_conflict_do_update(
+        index_elements=[_rollup.c.hour, _rollup.c.gate, _rollup.c.result],
+        set_={"count": _rollup.c.count + stmt.excluded["count"]},
+    )
+
+
+def record_rollup(conn, rows):
+    """Add rows to the hourly rollup on conn (Connection or Session), inside the caller's transaction."""
+    params = rollup_params(rows)
+    if params:
+        dialect = conn.dialect if hasattr(conn, "dialect") else conn.get_bind().dialect
+        conn.execute(rollup_upsert(dialect.name), params)
+
+
+def rebuild(conn=None) -> int:
+    """Recompute the rollup from scan_logs (after an upgrade, or to repair it). Returns buckets."""
+    if conn is None:
+        with engine.begin() as conn:
+            return rebuild(conn)
+    bucket = func.strftime("%Y-%m-%d %H:00:00", _logs.c.ts) if conn.dialect.name == "sqlite" \
+        else func.date_trunc("hour", _logs.c.ts)
+    q = (select(bucket.label("hour"), func.coalesce(_logs.c.gate, "").label("gate"), _logs.c.result,
+                func.count().label("count"))
+         .where(_logs.c.ts.is_not(None))
+         .group_by(bucket, func.coalesce(_logs.c.gate, ""), _logs.c.result))
+    conn.execute(delete(_rollup))
+    rows = [{"hour": datetime.fromisoformat(r.hour) if isinstance(r.hour, str) else r.hour,
+             "gate": r.gate, "result": r.result or "", "count": r.count}
+            for r in conn.execute(q)]
+    if rows:
+        conn.execute(insert(_rollup), rows)
+    return len(rows)
+
+
+def rollup_missing(conn) -> bool:
+    """True when scan_logs has rows but the rollup is empty (DB from before the rollup existed)."""
+    return (conn.execute(select(_rollup.c.hour).limit(1)).first() is None
+            and conn.execute(select(_logs.c.id).limit(1)).first() is not None)
+
+
+# ---------- query parameters ----------
+def parse_ts(value: str | None) -> datetime | None:
+    """ISO 8601 -> naive UTC (as stored). Raises ValueError."""
+    if not value:
+        return None
+    ts = datetime.fromisoformat(value)
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def parse_cursor(value: str | None) -> tuple[datetime, int] | None:
+    """"<ts>,<id>" of the last row already received. Raises ValueError."""
+    if not value:
+        return None
+    ts, _, row_id = value.rpartition(",")
+    return parse_ts(ts), int(row_id)
+
+
+# ---------- export ----------
+def _like_prefix(prefix: str) -> str:
+    """LIKE pattern for "starts with `prefix`": its own % and _ match only themselves."""
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def iter_scans(since: datetime | None = None, until: datetime | None = None, gate: str | None = None,
+               result: str | None = None, after: tuple[datetime, int] | None = None,
+               limit: int | None = None, page: int = EXPORT_PAGE):
+    """Yield lists of scan_logs rows in (ts, id) order, one keyset page at a time."""
+    cols = [_logs.c[c] for c in EXPORT_COLUMNS]
+    base = select(*cols).where(_logs.c.ts.is_not(None)).order_by(_logs.c.ts, _logs.c.id)
+    if since is not None:
+        base = base.where(_logs.c.ts >= since)
+    if until is not None:
+        base = base.where(_logs.c.ts < until)
+    if gate is not None:
+        base = base.where(_logs.c.gate == gate)
+    if result is not None:
+        base = base.where(_logs.c.result.like(_like_prefix(result), escape="\\")
+                          if result.endswith(":") else _logs.c.result == result)
+
+    left = limit
+    while left is None or left > 0:
+        n = page if left is None else min(page, left)
+        q = base if after is None else base.where(tuple_(_logs.c.ts, _logs.c.id) > tuple_(*after))
+        with engine.connect() as conn:
+            rows = conn.execute(q.limit(n)).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < n:
+            return
+        after = rows[-1].ts, rows[-1].id
+        if left is not None:
+            left -= len(rows)
+
+
+def _json_default(v):
+    return v.isoformat() if isinstance(v, datetime) else str(v)
+
+
+def export_chunks(pages, fmt: str):
+    """Pages of rows -> encoded chunks (one per page) for a StreamingResponse."""
+    if fmt == "csv":
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(EXPORT_COLUMNS)
+        for rows in pages:
+            w.writerows((r.id, r.ts.isoformat(), r.gate or "", r.token, r.result, r.user_hint or "")
+                        for r in rows)
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue().encode("utf-8")
+        return
+    for rows in pages:
+        yield "".join(json.dumps(dict(r._mapping), default=_json_default, ensure_ascii=False) + "\n"
+                      for r in rows).encode("utf-8")
+
+
+# ---------- hourly counts ----------
+def iter_hourly(since: datetime | None = None, until: datetime | None = None, gate: str | None = None):
+    """One dict per (hour, gate): allowed / denied totals + per-result counts, in hour order."""
+    q = select(_rollup.c.hour, _rollup.c.gate, _rollup.c.result, _rollup.c.count) \
+        .order_by(_rollup.c.hour, _rollup.c.gate, _rollup.c.result)
+    if since is not None:
+        q = q.where(_rollup.c.hour >= hour_of(since))
+    if until is not None:
+        q = q.where(_rollup.c.hour < until)
+    if gate is not None:
+        q = q.where(_rollup.c.gate == gate)
+    with engine.connect() as conn:
+        rows = conn.execution_options(yield_per=1000).execute(q)
+        for (hour, g), group in groupby(rows, key=lambda r: (r.hour, r.gate)):
+            results = {r.result: r.count for r in group}
+            allowed = results.get("allowed", 0)
+            yield {"hour": hour.isoformat(), "gate": g or None, "allowed": allowed,
+                   "denied": sum(results.values()) - allowed, "results": results}
+
+
+def hourly_chunks(buckets, fmt: str, batch: int = 500):
+    if fmt == "csv":
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(("hour", "gate", "allowed", "denied"))
+        for i, b in enumerate(buckets, 1):
+            w.writerow((b["hour"], b["gate"] or "", b["allowed"], b["denied"]))
+            if i % batch == 0:
+                yield buf.getvalue().encode("utf-8")
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue().encode("utf-8")
+        return
+    out = []
+    for b in buckets:
+        out.append(json.dumps(b, ensure_ascii=False) + "\n")
+        if len(out) >= batch:
+            yield "".join(out).encode("utf-8")
+            out = []
+    if out:
+        yield "".join(out).encode("utf-8")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild"]:
+        print("Rollup buckets:", rebuild())
+    else:
+        print("usage: python -m app.scan_analytics rebuild")
@@ -0,0 +1,124 @@
+# app/scan_log_sink.py
+# Write-behind buffer for scan_logs.
+#
+# _log_scan() only enqueues a row; one background thread inserts rows in
+# batches (executemany) every SCANLOG_FLUSH_MS or SCANLOG_BATCH rows,
+# whichever comes first, and drains the queue on shutdown.
+#
+# Each batch also updates the hourly rollup (app/scan_analytics.py) in the
+# same transaction.
+#
+# The queue is bounded (SCANLOG_QUEUE_MAX). When it is full:
+#   "drop"  - the new row is discarded and counted (verify never waits)
+#   "block" - the caller waits up to SCANLOG_BLOCK_MS for room, then drops
+# Rows of a batch the database refused are counted as `failed`, not `dropped`,
+# so a DB outage is told apart from backpressure.
+
+from datetime import datetime
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from app import scan_analytics
+from app.db import engine
+from app.models import ScanLog
+
+STOP_POLL_SEC = 0.05
+
+
+class ScanLogSink:
+    def __init__(self, flush_ms: int = 250, batch: int = 200, queue_max: int = 10000,
+                 policy: str = "drop", block_ms: int = 50):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"unknown scan log policy: {policy}")
+        self.flush_sec = flush_ms / 1000.0
+        self.batch = batch
+        self.policy = policy
+        self.block_sec = block_ms / 1000.0
+        self._q: queue.Queue = queue.Queue(maxsize=queue_max)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.written = 0
+        self.dropped = 0          # queue full
+        self.failed = 0           # batch insert failed
+        self.flushes = 0
+
+    # ---------- producer side ----------
+    def put(self, token: str, result: str, user_hint: str, gate: str | None = None) -> bool:
+        """Enqueue one row. Returns False if it was dropped."""
+        row = {"token": token, "result": result, "user_hint": user_hint, "gate": gate, "ts": datetime.utcnow()}
+        try:
+            if self.policy == "block":
+                self._q.put(row, timeout=self.block_sec)
+            else:
+                self._q.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def depth(self) -> int:
+        return self._q.qsize()
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scan-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer after draining everything already queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # ---------- writer thread ----------
+    def _take_batch(self) -> list[dict]:
+        rows = []
+        deadline = time.monotonic() + self.flush_sec
+        while len(rows) < self.batch and not self._stop.is_set():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:   # short waits so stop() does not sit out a whole flush interval
+                rows.append(self._q.get(timeout=min(timeout, STOP_POLL_SEC)))
+            except queue.Empty:
+                continue
+        return rows
+
+    def _drain_now(self) -> list[dict]:
+        rows = []
+        while len(rows) < self.batch:
+            try:
+                rows.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows: list[dict]):
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(ScanLog.__table__), rows)
+                scan_analytics.record_rollup(conn, rows)
+            self.written += len(rows)
+            self.flushes += 1
+        except Exception as e:
+            self.failed += len(rows)
+            print("Scan log flush fail:", len(rows), "rows lost:", e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rows = self._take_batch()
+            if rows:
+                self._write(rows)
+        while True:   # drain on shutdown
+            rows = self._drain_now()
+            if not rows:
+                break
+            self._write(rows)
+
+
+sink: ScanLogSink | None = None
@@ -0,0 +1,65 @@
+# app/signed_payload.py
+# Signed QR payloads that a gate can check without the server.
+#
+#   ISSUER|token|exp|max_scans|sig
+#     exp  = expiry as unix seconds (0 = no expiry)
+#     sig  = HMAC-SHA256(key, "ISSUER|token|exp|max_scans"), first 16 bytes, base64url
+#
+# The plain "ISSUER|token" format stays valid; signing is on when
+# settings.QR_SIGNING_KEY is set. The key is shared with the scanners, so
+# they must be trusted devices. Standard library only: gate_scanner imports
+# this module directly.
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import base64
+import hashlib
+import hmac
+
+SIG_BYTES = 16
+
+
+@dataclass(frozen=True)
+class SignedPass:
+    issuer: str
+    token: str
+    exp: int          # unix seconds, 0 = no expiry
+    max_scans: int
+    sig: str
+
+    @property
+    def message(self) -> str:
+        return f"{self.issuer}|{self.token}|{self.exp}|{self.max_scans}"
+
+
+def _mac(key: bytes, message: str) -> str:
+    digest = hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()[:SIG_BYTES]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def exp_seconds(expires_at: datetime | None) -> int:
+    """Naive-UTC (as stored) or aware datetime -> unix seconds; None -> 0."""
+    if expires_at is None:
+        return 0
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return int(expires_at.timestamp())
+
+
+def sign(key: bytes, issuer: str, token: str, expires_at: datetime | None, max_scans: int) -> str:
+    msg = f"{issuer}|{token}|{exp_seconds(expires_at)}|{max_scans}"
+    return f"{msg}|{_mac(key, msg)}"
+
+
+def is_signed(payload: str) -> bool:
+    return payload.count("|") == 4
+
+
+def unpack(payload: str) -> SignedPass:
+    """Split a signed payload. Raises ValueError if it is malformed (signature NOT checked)."""
+    issuer, token, exp, max_scans, sig = payload.split("|")
+    return SignedPass(issuer, token, int(exp), int(max_scans), sig)
+
+
+def valid(key: bytes, sp: SignedPass) -> bool:
+    return hmac.compare_digest(_mac(key, sp.message), sp.sig)
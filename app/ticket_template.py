@@ -0,0 +1,195 @@
+# app/ticket_template.py
+# Precompiled ESC/POS ticket bytes.
+#
+# app/printer.py::_write_ticket builds a ticket with ~20 python-escpos calls
+# (set/text/image/cut), each going through MagicEncode and the device.
+# Here the static parts (header, separators, footer, cut, native-QR command
+# prefix) are rendered ONCE; a ticket is then just those bytes + the encoded
+# variable fields, joined into one buffer for a single sendall().
+#
+# Text must come out byte-for-byte as MagicEncode would write it. MagicEncode
+# is stateful (current code page + code pages used so far), so the field
+# encoder below replays its algorithm on an explicit state and memoises the
+# result per (text, state) - the field labels are encoded once per state.
+#
+# python-escpos (and its printer capability database, the slowest import of the
+# app) is loaded when the first template is compiled, not at import time.
+
+from functools import lru_cache
+import re
+import threading
+
+_CJK = re.compile(r"[\u4e00-\u9fa5]")   # same shortcut MagicEncode takes
+
+HEADER_TITLE = "Giris QR Kodu\n"
+SEPARATOR = "-----------------------\n"
+FOOTER = "Teknik Departmant Destekli\n"
+
+QR_SIZE = 8                # native QR dot size, as in printer._native_qr
+PRIMED_MAX = 1024          # bitmap QRs handed over by the token pool, not printed yet
+
+
+class _FieldEncoder:
+    """MagicEncode.write() as a pure function of (text, encoding, used_encodings)."""
+
+    def __init__(self, codepages: dict):
+        from escpos.constants import CODEPAGE_CHANGE
+        from escpos.magicencode import Encoder
+
+        self._codepage_change = CODEPAGE_CHANGE
+        self._enc = Encoder(codepages)
+        self._items = list(codepages.items())
+
+    def _writable(self, text: str, encoding: str | None) -> int:
+        """Length of the prefix of text that `encoding` can write (split_writable_text)."""
+        if not encoding:
+            return 0
+        for i, ch in enumerate(text):
+            if not self._enc.can_encode(encoding, ch):
+                return i
+        return len(text)
+
+    @lru_cache(maxsize=4096)
+    def _find(self, ch: str, used: frozenset) -> str | None:
+        # Encoder.find_suitable_encoding: used code pages first, then by slot
+        for name, _ in sorted(self._items, key=lambda item: (item[0] not in used, item[1])):
+            if self._enc.can_encode(name, ch):
+                return name
+        return None
+
+    @lru_cache(maxsize=8192)
+    def write(self, text: str, encoding: str | None, used: frozenset):
+        """-> (bytes, encoding_after, used_after)"""
+        if _CJK.search(text):
+            return text.encode("GB18030"), encoding, used
+        if encoding and text.isascii():
+            return text.encode("ascii"), encoding, used
+
+        out = []
+        n = self._writable(text, encoding)
+        if n:
+            out.append(self._enc.encode(text[:n], encoding))
+        rest = text[n:]
+        while rest:
+            new = self._find(rest[0], used)
+            if not new:   # no code page has it: write the default symbol instead
+                b, encoding, used = self.write("?", encoding, used)
+                out.append(b)
+                rest = rest[1:]
+                continue
+            used = used | {new}
+            n = self._writable(rest, new)
+            if n:
+                if new != encoding:
+                    out.append(self._codepage_change + bytes([self._enc.get_sequence(new)]))
+                    encoding = new
+                out.append(self._enc.encode(rest[:n], new))
+            rest = rest[n:]
+        return b"".join(out), encoding, used
+
+
+class TicketTemplate:
+    """
+    Ticket bytes identical to printer._write_ticket on a fresh printer.
+    qr_mode: "bitmap" - what _write_ticket actually prints (the native call is
+                        rejected by python-escpos, so it always falls back)
+             "native" - printer-side QR (GS ( k); needs printer support
+    """
+
+    def __init__(self, qr_mode: str = "bitmap"):
+        if qr_mode not in ("bitmap", "native"):
+            raise ValueError(f"unknown qr_mode: {qr_mode}")
+        self.qr_mode = qr_mode
+        from escpos.constants import QR_ECLEVEL_M, QR_MODEL_2
+        from escpos.printer import Dummy
+
+        p = Dummy()
+        p.set(align="center", width=2, height=2, bold=True)
+        p.text(HEADER_TITLE)
+        p.set(align="center", bold=False)
+        p.text(SEPARATOR)
+        self.header = p.output
+        # MagicEncode state after the header; every field is encoded from here
+        self._state = (p.magic.encoding, frozenset(p.magic.encoder.used_encodings))
+        self._fields = _FieldEncoder(p.profile.get_code_pages())
+
+        p = Dummy()
+        p.set(align="left")
+        self.after_qr = b"\n" + p.output     # ASCII: no code page switch once one is selected
+
+        p = Dummy()
+        p.cut()
+        self.footer = (SEPARATOR + FOOTER).encode("ascii") + p.output
+
+        # native QR: model / dot size / error correction never change
+        p = Dummy()
+        p.qr("x", size=QR_SIZE, ec=QR_ECLEVEL_M, model=QR_MODEL_2, native=True)
+        raw = p.output
+        store = raw.index(b"1P0")                   # "store data": GS ( k pL pH 1 P 0 <data>
+        self.qr_prefix = raw[:store - 5]
+        self.qr_suffix = raw[store + 3 + len(b"x"):]   # "print symbol" command
+
+    def qr_bytes(self, payload: str) -> bytes:
+        if self.qr_mode == "native":
+            data = payload.encode("utf-8")
+            n = len(data) + 3
+            return (self.qr_prefix + b"\x1d(k" + bytes([n & 0xFF, n >> 8]) + b"1P0" + data
+                    + self.qr_suffix)
+        qr = _take_primed(payload)
+        return qr if qr is not None else _bitmap_bytes(payload)
+
+    def render(self, payload: str, info: dict) -> bytes:
+        parts = [self.header, self.qr_bytes(payload), self.after_qr]
+        encoding, used = self._state
+        write = self._fields.write
+        for k, v in info.items():
+            v = "" if v is None else str(v)
+            b, encoding, used = write(f"{k}: ", encoding, used)   # label: memoised per state
+            parts.append(b)
+            b, encoding, used = write(f"{v}\n", encoding, used)
+            parts.append(b)
+        parts.append(self.footer)
+        return b"".join(parts)
+
+
+def bitmap_qr(payload: str) -> bytes:
+    """The ticket's bitmap QR as ESC/POS bytes (uncached)."""
+    from escpos.printer import Dummy
+    from app.printer import _bitmap_qr
+    p = Dummy()
+    _bitmap_qr(p, payload)
+    return p.output
+
+
+_bitmap_bytes = lru_cache(maxsize=256)(bitmap_qr)
+
+# Pre-rendered bitmap QRs (app/token_pool.py): used once by the ticket they were
+# rendered for, so they stay out of the LRU above.
+_primed: dict[str, bytes] = {}
+_primed_lock = threading.Lock()
+
+
+def prime(payload: str, qr: bytes):
+    """Hand over bitmap_qr(payload) rendered ahead of time; the next render() of payload uses it."""
+    with _primed_lock:
+        if len(_primed) >= PRIMED_MAX:       # tickets that never got printed
+            del _primed[next(iter(_primed))]
+        _primed[payload] = qr
+
+
+def _take_primed(payload: str) -> bytes | None:
+    if not _primed:
+        return None
+    with _primed_lock:
+        return _primed.pop(payload, None)
+
+
+_templates: dict[str, TicketTemplate] = {}
+
+
+def get(qr_mode: str = "bitmap") -> TicketTemplate:
+    """Compiled template for qr_mode (built on first use)."""
+    t = _templates.get(qr_mode)
+    if t is None:
+        t = _templates[qr_mode] = TicketTemplate(qr_mode)
+    return t
@@ -0,0 +1,90 @@
+# app/tickets.py
+# Ticket helpers shared by the sync (app.main) and async (app.async_api) paths.
+
+from datetime import datetime, timedelta
+from hashlib import sha256
+from uuid import uuid4
+from zoneinfo import ZoneInfo
+
+from app import signed_payload
+from app.config import TIMEZONE, settings
+
+# ---------- Constants ----------
+ISSUER = "BenimGiriş"  # payload issuer string for QR data
+
+PERSON_FIELDS = ("employee_id", "full_name", "email", "role", "department")
+
+POOLED = "pooled"   # pre-issued, not handed out yet (app/token_pool.py); verifies as not_found
+
+def token_row(now: datetime, minutes_valid: int, max_scans: int, person: dict, token: str | None = None):
+    """Column values for a new QRToken row + the aware expiry (or None)."""
+    exp = (now + timedelta(minutes=minutes_valid)) if minutes_valid and minutes_valid > 0 else None
+    row = {
+        "token": token or str(uuid4()),
+        "issued_at": now.replace(tzinfo=None),       # store naive UTC in SQLite
+        "expires_at": exp.replace(tzinfo=None) if exp else None,
+        "status": "active",
+        "max_scans": max_scans,
+        "scan_count": 0,
+    }
+    for f in PERSON_FIELDS:
+        row[f] = person.get(f)
+    return row, exp
+
+def qr_payload(token: str, expires_at: datetime | None = None, max_scans: int = 1) -> str:
+    """What the QR encodes: ISSUER|token, or the signed form when QR_SIGNING_KEY is set."""
+    if not settings.QR_SIGNING_KEY:
+        return f"{ISSUER}|{token}"
+    return signed_payload.sign(settings.QR_SIGNING_KEY.encode("utf-8"), ISSUER, token,
+                               expires_at, max_scans)
+
+def payload_tag() -> str:
+    """Changes with the signing key (QR images of the same token differ per key)."""
+    key = settings.QR_SIGNING_KEY
+    return sha256(key.encode("utf-8")).hexdigest()[:8] if key else "plain"
+
+def split_payload(p: str) -> tuple[str | None, str | None]:
+    """Scanned payload -> (token, denial reason or None)."""
+    try:
+        issuer, token = p.split("|", 1)
+    except ValueError:
+        return None, "bad_payload"
+    if issuer != ISSUER:
+        return token, "wrong_issuer"
+    if "|" not in token:
+        return token, None
+    try:
+        sp = signed_payload.unpack(p)
+    except ValueError:
+        return None, "bad_payload"
+    key = settings.QR_SIGNING_KEY
+    if not key or not signed_payload.valid(key.encode("utf-8"), sp):
+        return sp.token, "bad_signature"
+    return sp.token, None
+
+def gate_of(body: dict) -> str | None:
+    """Optional scanner id ("gate") sent along with a verify request; stored on its scan logs."""
+    gate = body.get("gate")
+    return str(gate)[:64] if gate not in (None, "") else None
+
+def expiry_local_str(exp: datetime | None) -> str:
+    """LOCAL time string for UI/print."""
+    if not exp:
+        return "No expiry"
+    try:
+        local_tz = ZoneInfo(TIMEZONE)
+    except Exception:
+        local_tz = datetime.now().astimezone().tzinfo
+    return exp.astimezone(local_tz).strftime("%Y-%m-%d %H:%M:%S")
+
+def ticket_info(row: dict, exp_local_str: str) -> dict:
+    """The print_info block shown in the web UI and printed on the ticket."""
+    return {
+        "Kullancı Adı": row["full_name"],
+        "Eposta": row["email"],
+        "Görev": row["role"],
+        "Kullancı No": row["employee_id"],
+        "Bölüm": row["department"],
+        "Aktif Okuma Sureci(Local)": exp_local_str,
+        "Maksımum Okuma": row["max_scans"],
+    }
@@ -0,0 +1,198 @@
+# app/token_index.py
+# In-process hot index of tokens for /qr/verify (settings.VERIFY_MODE = "index").
+#
+# Gate decisions are taken from memory under one lock; the new scan_count /
+# status is written back to qr_tokens by a background thread in batches.
+#
+# Consistency story (single uvicorn worker only):
+#   - This process owns scan_count/status of every token it has loaded. All
+#     decisions go through one lock, so concurrent turnstiles can never push a
+#     token past max_scans.
+#   - The DB lags the index by at most one flush interval (INDEX_FLUSH_MS).
+#     Values written back are absolute (not deltas), so a flush is idempotent.
+#   - stop() drains pending write-backs. A hard crash loses at most the last
+#     interval of increments: after restart the DB under-counts those scans,
+#     so a pass may be admitted up to (lost increments) extra times.
+#   - Entries leave the index once a flush has written them passive, and
+#     every EVICT_SEC once expired (only a deny is left for them; a late scan
+#     reloads the row and marks it passive), so memory follows the live
+#     tokens, not everything ever issued.
+#   - Changes made to qr_tokens by other processes are NOT seen for tokens
+#     already in the index. Use VERIFY_MODE="db" for multi-worker setups.
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from time import monotonic
+import threading
+
+from sqlalchemy import bindparam, select, update
+
+from app.db import SessionLocal
+from app.models import QRToken
+from app.tickets import POOLED
+
+EVICT_SEC = 60.0        # how often the writer thread drops expired entries
+
+
+@dataclass
+class _Entry:
+    status: str
+    expires_at: datetime | None      # naive UTC, as stored
+    scan_count: int
+    max_scans: int
+    hint: str
+
+
+def _entry_from(status, expires_at, scan_count, max_scans, employee_id, full_name) -> _Entry:
+    return _Entry(status or "active", expires_at, scan_count or 0, max_scans or 1,
+                  employee_id or full_name or "")
+
+
+class TokenIndex:
+    def __init__(self, flush_ms: int = 200):
+        self.flush_sec = flush_ms / 1000.0
+        self._entries: dict[str, _Entry] = {}
+        self._dirty: dict[str, tuple[int, str]] = {}   # token -> (scan_count, status)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    # ---------- lifecycle ----------
+    def start(self):
+        """Load all active tokens and start the write-back thread."""
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(QRToken.token, QRToken.status, QRToken.expires_at, QRToken.scan_count,
+                       QRToken.max_scans, QRToken.employee_id, QRToken.full_name)
+                .where(QRToken.status == "active")
+            ).all()
+        with self._lock:
+            for r in rows:
+                self._entries.setdefault(r[0], _entry_from(*r[1:]))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="token-index-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, token: str) -> bool:
+        return token in self._entries
+
+    # ---------- writes from issue ----------
+    def put(self, row: dict):
+        """Register a freshly issued token (row = QRToken column values)."""
+        e = _entry_from(row["status"], row["expires_at"], row["scan_count"], row["max_scans"],
+                        row.get("employee_id"), row.get("full_name"))
+        with self._lock:
+            self._entries[row["token"]] = e
+
+    # ---------- verify ----------
+    def _load(self, token: str) -> _Entry | None:
+        with SessionLocal() as db:
+            r = db.execute(
+                select(QRToken.status, QRToken.expires_at, QRToken.scan_count,
+                       QRToken.max_scans, QRToken.employee_id, QRToken.full_name)
+                .where(QRToken.token == token, QRToken.status.is_distinct_from(POOLED))
+            ).first()
+        return _entry_from(*r) if r else None
+
+    def verify(self, token: str, now: datetime | None = None):
+        """
+        Same rules as verify_qr. Returns (response_body, scan_log_result, user_hint).
+        """
+        now = (now or datetime.now(timezone.utc)).replace(tzinfo=None)
+
+        with self._lock:
+            e = self._entries.get(token)
+        if e is None:
+            self.misses += 1
+            loaded = self._load(token)   # DB read outside the lock
+            if loaded is None:
+                return {"ok": False, "reason": "not_found"}, "denied:not_found", None
+            with self._lock:
+                e = self._entries.setdefault(token, loaded)
+        else:
+            self.hits += 1
+
+        with self._lock:
+            if e.status != "active":
+                return {"ok": False, "reason": "passive"}, "denied:passive", None
+
+            if e.expires_at and now > e.expires_at:
+                e.status = "passive"
+                self._dirty[token] = (e.scan_count, e.status)
+                return {"ok": False, "reason": "expired"}, "denied:expired", None
+
+            if e.scan_count >= e.max_scans:
+                e.status = "passive"
+                self._dirty[token] = (e.scan_count, e.status)
+                return {"ok": False, "reason": "max_scans_reached"}, "denied:max_scans_reached", None
+
+            e.scan_count += 1
+            if e.scan_count >= e.max_scans:
+                e.status = "passive"
+            self._dirty[token] = (e.scan_count, e.status)
+            return {"ok": True, "scan_count": e.scan_count, "status": e.status}, "allowed", e.hint
+
+    # ---------- write-back ----------
+    def flush(self) -> int:
+        """Write pending decisions to qr_tokens in one executemany. Returns rows written."""
+        with self._lock:
+            pending, self._dirty = self._dirty, {}
+        if not pending:
+            return 0
+        stmt = (
+            update(QRToken.__table__)
+            .where(QRToken.__table__.c.token == bindparam("t"))
+            .values(scan_count=bindparam("c"), status=bindparam("s"))
+        )
+        rows = [{"t": t, "c": c, "s": s} for t, (c, s) in pending.items()]
+        try:
+            with SessionLocal() as db:
+                db.execute(stmt, rows)
+                db.commit()
+        except Exception as e:
+            print("Token index flush fail:", e)
+            with self._lock:
+                for t, v in pending.items():    # retry next round; newer values win
+                    self._dirty.setdefault(t, v)
+            return 0
+        # passive tokens will only ever be denied; no need to keep them hot
+        with self._lock:
+            for t, (_, s) in pending.items():
+                if s != "active" and t not in self._dirty:
+                    self._entries.pop(t, None)
+        return len(rows)
+
+    def evict_expired(self, now: datetime | None = None) -> int:
+        """Drop entries past expires_at that have nothing left to write. Returns entries dropped."""
+        now = (now or datetime.now(timezone.utc)).replace(tzinfo=None)
+        with self._lock:
+            gone = [t for t, e in self._entries.items()
+                    if e.expires_at and now > e.expires_at and t not in self._dirty]
+            for t in gone:
+                del self._entries[t]
+        self.evicted += len(gone)
+        return len(gone)
+
+    def _run(self):
+        next_evict = monotonic() + EVICT_SEC
+        while not self._stop.wait(self.flush_sec):
+            self.flush()
+            if monotonic() >= next_evict:
+                self.evict_expired()
+                next_evict = monotonic() + EVICT_SEC
+
+
+index: TokenIndex | None = None
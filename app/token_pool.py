@@ -0,0 +1,211 @@
+# app/token_pool.py
+# Pre-issued tokens for /qr/issue (settings.TOKEN_POOL_HIGH > 0).
+#
+# A background thread keeps up to `high` qr_tokens rows with status "pooled"
+# (no person, no expiry) and their QR already rendered in memory: the preview
+# PNG and, for bitmap tickets, the ESC/POS QR bytes. Issuing one is then a
+# single conditional UPDATE binding the person fields, expiry and max_scans
+# (WHERE status = 'pooled', so a row is handed out at most once, also across
+# workers) - no UUID, INSERT, refresh or QR encoding while the person waits.
+#
+# Watermarks: once fewer than `low` tokens are ready the thread tops the pool
+# up to `high`, in INSERTs of `batch` rows, and only while issuance has been
+# quiet for `idle_ms` - during a rush it stays out of the way and an empty
+# pool just means the normal issue path.
+#
+# Pooled rows are not passes: verify, status and /qr/png answer not_found.
+# The payload of a signed QR (QR_SIGNING_KEY) contains expiry and max_scans,
+# so then only the rows are pooled and the QR is rendered at issue time.
+#
+# Restart: the rendered QRs are only in memory, the rows stay in the DB. On
+# start the pool adopts the oldest pooled rows (re-rendering them) and deletes
+# the ones beyond what the workers can adopt. With WORKERS > 1 two workers may
+# adopt the same row; the conditional UPDATE lets one of them have it and the
+# other moves on to its next token ("conflict").
+
+from collections import deque
+from datetime import datetime, timezone
+from time import monotonic
+from typing import NamedTuple
+import threading
+
+from sqlalchemy import delete, insert, select, update
+
+from app import metrics, qr_render, ticket_template
+from app.config import settings
+from app.db import engine
+from app.models import QRToken
+from app.tickets import POOLED, qr_payload, token_row
+
+_t = QRToken.__table__
+
+
+class Pooled(NamedTuple):
+    token: str
+    png: bytes | None      # preview PNG of the unsigned payload
+    qr: bytes | None       # bitmap ticket QR of the unsigned payload
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def discard_all() -> int:
+    """Delete every pooled row (pool turned off). Returns rows deleted."""
+    with engine.begin() as conn:
+        return conn.execute(delete(_t).where(_t.c.status == POOLED)).rowcount
+
+
+class TokenPool:
+    def __init__(self, high: int = 200, low: int = 50, batch: int = 50, idle_ms: int = 250,
+                 workers: int = 1, prime_tickets: bool = True):
+        if not 0 <= low < high:
+            raise ValueError(f"token pool watermarks need 0 <= low < high (low={low}, high={high})")
+        self.high = high
+        self.low = low
+        self.batch = max(1, batch)
+        self.idle_sec = idle_ms / 1000.0
+        self.workers = workers
+        self.prime_tickets = prime_tickets     # only if this process prints its own tickets
+        self._ready: deque[Pooled] = deque()
+        self._filling = False
+        self._last_take = 0.0
+        self._wake = threading.Event()
+        self._halt = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.adopted = 0
+        self.discarded = 0
+        self.created = 0
+        self.refills = 0
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self._halt.clear()
+        self._thread = threading.Thread(target=self._run, name="token-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop refilling; the unused rows stay pooled for the next start."""
+        self._halt.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        try:
+            self.reclaim()
+        except Exception as e:
+            print("Token pool reclaim fail:", e)
+        while not self._halt.is_set():
+            if not self._needs_fill():
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            busy = self._last_take + self.idle_sec - monotonic()
+            if busy > 0:
+                self._halt.wait(busy)
+                continue
+            try:
+                self.refill_batch()
+            except Exception as e:
+                print("Token pool refill fail:", e)
+                self._halt.wait(1.0)
+
+    def _needs_fill(self) -> bool:
+        n = len(self._ready)
+        if n < self.low or n == 0:
+            self._filling = True
+        elif n >= self.high:
+            self._filling = False
+        return self._filling
+
+    # ---------- fill ----------
+    def _render(self, token: str) -> Pooled:
+        if settings.QR_SIGNING_KEY:
+            return Pooled(token, None, None)
+        payload = qr_payload(token)
+        qr = ticket_template.bitmap_qr(payload) if self.prime_tickets else None
+        return Pooled(token, qr_render.png_bytes(payload), qr)
+
+    def reclaim(self) -> int:
+        """Adopt pooled rows left by a previous run; delete those no worker will adopt."""
+        with engine.begin() as conn:
+            tokens = conn.execute(
+                select(_t.c.token).where(_t.c.status == POOLED).order_by(_t.c.id)
+            ).scalars().all()
+            surplus = tokens[self.high * self.workers:]
+            for i in range(0, len(surplus), 500):
+                conn.execute(delete(_t).where(_t.c.token.in_(surplus[i:i + 500]), _t.c.status == POOLED))
+        self.discarded += len(surplus)
+        for token in tokens[:self.high]:
+            if self._halt.is_set():
+                break
+            self._ready.append(self._render(token))
+            self.adopted += 1
+        return len(tokens[:self.high])
+
+    def refill_batch(self) -> int:
+        """INSERT and render up to `batch` tokens. Returns tokens added."""
+        n = min(self.batch, self.high - len(self._ready))
+        if n <= 0:
+            return 0
+        with metrics.stage("pool_refill"):
+            rows = [{**token_row(_utcnow(), 0, 1, {})[0], "status": POOLED} for _ in range(n)]
+            with engine.begin() as conn:
+                conn.execute(insert(_t), rows)
+            ready = [self._render(r["token"]) for r in rows]
+        self._ready.extend(ready)
+        self.created += n
+        self.refills += 1
+        return n
+
+    # ---------- issue ----------
+    def take(self, now: datetime, minutes_valid: int, max_scans: int, person: dict):
+        """
+        Bind a pooled token to person / expiry / max_scans.
+        -> (row, aware expiry, preview PNG or None) like token_row(), or None when the pool is empty.
+        """
+        self._last_take = monotonic()
+        while True:
+            try:
+                entry = self._ready.popleft()
+            except IndexError:
+                self.misses += 1
+                self._wake.set()
+                return None
+            if len(self._ready) < self.low:
+                self._wake.set()
+            row, exp = token_row(now, minutes_valid, max_scans, person, token=entry.token)
+            with metrics.stage("pool_bind"), engine.begin() as conn:
+                n = conn.execute(
+                    update(_t)
+                    .where(_t.c.token == entry.token, _t.c.status == POOLED)
+                    .values({k: v for k, v in row.items() if k != "token"})
+                ).rowcount
+            if n:
+                break
+            self.conflicts += 1      # another worker issued it (or it was discarded)
+        self.hits += 1
+        if entry.png is None:        # signed payload: rendered by the caller
+            return row, exp, None
+        if entry.qr is not None:
+            ticket_template.prime(qr_payload(entry.token), entry.qr)
+        return row, exp, entry.png
+
+    def status(self) -> dict:
+        return {
+            "ready": len(self._ready), "high": self.high, "low": self.low, "filling": self._filling,
+            "hits": self.hits, "misses": self.misses, "conflicts": self.conflicts,
+            "created": self.created, "refills": self.refills,
+            "adopted": self.adopted, "discarded": self.discarded,
+        }
+
+
+pool: TokenPool | None = None
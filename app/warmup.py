@@ -0,0 +1,109 @@
+# app/warmup.py
+# Startup warm-ups, run concurrently so a restart gets back to the gates fast.
+#
+# The heavy libraries (qrcode, Pillow, python-escpos) are imported on first
+# use, so `import app.main` is cheap. With settings.WARMUP = "background" the
+# steps below run on their own threads while the server already answers
+# /health and /qr/verify (neither needs them); GET /ready reports progress
+# and turns 200 once every step has finished and the DB step succeeded.
+#
+#   "blocking" - same steps, concurrently, but startup waits for them
+#   "off"      - nothing is pre-loaded; the first issue/print pays for it
+
+from typing import Callable
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.config import TIMEZONE, settings
+from app.db import SessionLocal
+
+REQUIRED = {"db"}          # a failure here keeps /ready at 503
+
+
+def _warm_db():
+    with SessionLocal() as db:
+        db.execute(text("SELECT 1"))
+
+
+def _warm_tz():
+    from zoneinfo import ZoneInfo
+    ZoneInfo(TIMEZONE)
+
+
+def _warm_qr():
+    from app import qr_render
+    qr_render.png_bytes("warmup-payload")       # qrcode + Pillow + PNG encoder
+
+
+def _warm_ticket():
+    from app import ticket_template
+    ticket_template.get(settings.PRINT_QR_MODE)   # python-escpos + printer profiles
+
+
+STEPS: dict[str, Callable[[], None]] = {
+    "db": _warm_db,
+    "tz": _warm_tz,
+    "qr": _warm_qr,
+    "ticket": _warm_ticket,
+}
+
+
+class Warmup:
+    def __init__(self, steps: dict[str, Callable[[], None]] | None = None):
+        self.steps = STEPS if steps is None else steps
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._state = {name: {"state": "pending", "ms": None, "error": None} for name in self.steps}
+        self._threads: list[threading.Thread] = []
+        self.total_ms: float | None = None      # start -> last step finished
+
+    def start(self) -> "Warmup":
+        for name, fn in self.steps.items():
+            t = threading.Thread(target=self._run, args=(name, fn), name=f"warmup-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def wait(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self._threads:
+            t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return self.finished
+
+    def _run(self, name: str, fn: Callable[[], None]):
+        with self._lock:
+            self._state[name]["state"] = "running"
+        t0 = time.perf_counter()
+        try:
+            fn()
+            state, error = "done", None
+        except Exception as e:
+            print(f"Warm {name} fail:", e)
+            state, error = "failed", str(e)
+        now = time.perf_counter()
+        with self._lock:
+            self._state[name].update(state=state, error=error, ms=round((now - t0) * 1000, 1))
+            if all(s["state"] in ("done", "failed") for s in self._state.values()):
+                self.total_ms = round((now - self.started) * 1000, 1)
+
+    @property
+    def finished(self) -> bool:
+        with self._lock:
+            return all(s["state"] in ("done", "failed") for s in self._state.values())
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return (all(s["state"] in ("done", "failed") for s in self._state.values())
+                    and all(self._state[n]["state"] == "done" for n in REQUIRED if n in self._state))
+
+    def report(self) -> dict:
+        ready = self.ready
+        with self._lock:
+            steps = {n: dict(s) for n, s in self._state.items()}
+        return {"ready": ready, "total_ms": self.total_ms, "steps": steps}
+
+
+runner: Warmup | None = None
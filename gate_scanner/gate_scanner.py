@@ -1,33 +1,74 @@
 # gate_scanner/gate_scanner.py
 # Webcam QR scanner using OpenCV with small window and 10s lock + voice on allow.
+#
+# Capture, decode and verify run on their own threads (see pipeline.py); the
+# UI thread only draws and shows frames, so a slow backend never freezes the
+# preview. Overlay: camera fps | decode fps + capture->decode latency | verify ms.
+#
+#   python gate_scanner/gate_scanner.py                      # webcam
+#   python gate_scanner/gate_scanner.py --bench clip.mp4     # offline replay benchmark
+#   python gate_scanner/gate_scanner.py --bench sample       # ...on a generated clip
 
-import cv2
-import requests
-import time
-import winsound  # on non-Windows you can remove or wrap in try/except
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
 import threading
-import pyttsx3
+import time
+from pathlib import Path
+
+import cv2
+
+try:
+    import winsound
+except ImportError:   # not Windows: no beeps
+    winsound = None
+
+from pipeline import (DECODE_MAX_WIDTH, CaptureThread, DecodeWorker, LatestFrame,
+                      VerifyWorker, median_ms)
+from offline import OfflineValidator
+from verify_client import VerifyClient
 
 API_BASE = "http://127.0.0.1:8000"   # FastAPI server
 ISSUER   = "BenimGiriş"           # must match app.main.py
 DISPLAY_HOLD_SEC = 10.0              # keep result on screen
+# Same key as the server's QR_SIGNING_KEY: signed passes are then decided
+# locally (offline.py) and reconciled with the server in the background.
+SIGNING_KEY  = os.environ.get("QR_SIGNING_KEY", "")
+JOURNAL_PATH = os.environ.get("SCAN_JOURNAL", str(Path(__file__).with_name("scan_journal.jsonl")))
+# Sent with every scan; the server's scan logs / hourly counts are per gate
+GATE_ID = os.environ.get("GATE_ID") or socket.gethostname()
 
 # ---------------- TTS (Text-to-Speech) setup ----------------
-_tts_engine = pyttsx3.init()  # uses Windows SAPI on Windows
-# Try to select a Turkish voice if available
-try:
-    for v in _tts_engine.getProperty("voices"):
-        desc = f"{v.name} | {v.id}".lower()
-        if "tr" in desc or "turk" in desc:
-            _tts_engine.setProperty("voice", v.id)
-            break
-except Exception:
-    pass
-_tts_engine.setProperty("rate", 180)   # speed (150–200 typical)
-_tts_engine.setProperty("volume", 1.0) # 0.0–1.0
+_tts_engine = None
+
+def init_tts():
+    """Start the speech engine (Windows SAPI on Windows); no voice if unavailable."""
+    global _tts_engine
+    try:
+        import pyttsx3
+        _tts_engine = pyttsx3.init()
+    except Exception as e:
+        print("TTS disabled:", e)
+        return
+    # Try to select a Turkish voice if available
+    try:
+        for v in _tts_engine.getProperty("voices"):
+            desc = f"{v.name} | {v.id}".lower()
+            if "tr" in desc or "turk" in desc:
+                _tts_engine.setProperty("voice", v.id)
+                break
+    except Exception:
+        pass
+    _tts_engine.setProperty("rate", 180)   # speed (150–200 typical)
+    _tts_engine.setProperty("volume", 1.0) # 0.0–1.0
 
 def speak_async(text: str):
     """Speak without blocking the camera loop."""
+    if _tts_engine is None:
+        return
     def _run():
         try:
             _tts_engine.say(text)
@@ -35,17 +76,28 @@ def speak_async(text: str):
         except Exception:
             pass
     threading.Thread(target=_run, daemon=True).start()
+
+def beep(freq: int, ms: int):
+    if winsound is None:
+        return
+    try:
+        winsound.Beep(freq, ms)
+    except Exception:
+        pass
 # ------------------------------------------------------------
 
-def put_text(img, text, y, color=(0, 255, 0)):
-    cv2.putText(img, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2, cv2.LINE_AA)
+def put_text(img, text, y, color=(0, 255, 0), scale=0.7):
+    cv2.putText(img, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2 if scale >= 0.6 else 1, cv2.LINE_AA)
+
+# keep-alive pool + de-duplication of passes still in view (see verify_client.py)
+client = VerifyClient(API_BASE, timeout=3, gate=GATE_ID)
 
 def verify(payload: str):
-    try:
-        r = requests.post(f"{API_BASE}/qr/verify", json={"payload": payload}, timeout=3)
-        return r.json(), r.status_code
-    except Exception as e:
-        return {"ok": False, "reason": f"network_error:{e}"}, 0
+    return client.verify(payload)
+
+def to_payload(data: str) -> str:
+    # Accept either "ISSUER|token" or just "token"
+    return data if "|" in data else f"{ISSUER}|{data}"
 
 def open_camera_small():
     """Open camera with DirectShow (Windows), force ~420x340 resolution."""
@@ -58,95 +110,218 @@ def open_camera_small():
         cap.release()
     return None, None
 
+class GateState:
+    """Shared between the decode/verify threads and the UI thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lock_until   = 0.0            # timestamp when we unlock
+        self.locked_text  = ""             # text to display while locked
+        self.locked_color = (0, 200, 0)    # color of the locked message
+        self.points = None                 # last QR polygon (full-frame coords)
+        self.points_at = 0.0
+
+    def locked(self) -> bool:
+        return time.time() < self.lock_until
+
 def main():
     cap, idx = open_camera_small()
     if cap is None:
         print("Could not open any camera. Check permissions or try another index.")
         return
     print(f"Camera opened at index {idx}. Press 'q' to quit.")
+    init_tts()
+
+    offline = None
+    if SIGNING_KEY:
+        offline = OfflineValidator(SIGNING_KEY, ISSUER, JOURNAL_PATH,
+                                   send=VerifyClient(API_BASE, dedup_ttl_sec=0, gate=GATE_ID).verify)
+        client.local = offline.check
+        offline.start()
+        print(f"Offline decisions on; {offline.pending()} scans waiting for the server.")
 
     window_name = "QR Scanner"
     cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
     cv2.resizeWindow(window_name, 420, 340)
 
-    detector = cv2.QRCodeDetector()
+    state = GateState()
 
-    # --- Lock state (freeze result for DISPLAY_HOLD_SEC seconds) ---
-    lock_until   = 0.0            # timestamp when we unlock
-    locked_text  = ""             # text to display while locked
-    locked_color = (0, 200, 0)    # color of the locked message
+    def on_result(payload, resp, status, seconds):
+        if resp.get("cached"):
+            # ----- SAME PASS STILL IN VIEW: already decided, nothing consumed -----
+            text  = f"ALREADY CHECKED  {'allowed' if resp.get('ok') else resp.get('reason')}"
+            color = (0, 200, 255)
+        elif resp.get("ok"):
+            # ----- ALLOWED -----
+            text  = f"ALLOW  user_id={resp.get('user_id')}  scan={resp.get('scan_count')}  status={resp.get('status')}"
+            color = (0, 200, 0)
+        else:
+            # ----- DENIED -----
+            text  = f"DENY  reason={resp.get('reason')}"
+            color = (0, 0, 255)
+        with state.lock:
+            # Verify once and LOCK for DISPLAY_HOLD_SEC seconds
+            state.locked_text, state.locked_color = text, color
+            state.lock_until = time.time() + DISPLAY_HOLD_SEC
+        decoder.paused = True
+        if resp.get("cached"):
+            return                          # no sound for a repeat
+        if resp.get("ok"):
+            beep(1200, 150)
+            speak_async("Teşekkürler")     # voice feedback
+        else:
+            beep(400, 250)
+            # If you also want voice for denied, uncomment:
+            # speak_async("Yetkisiz giriş")
+
+    def on_detect(det):
+        with state.lock:
+            state.points, state.points_at = det.points, time.monotonic()
+        if det.data and not state.locked():
+            verifier.submit(to_payload(det.data))
 
+    buf = LatestFrame()
+    capture = CaptureThread(cap, buf)
+    decoder = DecodeWorker(buf, on_detect)
+    verifier = VerifyWorker(verify, on_result)
+    for t in (capture, decoder, verifier):
+        t.start()
+
+    seq = 0
     while True:
-        ok, frame = cap.read()
-        if not ok:
-            # Show an error in the window (rare)
-            put_text(frame if frame is not None else None, "Camera read failed...", 30, (0, 0, 255))
-            if frame is not None:
-                cv2.imshow(window_name, frame)
+        seq, frame, _ = buf.get(seq, timeout=0.5)
+        if frame is None:
+            if buf.closed:
+                print("Camera read failed...")
+                break
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
             continue
+        frame = frame.copy()      # the decode thread may still be reading the original
 
-        now = time.time()
+        with state.lock:
+            locked = state.locked()
+            text, color = state.locked_text, state.locked_color
+            pts = state.points if time.monotonic() - state.points_at < 0.3 else None
 
-        if now < lock_until:
+        if locked:
             # Still in the hold window: keep showing the last result
-            put_text(frame, locked_text, 30, locked_color)
+            put_text(frame, text, 30, color)
         else:
-            # Not locked: detect & decode a new QR
-            data, points, _ = detector.detectAndDecode(frame)
-
+            decoder.paused = False
             # Draw polygon around detected QR (if any)
-            if points is not None:
-                pts = points[0].astype(int)
+            if pts is not None:
+                pts = pts.astype(int)
                 for i in range(4):
                     p1 = tuple(pts[i]); p2 = tuple(pts[(i + 1) % 4])
                     cv2.line(frame, p1, p2, (255, 255, 0), 2)
-
-            if data:
-                data = data.strip()
-                # Accept either "ISSUER|token" or just "token"
-                if "|" in data:
-                    payload = data
-                else:
-                    payload = f"{ISSUER}|{data}"
-
-                # Verify once and LOCK for DISPLAY_HOLD_SEC seconds
-                resp, status = verify(payload)
-                if resp.get("ok"):
-                    # ----- ALLOWED -----
-                    locked_text  = f"ALLOW  user_id={resp.get('user_id')}  scan={resp.get('scan_count')}  status={resp.get('status')}"
-                    locked_color = (0, 200, 0)
-                    try:
-                        winsound.Beep(1200, 150)
-                    except Exception:
-                        pass
-                    # NEW: voice feedback
-                    speak_async("Teşekkürler")
-                else:
-                    # ----- DENIED -----
-                    locked_text  = f"DENY  reason={resp.get('reason')}"
-                    locked_color = (0, 0, 255)
-                    try:
-                        winsound.Beep(400, 250)
-                    except Exception:
-                        pass
-                    # If you also want voice for denied, uncomment:
-                    # speak_async("Yetkisiz giriş")
-
-                lock_until = now + DISPLAY_HOLD_SEC
-                put_text(frame, locked_text, 30, locked_color)
+            if verifier.busy:
+                put_text(frame, "Checking...", 30, (0, 200, 255))
             else:
                 # No QR detected and not locked
                 put_text(frame, "Show a QR code to the camera…", 30, (200, 200, 200))
 
+        put_text(frame, f"cam {capture.rate.value:4.1f} fps | decode {decoder.rate.value:4.1f} fps "
+                        f"{median_ms(decoder.latency)}ms | verify {median_ms(verifier.latency)}ms",
+                 frame.shape[0] - 40, (180, 180, 180), 0.45)
         put_text(frame, "Press 'q' to quit", frame.shape[0] - 15, (180, 180, 180))
         cv2.imshow(window_name, frame)
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
+    for t in (capture, decoder, verifier):
+        t.stop()
+    capture.join(2)
+    client.close()               # prints the latency histogram
+    if offline is not None:
+        offline.stop()
     cap.release()
     cv2.destroyAllWindows()
 
+# ---------------- Offline benchmark (replay a recorded clip) ----------------
+BENCH_CONFIGS = (
+    ("full",      0,                False),   # whole frame, as the old loop did
+    ("downscale", DECODE_MAX_WIDTH, False),
+    ("roi",       DECODE_MAX_WIDTH, True),
+)
+
+def make_sample(path: str, seconds: float = 8.0, size=(1280, 720), fps: int = 30):
+    """Synthetic gate clip: a QR pass drifting over a noisy background."""
+    import numpy as np
+    import qrcode
+
+    qr = np.array(qrcode.make(f"{ISSUER}|00000000-sample-token").convert("L").resize((260, 260)))
+    qr = cv2.cvtColor(qr, cv2.COLOR_GRAY2BGR)
+    w, h = size
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    rng = np.random.default_rng(0)
+    background = rng.integers(60, 140, (h, w, 3), dtype=np.uint8)
+    for i in range(int(seconds * fps)):
+        frame = background.copy()
+        if (i // fps) % 4 != 3:          # no QR in every 4th second
+            x = int((w - 260) * (0.5 + 0.4 * np.sin(i / 40)))
+            y = int((h - 260) * (0.5 + 0.3 * np.cos(i / 55)))
+            frame[y:y + 260, x:x + 260] = qr
+        out.write(frame)
+    out.release()
+
+def bench(path: str, realtime: bool = True, with_verify: bool = False):
+    """Replay `path` through the pipeline once per decode config; print one JSON line each."""
+    if path == "sample":
+        path = os.path.join(tempfile.mkdtemp(prefix="gate-bench-"), "sample.avi")
+        make_sample(path)
+
+    results = []
+    for name, max_width, use_roi in BENCH_CONFIGS:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            sys.exit(f"cannot open {path}")
+        found = []
+        buf = LatestFrame()
+        capture = CaptureThread(cap, buf, realtime=realtime)
+        decoder = DecodeWorker(buf, lambda det: det.data and found.append(det),
+                               max_width=max_width, use_roi=use_roi)
+        decoder.latency = []                      # keep every sample
+        verifier = None
+        if with_verify:
+            verifier = VerifyWorker(verify, lambda *a: None)
+            verifier.latency = []
+            verifier.start()
+            decoder.on_detect = lambda det: det.data and (found.append(det), verifier.submit(to_payload(det.data)))
+
+        t0 = time.monotonic()
+        capture.start(); decoder.start()
+        capture.join(); decoder.join()
+        wall = time.monotonic() - t0
+        cap.release()
+
+        lat = sorted(decoder.latency)
+        pct = lambda q: round(lat[min(len(lat) - 1, int(len(lat) * q))] * 1000, 2) if lat else None
+        r = {
+            "config": name,
+            "frames": capture.frames,
+            "decoded": decoder.decoded,
+            "dropped": capture.frames - decoder.decoded,
+            "with_qr": len(found),
+            "roi_hits": decoder.roi_hits,
+            "decode_fps": round(decoder.decoded / wall, 1),
+            "latency_p50_ms": pct(0.50),
+            "latency_p95_ms": pct(0.95),
+        }
+        if verifier is not None:
+            verifier.stop()
+            r["verify_p50_ms"] = median_ms(verifier.latency)
+        results.append(r)
+        print(json.dumps(r))
+    return results
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    ap = argparse.ArgumentParser(description="Gate QR scanner")
+    ap.add_argument("--bench", metavar="VIDEO", help="replay a clip (or 'sample') instead of the webcam")
+    ap.add_argument("--fast", action="store_true", help="bench: read frames as fast as possible")
+    ap.add_argument("--verify", action="store_true", help="bench: also call the verify API")
+    args = ap.parse_args()
+    if args.bench:
+        bench(args.bench, realtime=not args.fast, with_verify=args.verify)
+    else:
+        main()
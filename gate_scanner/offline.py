@@ -0,0 +1,165 @@
+# gate_scanner/offline.py
+# Local decisions for signed payloads (ISSUER|token|exp|max|sig, see
+# app/signed_payload.py), so the gate opens even when the server is slow or down.
+#
+#   check(payload)  signature + expiry + local scan count -> decision in microseconds;
+#                   allowed scans are appended to a journal file
+#   reconciler      background thread replaying un-acked journal scans to
+#                   /qr/verify, so the server's scan_count / scan_logs catch up
+#
+# Journal (JSON lines, survives restarts):
+#   {"op": "scan", "id": 7, "token": ..., "payload": ..., "exp": ..., "max": ..., "ts": ...}
+#   {"op": "ack",  "id": 7, "ok": true, "reason": null, "scan_count": 1}
+#
+# Limits: a gate only knows its own scans (plus what the server said during
+# reconciliation), so with N offline gates a pass can be admitted up to N
+# times max_scans; a token revoked on the server is honoured once reconciled.
+# Delivery is at-least-once: a crash between the server's answer and the ack
+# line replays that scan.
+
+from pathlib import Path
+import json
+import sys
+import threading
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))   # repo root, for app.signed_payload
+from app import signed_payload  # noqa: E402
+
+RECONCILE_SEC = 2.0
+
+
+class OfflineValidator:
+    def __init__(self, key: str, issuer: str, journal_path, send=None,
+                 reconcile_sec: float = RECONCILE_SEC):
+        """send(payload) -> (response_json, http_status) posts to /qr/verify (status 0 = offline)."""
+        self.key = key.encode("utf-8")
+        self.issuer = issuer
+        self.path = Path(journal_path)
+        self.send = send
+        self.reconcile_sec = reconcile_sec
+        self._lock = threading.Lock()
+        self._counts: dict[str, int] = {}      # token -> scans admitted by this gate
+        self._server: dict[str, int] = {}      # token -> scan_count last reported by the server
+        self._blocked: dict[str, str] = {}     # token -> reason the server denied it
+        self._pending: dict[int, dict] = {}    # journal id -> un-acked scan
+        self._next_id = 1
+        self._wake = threading.Event()
+        self._halt = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.conflicts = 0                     # offline allow the server later refused
+        self._load()
+
+    # ---------- journal ----------
+    def _load(self):
+        if not self.path.exists():
+            return
+        entries = []
+        for line in self.path.read_text(encoding="utf-8").splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue                        # torn last line after a crash
+        now = time.time()
+        acked = {e["id"] for e in entries if e["op"] == "ack"}
+        keep_ids = {e["id"] for e in entries if e["op"] == "scan"
+                    and (e["exp"] == 0 or e["exp"] > now or e["id"] not in acked)}
+        kept = [e for e in entries if e["id"] in keep_ids]
+        for e in kept:
+            self._apply(e)
+        self._next_id = max((e["id"] for e in entries), default=0) + 1
+        # compact: drop reconciled entries of expired passes
+        self.path.write_text("".join(json.dumps(e) + "\n" for e in kept), encoding="utf-8")
+
+    def _apply(self, e: dict):
+        if e["op"] == "scan":
+            self._counts[e["token"]] = self._counts.get(e["token"], 0) + 1
+            self._pending[e["id"]] = e
+            return
+        scan = self._pending.pop(e["id"], None)
+        if scan is None:
+            return
+        token = scan["token"]
+        if e.get("scan_count") is not None:
+            self._server[token] = max(self._server.get(token, 0), e["scan_count"])
+        if not e["ok"]:
+            self._blocked[token] = e.get("reason") or "denied"
+
+    def _append(self, e: dict):
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(e) + "\n")
+        self._apply(e)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    # ---------- gate decision ----------
+    def check(self, payload: str):
+        """(response_json, 200) for a signed payload of our issuer, else None (ask the server)."""
+        if not signed_payload.is_signed(payload):
+            return None
+        try:
+            sp = signed_payload.unpack(payload)
+        except ValueError:
+            return {"ok": False, "reason": "bad_payload", "offline": True}, 200
+        if sp.issuer != self.issuer:
+            return None
+        if not signed_payload.valid(self.key, sp):
+            return {"ok": False, "reason": "bad_signature", "offline": True}, 200
+        if sp.exp and time.time() > sp.exp:
+            return {"ok": False, "reason": "expired", "offline": True}, 200
+
+        with self._lock:
+            if sp.token in self._blocked:
+                return {"ok": False, "reason": self._blocked[sp.token], "offline": True}, 200
+            used = max(self._counts.get(sp.token, 0), self._server.get(sp.token, 0))
+            if used >= sp.max_scans:
+                return {"ok": False, "reason": "max_scans_reached", "offline": True}, 200
+            scan_id, self._next_id = self._next_id, self._next_id + 1
+            self._append({"op": "scan", "id": scan_id, "token": sp.token, "payload": payload,
+                          "exp": sp.exp, "max": sp.max_scans, "ts": time.time()})
+        self._wake.set()
+        status = "passive" if used + 1 >= sp.max_scans else "active"
+        return {"ok": True, "scan_count": used + 1, "status": status, "offline": True}, 200
+
+    # ---------- reconciliation ----------
+    def reconcile(self) -> int:
+        """Replay un-acked scans in order; stops at the first network error. Returns scans acked."""
+        acked = 0
+        with self._lock:
+            todo = sorted(self._pending.values(), key=lambda e: e["id"])
+        for scan in todo:
+            resp, status = self.send(scan["payload"])
+            if status != 200:
+                break                           # still offline; retry next round
+            if not resp.get("ok"):
+                self.conflicts += 1
+                print("Offline scan refused by server:", scan["token"], resp.get("reason"))
+            with self._lock:
+                self._append({"op": "ack", "id": scan["id"], "ok": bool(resp.get("ok")),
+                              "reason": resp.get("reason"), "scan_count": resp.get("scan_count")})
+            acked += 1
+        return acked
+
+    def start(self):
+        self._halt.clear()
+        self._thread = threading.Thread(target=self._run, name="reconcile", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._halt.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._halt.is_set():
+            self._wake.wait(self.reconcile_sec)
+            self._wake.clear()
+            if self._halt.is_set():
+                break
+            try:
+                self.reconcile()
+            except Exception as e:
+                print("Reconcile fail:", e)
@@ -0,0 +1,255 @@
+# gate_scanner/pipeline.py
+# Frame pipeline for gate_scanner.py: nothing slow runs on the UI thread.
+#
+#   camera -> CaptureThread -> LatestFrame (1 slot) -> DecodeWorker -> on_detect
+#                                    \-> UI (imshow)               VerifyWorker -> on_result
+#
+# - LatestFrame keeps only the newest frame: when decoding is slower than the
+#   camera, old frames are dropped instead of queueing up latency.
+# - DecodeWorker optionally downscales wide frames and first tries a crop
+#   around the last detected QR corners (ROI), falling back to the full frame.
+# - VerifyWorker does the HTTP call on its own thread, one payload at a time.
+# Only cv2/numpy here, so the replay benchmark also runs headless.
+
+from collections import deque
+from dataclasses import dataclass
+import queue
+import threading
+import time
+
+import cv2
+
+DECODE_MAX_WIDTH = 640      # downscale wider frames before decoding; 0 = never
+ROI_MARGIN = 0.5            # crop = QR bounding box grown by this fraction per side
+ROI_TTL_SEC = 1.0           # use the ROI only while the last detection is this fresh
+
+
+class Rate:
+    """Events per second over a sliding window."""
+
+    def __init__(self, window_sec: float = 1.0):
+        self.window_sec = window_sec
+        self._t: deque[float] = deque()
+
+    def tick(self, now: float | None = None):
+        now = now or time.monotonic()
+        self._t.append(now)
+        while self._t and self._t[0] < now - self.window_sec:
+            self._t.popleft()
+
+    @property
+    def value(self) -> float:
+        if len(self._t) < 2:
+            return 0.0
+        return (len(self._t) - 1) / max(1e-6, self._t[-1] - self._t[0])
+
+
+class LatestFrame:
+    """Single-slot frame buffer: put() overwrites, get() waits for a newer frame."""
+
+    def __init__(self):
+        self._cv = threading.Condition()
+        self._seq = 0
+        self._frame = None
+        self._ts = 0.0
+        self.closed = False
+
+    def put(self, frame, ts: float):
+        with self._cv:
+            self._seq += 1
+            self._frame, self._ts = frame, ts
+            self._cv.notify_all()
+
+    def get(self, after_seq: int = 0, timeout: float | None = None):
+        """-> (seq, frame, capture_ts); frame is None on timeout / close."""
+        with self._cv:
+            self._cv.wait_for(lambda: self._seq > after_seq or self.closed, timeout)
+            if self._seq <= after_seq:
+                return after_seq, None, 0.0
+            return self._seq, self._frame, self._ts
+
+    def close(self):
+        with self._cv:
+            self.closed = True
+            self._cv.notify_all()
+
+
+class CaptureThread(threading.Thread):
+    """Reads frames from a cv2.VideoCapture into a LatestFrame.
+    realtime=True paces a video file at its own fps (a camera paces itself)."""
+
+    def __init__(self, cap, buf: LatestFrame, realtime: bool = False):
+        super().__init__(name="capture", daemon=True)
+        self.cap = cap
+        self.buf = buf
+        self.frame_sec = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0) if realtime else 0.0
+        self.rate = Rate()
+        self.frames = 0
+        self.failures = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        next_at = time.monotonic()
+        while not self._halt.is_set():
+            ok, frame = self.cap.read()
+            if not ok:
+                self.failures += 1
+                if self.frame_sec or self.failures > 100:   # end of file / camera gone
+                    break
+                time.sleep(0.01)
+                continue
+            now = time.monotonic()
+            self.frames += 1
+            self.rate.tick(now)
+            self.buf.put(frame, now)
+            if self.frame_sec:
+                next_at += self.frame_sec
+                time.sleep(max(0.0, next_at - time.monotonic()))
+        self.buf.close()
+
+    def stop(self):
+        self._halt.set()
+
+
+@dataclass
+class Detection:
+    data: str                 # decoded text ("" = QR seen but not decoded)
+    points: object            # 4x2 float array in full-frame coordinates, or None
+    seq: int                  # frame sequence number
+    captured: float           # monotonic capture time
+    decoded: float            # monotonic time decode finished
+    roi: bool                 # decoded from the ROI crop
+
+
+class DecodeWorker(threading.Thread):
+    """Decodes the newest frame; calls on_detect(Detection) for every frame with a QR."""
+
+    def __init__(self, buf: LatestFrame, on_detect, max_width: int = DECODE_MAX_WIDTH,
+                 use_roi: bool = True):
+        super().__init__(name="decode", daemon=True)
+        self.buf = buf
+        self.on_detect = on_detect
+        self.max_width = max_width
+        self.use_roi = use_roi
+        self.detector = cv2.QRCodeDetector()
+        self.paused = False        # set by the UI while a result is on hold
+        self.rate = Rate()
+        self.latency: deque[float] = deque(maxlen=200)   # capture -> decoded, seconds
+        self.decoded = 0
+        self.roi_hits = 0
+        self._last_points = None
+        self._last_seen = 0.0
+        self._halt = threading.Event()
+
+    def _detect(self, img, scale: float = 1.0, dx: int = 0, dy: int = 0):
+        data, points, _ = self.detector.detectAndDecode(img)
+        if points is None:
+            return "", None
+        pts = points.reshape(-1, 2) / scale
+        pts[:, 0] += dx
+        pts[:, 1] += dy
+        return data or "", pts
+
+    def _roi(self, frame):
+        """Crop around the last detection, or None if there is no fresh one."""
+        if not self.use_roi or self._last_points is None:
+            return None
+        if time.monotonic() - self._last_seen > ROI_TTL_SEC:
+            return None
+        h, w = frame.shape[:2]
+        x0, y0 = self._last_points.min(axis=0)
+        x1, y1 = self._last_points.max(axis=0)
+        mx, my = (x1 - x0) * ROI_MARGIN, (y1 - y0) * ROI_MARGIN
+        x0, y0 = max(0, int(x0 - mx)), max(0, int(y0 - my))
+        x1, y1 = min(w, int(x1 + mx)), min(h, int(y1 + my))
+        if x1 - x0 < 32 or y1 - y0 < 32 or (x1 - x0) * (y1 - y0) > 0.6 * w * h:
+            return None       # tiny, or barely smaller than the frame
+        return frame[y0:y1, x0:x1], x0, y0
+
+    def decode(self, frame):
+        """-> (data, points, used_roi) for one frame."""
+        roi = self._roi(frame)
+        if roi is not None:
+            crop, x0, y0 = roi
+            data, pts = self._detect(crop, 1.0, x0, y0)
+            if data:
+                return data, pts, True
+
+        scale = 1.0
+        img = frame
+        if self.max_width and frame.shape[1] > self.max_width:
+            scale = self.max_width / frame.shape[1]
+            img = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        data, pts = self._detect(img, scale)
+        return data, pts, False
+
+    def run(self):
+        seq = 0
+        while not self._halt.is_set():
+            seq, frame, captured = self.buf.get(seq, timeout=0.5)
+            if frame is None:
+                if self.buf.closed:
+                    break
+                continue
+            if self.paused:
+                continue
+            data, pts, used_roi = self.decode(frame)
+            now = time.monotonic()
+            self.rate.tick(now)
+            self.decoded += 1
+            self.latency.append(now - captured)
+            if pts is None:
+                continue
+            self._last_points, self._last_seen = pts, now
+            self.roi_hits += used_roi
+            self.on_detect(Detection(data.strip(), pts, seq, captured, now, used_roi))
+
+    def stop(self):
+        self._halt.set()
+
+
+class VerifyWorker(threading.Thread):
+    """Runs verify_fn(payload) off the UI thread; on_result(payload, resp, status, seconds)."""
+
+    def __init__(self, verify_fn, on_result):
+        super().__init__(name="verify", daemon=True)
+        self.verify_fn = verify_fn
+        self.on_result = on_result
+        self._q: queue.Queue = queue.Queue(maxsize=1)
+        self.busy = False
+        self.latency: deque[float] = deque(maxlen=200)
+        self._halt = threading.Event()
+
+    def submit(self, payload: str) -> bool:
+        """Queue a payload unless one is already pending/in flight."""
+        if self.busy:
+            return False
+        try:
+            self._q.put_nowait(payload)
+        except queue.Full:
+            return False
+        self.busy = True
+        return True
+
+    def run(self):
+        while not self._halt.is_set():
+            try:
+                payload = self._q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            t0 = time.monotonic()
+            resp, status = self.verify_fn(payload)
+            dt = time.monotonic() - t0
+            self.latency.append(dt)
+            try:
+                self.on_result(payload, resp, status, dt)
+            finally:
+                self.busy = False
+
+    def stop(self):
+        self._halt.set()
+
+
+def median_ms(samples) -> float:
+    s = sorted(samples)
+    return round(s[len(s) // 2] * 1000, 1) if s else 0.0
@@ -0,0 +1,120 @@
+# gate_scanner/verify_client.py
+# Scanner-side client for POST /qr/verify.
+#
+# - One requests.Session with a keep-alive pool: scans reuse the TCP
+#   connection instead of paying a handshake each time.
+# - Decisions are cached per payload for DEDUP_TTL_SEC: a pass that stays in
+#   front of the camera after the hold ends gets the cached answer back
+#   (resp["cached"] = True) instead of burning another of its max_scans.
+# - Retries only when the connection could not be made (the request never
+#   reached the server); a timeout after sending is NOT retried, since the
+#   scan may already have been counted.
+# - Round-trip latency histogram, printed every LOG_EVERY scans and on close().
+# - Optional `gate` id sent with each scan (server-side per-gate scan stats).
+# - Optional `local(payload)` decider (offline.OfflineValidator.check) tried
+#   before the network; it returns None for payloads it cannot decide.
+
+from collections import OrderedDict
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEDUP_TTL_SEC = 30.0
+DEDUP_MAX = 256
+LOG_EVERY = 50
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 3000)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets_ms=BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)    # last = overflow
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        i = next((i for i, b in enumerate(self.buckets_ms) if ms <= b), len(self.buckets_ms))
+        self.counts[i] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def summary(self) -> str:
+        labels = [f"<={b}" for b in self.buckets_ms] + [f">{self.buckets_ms[-1]}"]
+        parts = [f"{l}:{c}" for l, c in zip(labels, self.counts) if c]
+        avg = self.sum_ms / self.total if self.total else 0.0
+        return f"verify rtt ms n={self.total} avg={avg:.1f} " + " ".join(parts)
+
+
+class VerifyClient:
+    def __init__(self, api_base: str, timeout: float = 3.0, retries: int = 2,
+                 backoff_sec: float = 0.1, dedup_ttl_sec: float = DEDUP_TTL_SEC,
+                 pool_size: int = 2, local=None, gate: str | None = None):
+        self.url = f"{api_base.rstrip('/')}/qr/verify"
+        self.gate = gate
+        self.timeout = timeout
+        self.dedup_ttl_sec = dedup_ttl_sec
+        self.local = local
+        self.session = requests.Session()
+        retry = Retry(total=retries, connect=retries, read=0, status=0, other=0,
+                      allowed_methods=None, backoff_factor=backoff_sec)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._recent: OrderedDict[str, tuple[float, dict, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.histogram = LatencyHistogram()
+        self.dedup_hits = 0
+
+    def _cached(self, payload: str):
+        with self._lock:
+            hit = self._recent.get(payload)
+            if hit is None:
+                return None
+            if time.monotonic() - hit[0] > self.dedup_ttl_sec:
+                del self._recent[payload]
+                return None
+            self.dedup_hits += 1
+            return {**hit[1], "cached": True}, hit[2]
+
+    def _remember(self, payload: str, resp: dict, status: int):
+        with self._lock:
+            self._recent[payload] = (time.monotonic(), resp, status)
+            self._recent.move_to_end(payload)
+            while len(self._recent) > DEDUP_MAX:
+                self._recent.popitem(last=False)
+
+    def verify(self, payload: str):
+        """-> (response_json, http_status); status 0 = network error."""
+        cached = self._cached(payload)
+        if cached is not None:
+            return cached
+
+        if self.local is not None:
+            decided = self.local(payload)
+            if decided is not None:
+                self._remember(payload, *decided)
+                return decided
+
+        t0 = time.perf_counter()
+        try:
+            body = {"payload": payload} if self.gate is None else {"payload": payload, "gate": self.gate}
+            r = self.session.post(self.url, json=body, timeout=self.timeout)
+            resp, status = r.json(), r.status_code
+        except Exception as e:
+            return {"ok": False, "reason": f"network_error:{e}"}, 0
+        self.histogram.observe(time.perf_counter() - t0)
+        if self.histogram.total % LOG_EVERY == 0:
+            print(self.histogram.summary())
+
+        if status == 200:              # a decision; errors are worth retrying next frame
+            self._remember(payload, resp, status)
+        return resp, status
+
+    def close(self):
+        if self.histogram.total:
+            print(self.histogram.summary())
+        self.session.close()
@@ -0,0 +1,45 @@
+# tests/conftest.py
+# Every test run gets a throwaway SQLite DB + working dir (qr_images/ etc.).
+# DB_URL must be set before anything imports app.config.
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+_TMP = Path(tempfile.mkdtemp(prefix="qr-tests-"))
+
+os.environ["DB_URL"] = f"sqlite:///{(_TMP / 'test.db').as_posix()}"
+sys.path.insert(0, str(ROOT))
+os.chdir(_TMP)
+
+
+@pytest.fixture(scope="session")
+def main():
+    """app.main with tables created and the printer stubbed out."""
+    from app.config import settings
+    from app.init_db import init
+    import app.main as main
+
+    init()
+    settings.PRINT_QUEUE = False
+    main.print_qr_ticket = lambda payload, info: True
+    return main
+
+
+@pytest.fixture
+def issue(main):
+    """issue(max_scans=.., minutes_valid=..) -> (token, payload) straight into the DB."""
+    from app.db import SessionLocal
+
+    def _issue(**form):
+        with SessionLocal() as db:
+            res = main.issue_qr(**{
+                "employee_id": None, "full_name": None, "email": None, "role": None,
+                "department": None, "minutes_valid": 60, "max_scans": 1, **form,
+            }, background=None, db=db)
+        return res["token"], res["payload"]
+    return _issue
@@ -0,0 +1,68 @@
+# tests/test_async_api.py
+# /async/qr/issue, /async/qr/verify and /async/qr/status against the same DB as the sync API.
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import SessionLocal
+from app.models import QRToken
+
+async_api = pytest.importorskip("app.async_api")     # needs aiosqlite
+
+
+@pytest.fixture
+def client(main, monkeypatch):
+    printed = []
+    monkeypatch.setattr(async_api, "_dispatch_print", lambda payload, info: printed.append(payload))
+    with TestClient(main.app) as c:       # one event loop for the async engine's connections
+        c.printed = printed
+        yield c
+
+
+def _issue(client, **form) -> dict:
+    res = client.post("/async/qr/issue", data={"minutes_valid": 60, "max_scans": 2, **form})
+    assert res.status_code == 200, res.text
+    return res.json()
+
+
+def test_issue_stores_row_and_prints(client):
+    body = _issue(client, full_name="Async Person", department="HR")
+    assert body["ok"] and body["payload"].endswith(body["token"]) and body["qr_b64"]
+    assert body["print_info"]["Kullancı Adı"] == "Async Person"
+    assert client.printed == [body["payload"]]
+    with SessionLocal() as db:
+        rec = db.query(QRToken).filter(QRToken.token == body["token"]).one()
+        assert (rec.full_name, rec.department, rec.max_scans, rec.status) == ("Async Person", "HR", 2, "active")
+
+
+def test_verify_until_exhausted(client):
+    payload = _issue(client, max_scans=2)["payload"]
+    verify = lambda: client.post("/async/qr/verify", json={"payload": payload, "gate": "A1"}).json()
+    assert verify() == {"ok": True, "scan_count": 1, "status": "active"}
+    assert verify() == {"ok": True, "scan_count": 2, "status": "passive"}
+    assert verify() == {"ok": False, "reason": "passive"}
+    assert client.post("/async/qr/verify", json={"payload": "garbage"}).json() == \
+        {"ok": False, "reason": "bad_payload"}
+    assert client.post("/async/qr/verify", json={"payload": "BenimGiriş|missing"}).json() == \
+        {"ok": False, "reason": "not_found"}
+
+
+def test_verify_expired(client):
+    body = _issue(client)
+    with SessionLocal() as db:
+        db.query(QRToken).filter(QRToken.token == body["token"]).update(
+            {"expires_at": datetime.utcnow() - timedelta(minutes=1)})
+        db.commit()
+    assert client.post("/async/qr/verify", json={"payload": body["payload"]}).json() == \
+        {"ok": False, "reason": "expired"}
+    assert client.get(f"/async/qr/status/{body['token']}").json()["status"] == "passive"
+
+
+def test_status(client):
+    body = _issue(client, employee_id="E-42", max_scans=3)
+    client.post("/async/qr/verify", json={"payload": body["payload"]})
+    st = client.get(f"/async/qr/status/{body['token']}").json()
+    assert st["ok"] and (st["status"], st["scan_count"], st["max_scans"], st["employee_id"]) == \
+        ("active", 1, 3, "E-42")
+    assert client.get("/async/qr/status/missing").json() == {"ok": False, "reason": "not_found"}
@@ -0,0 +1,63 @@
+# tests/test_db.py
+# engine_kwargs / make_engine for every SQLite profile, file and in-memory, plus the PostgreSQL options.
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.config import settings
+
+MEMORY_URLS = ["sqlite://", "sqlite:///:memory:"]
+
+
+def _pragma(eng, name):
+    with eng.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+@pytest.mark.parametrize("profile", sorted(db.SQLITE_PROFILES))
+def test_file_engine_per_profile(profile, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DB_PROFILE", profile)
+    url = f"sqlite:///{tmp_path / 'profile.db'}"
+    kw = db.engine_kwargs(url)
+    assert kw["pool_size"] == settings.DB_POOL_SIZE and kw["max_overflow"] == settings.DB_MAX_OVERFLOW
+    eng = db.make_engine(url)
+    try:
+        expected = db.SQLITE_PROFILES[profile].get("journal_mode", "delete").lower()
+        assert _pragma(eng, "journal_mode") == expected
+        assert eng.pool.size() == settings.DB_POOL_SIZE
+    finally:
+        eng.dispose()
+
+
+@pytest.mark.parametrize("profile", sorted(db.SQLITE_PROFILES))
+@pytest.mark.parametrize("url", MEMORY_URLS)
+def test_memory_engine_per_profile(profile, url, monkeypatch):
+    monkeypatch.setattr(settings, "DB_PROFILE", profile)
+    kw = db.engine_kwargs(url)
+    assert not {"pool_size", "max_overflow", "pool_timeout"} & set(kw)
+    eng = db.make_engine(url)          # SingletonThreadPool rejects the pool options
+    try:
+        with eng.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+    finally:
+        eng.dispose()
+
+
+def test_async_memory_engine():
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = "sqlite+aiosqlite:///:memory:"
+    kw = db.engine_kwargs(url)
+    kw.pop("connect_args", None)
+    create_async_engine(url, **kw).sync_engine.dispose()
+
+
+def test_postgres_kwargs(monkeypatch):
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 1500)
+    kw = db.engine_kwargs("postgresql+psycopg://u@h/qr")
+    assert kw["pool_pre_ping"] and kw["pool_size"] == settings.DB_POOL_SIZE
+    assert kw["pool_recycle"] == settings.DB_POOL_RECYCLE_SEC
+    assert kw["connect_args"] == {"options": "-c statement_timeout=1500"}
+    assert db.engine_kwargs("postgresql+asyncpg://u@h/qr")["connect_args"] == \
+        {"server_settings": {"statement_timeout": "1500"}}
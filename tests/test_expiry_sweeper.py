@@ -0,0 +1,108 @@
+# tests/test_expiry_sweeper.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, inspect, insert, select
+
+from app.db import SessionLocal, engine
+from app.expiry_sweeper import ExpirySweeper
+from app.models import PrintJobRecord, QRToken, ScanLog, qr_tokens_archive, scan_logs_archive
+
+
+def _set(token, **values):
+    with SessionLocal() as db:
+        db.query(QRToken).filter(QRToken.token == token).update(values)
+        db.commit()
+
+
+def _status(token):
+    with SessionLocal() as db:
+        return db.execute(select(QRToken.status).where(QRToken.token == token)).scalar()
+
+
+def test_status_expires_index_exists(main):
+    idx = {i["name"]: i["column_names"] for i in inspect(engine).get_indexes("qr_tokens")}
+    assert idx["ix_qr_tokens_status_expires_at"] == ["status", "expires_at"]
+
+
+def test_expire_in_small_batches(issue):
+    past = datetime.utcnow() - timedelta(minutes=1)
+    expired = [issue()[0] for _ in range(7)]
+    for t in expired:
+        _set(t, expires_at=past)
+    live, _ = issue()
+    forever, _ = issue(minutes_valid=0)
+
+    sweeper = ExpirySweeper(batch=3)
+    assert sweeper.expire() >= 7               # 3 + 3 + 1 (+ leftovers from other tests)
+    assert {_status(t) for t in expired} == {"passive"}
+    assert _status(live) == _status(forever) == "active"
+    assert sweeper.expire() == 0
+
+
+def test_expire_uses_the_verify_boundary(issue):
+    token, _ = issue()
+    at = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    _set(token, expires_at=at)
+    ExpirySweeper().expire(now=at)             # verify still accepts at exactly expires_at
+    assert _status(token) == "active"
+    ExpirySweeper().expire(now=at + timedelta(microseconds=1))
+    assert _status(token) == "passive"
+
+
+def test_archive_moves_old_passive_tokens_and_logs(issue):
+    old = datetime.utcnow() - timedelta(days=40)
+    gone, _ = issue()
+    _set(gone, status="passive", issued_at=old)
+    kept_active, _ = issue()
+    _set(kept_active, issued_at=old)
+    with engine.begin() as conn:
+        conn.execute(insert(ScanLog.__table__), [
+            {"token": gone, "result": "allowed", "user_hint": "", "ts": old},
+            {"token": kept_active, "result": "allowed", "user_hint": "", "ts": datetime.utcnow()},
+        ])
+
+    tokens, logs = ExpirySweeper(batch=2, retention_days=30).retain()
+    assert tokens >= 1 and logs >= 1
+    assert _status(gone) is None and _status(kept_active) == "active"
+    with engine.connect() as conn:
+        assert conn.execute(select(qr_tokens_archive.c.status)
+                            .where(qr_tokens_archive.c.token == gone)).scalar() == "passive"
+        assert conn.execute(select(func.count()).select_from(scan_logs_archive)
+                            .where(scan_logs_archive.c.token == gone)).scalar() == 1
+        assert conn.execute(select(func.count()).select_from(ScanLog.__table__)
+                            .where(ScanLog.token == kept_active)).scalar() == 1
+
+
+def test_purge_mode_keeps_no_copy(issue):
+    gone, _ = issue()
+    _set(gone, status="passive", issued_at=datetime.utcnow() - timedelta(days=10))
+    ExpirySweeper(retention_days=5, retention_mode="purge").retain()
+    assert _status(gone) is None
+    with engine.connect() as conn:
+        assert conn.execute(select(qr_tokens_archive.c.id)
+                            .where(qr_tokens_archive.c.token == gone)).first() is None
+
+
+def test_prune_finished_print_jobs(main):
+    old = datetime.utcnow() - timedelta(hours=30)
+    j = PrintJobRecord.__table__
+    rows = [{"printer": "p", "payload": "x", "info": "{}", "status": st, "created_at": old, "updated_at": old}
+            for st in ("printed", "failed", "queued", "sending")]
+    rows.append({"printer": "p", "payload": "x", "info": "{}", "status": "printed",
+                 "created_at": old, "updated_at": datetime.utcnow()})
+    with engine.begin() as conn:
+        conn.execute(insert(j), rows)
+    assert ExpirySweeper(batch=1).prune_print_jobs() == 2
+    with engine.connect() as conn:
+        left = conn.execute(select(j.c.status).where(j.c.printer == "p").order_by(j.c.id)).scalars().all()
+    assert left == ["queued", "sending", "printed"]
+
+
+def test_waiting_print_jobs_lookup_uses_the_status_index(main):
+    from app.print_dispatch import _WAITING
+    j = PrintJobRecord.__table__
+    query = select(j.c.printer, func.count()).where(j.c.status.in_(_WAITING)).group_by(j.c.printer)
+    sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        plan = " ".join(str(r[-1]) for r in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+    assert "SEARCH" in plan and "ix_print_jobs_status_printer" in plan
@@ -0,0 +1,75 @@
+# tests/test_image_store.py
+from datetime import datetime, timedelta
+import os
+import time
+
+from app.db import SessionLocal
+from app.image_store import ImageStore, ImageSweeper
+from app.models import QRToken
+
+
+def _set(token, **values):
+    with SessionLocal() as db:
+        db.query(QRToken).filter(QRToken.token == token).update(values)
+        db.commit()
+
+
+def test_sharded_paths_and_flat_migration(tmp_path):
+    store = ImageStore(tmp_path)
+    p = store.write("tok-1", b"png")
+    parts = p.relative_to(tmp_path).parts
+    assert len(parts) == 3 and all(len(d) == 2 for d in parts[:2]) and p.name == "tok-1.png"
+
+    (tmp_path / "old-1.png").write_bytes(b"a")
+    (tmp_path / "old-2.png").write_bytes(b"b")
+    assert store.migrate_flat() == 2
+    assert not list(tmp_path.glob("*.png"))
+    assert store.read("old-1") == b"a" and store.read("old-2") == b"b"
+
+
+def test_migration_runs_on_the_sweeper_thread(tmp_path):
+    store = ImageStore(tmp_path)
+    for i in range(3):
+        (tmp_path / f"flat-{i}.png").write_bytes(b"%d" % i)
+    assert store.read("flat-1") == b"1"            # still served before it is moved
+    sweeper = ImageSweeper(store, interval_sec=0, migrate=True)
+    sweeper.start()                                # returns at once; the thread migrates
+    sweeper._thread.join(5)
+    assert not sweeper._thread.is_alive()          # sweeping off: done after migrating
+    sweeper.stop()
+    assert sweeper.migrated == 3 and not list(tmp_path.glob("*.png"))
+    assert store.read("flat-1") == b"1"
+
+
+def test_sweep_deletes_passive_expired_and_unknown(tmp_path, issue):
+    store = ImageStore(tmp_path)
+    active, _ = issue()
+    passive, _ = issue()
+    expired, _ = issue()
+    _set(passive, status="passive")
+    _set(expired, expires_at=datetime.utcnow() - timedelta(minutes=1))
+    for t in (active, passive, expired, "not-in-db"):
+        store.write(t, b"png")
+
+    res = ImageSweeper(store).sweep()
+    assert res["deleted"] == 3
+    assert [p.stem for p in store._loose()] == [active]
+
+
+def test_pack_into_archive_then_compact(tmp_path, issue):
+    store = ImageStore(tmp_path)
+    keep, _ = issue()
+    drop, _ = issue()
+    for t in (keep, drop):
+        old = time.time() - 3 * 86400
+        os.utime(store.write(t, t.encode()), (old, old))
+
+    assert store.pack(older_than_sec=86400) == 2
+    assert not list(store._loose())
+    assert store.read(keep) == keep.encode()        # served from archive.zip
+    assert sorted(store.archived()) == sorted([keep, drop])
+
+    _set(drop, status="passive")
+    assert ImageSweeper(store).sweep()["compacted"] == 1
+    assert store.archived() == [keep]
+    assert store.read(drop) is None
@@ -0,0 +1,100 @@
+# tests/test_issue_batch.py
+# POST /qr/issue/batch: JSON / CSV / multipart input, ndjson / zip output, rejects.
+import csv
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import qr_render
+from app.db import SessionLocal
+from app.models import QRToken
+
+
+@pytest.fixture
+def client(main):
+    return TestClient(main.app)        # no startup hooks: nothing to print to
+
+
+def _lines(res) -> list[dict]:
+    assert res.status_code == 200, res.text
+    return [json.loads(line) for line in res.text.splitlines()]
+
+
+def _rows(tokens) -> dict[str, QRToken]:
+    with SessionLocal() as db:
+        return {r.token: r for r in db.execute(select(QRToken).where(QRToken.token.in_(tokens))).scalars()}
+
+
+def test_json_array(client):
+    out = _lines(client.post("/qr/issue/batch?max_scans=2", json=[
+        {"full_name": "Ayşe", "employee_id": "E1"},
+        {"full_name": "Mehmet", "department": "HR", "max_scans": 5},
+    ]))
+    assert [t["print_info"]["Kullancı Adı"] for t in out] == ["Ayşe", "Mehmet"]
+    assert all(t["payload"].endswith(t["token"]) and t["qr_b64"] for t in out)
+    rows = _rows([t["token"] for t in out])
+    assert [rows[t["token"]].max_scans for t in out] == [2, 5]
+    assert rows[out[1]["token"]].department == "HR"
+
+
+def test_csv_body(client):
+    body = "full_name,employee_id,minutes_valid\nCsv One,C1,0\nCsv Two,C2,\n"
+    out = _lines(client.post("/qr/issue/batch", content=body.encode(), headers={"Content-Type": "text/csv"}))
+    rows = _rows([t["token"] for t in out])
+    assert [rows[t["token"]].employee_id for t in out] == ["C1", "C2"]
+    assert rows[out[0]["token"]].expires_at is None and rows[out[1]["token"]].expires_at is not None
+
+
+def test_multipart_upload(client):
+    body = "full_name,role\nUp Load,Visitor\n".encode("utf-8-sig")
+    out = _lines(client.post("/qr/issue/batch", files={"file": ("people.csv", body, "application/octet-stream")}))
+    assert len(out) == 1 and _rows([out[0]["token"]])[out[0]["token"]].role == "Visitor"
+    res = client.post("/qr/issue/batch", files={"other": ("x.csv", b"a", "text/csv")})
+    assert res.status_code == 400 and res.json()["error"] == "missing_file"
+
+
+def test_zip_has_pngs_and_manifest(client):
+    res = client.post("/qr/issue/batch?format=zip", json={"records": [{"full_name": f"Z{i}"} for i in range(3)]})
+    assert res.status_code == 200 and res.headers["content-type"] == "application/zip"
+    zf = zipfile.ZipFile(io.BytesIO(res.content))
+    pngs = [n for n in zf.namelist() if n.endswith(".png")]
+    manifest = list(csv.reader(io.StringIO(zf.read("manifest.csv").decode("utf-8"))))
+    assert len(pngs) == 3 and len(manifest) == 4
+    assert manifest[0][:2] == ["token", "payload"]
+    token, payload = manifest[1][:2]
+    assert zf.read(f"{token}.png") == qr_render.png_bytes(payload)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"json": [{"full_name": "x", "max_scans": "many"}]},
+    {"json": {"records": "nope"}},
+    {"json": ["not a record"]},
+    {"content": b"{broken", "headers": {"Content-Type": "application/json"}},
+])
+def test_bad_rows_rejected(client, kwargs):
+    res = client.post("/qr/issue/batch", **kwargs)
+    assert res.status_code == 400 and res.json()["error"].startswith("bad_batch")
+
+
+def test_oversized_and_bad_format(client, main, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX", 2)
+    res = client.post("/qr/issue/batch", json=[{}, {}, {}])
+    assert res.status_code == 413 and res.json() == {"ok": False, "error": "batch_too_large", "max": 2}
+    res = client.post("/qr/issue/batch?format=pdf", json=[{}])
+    assert res.status_code == 400 and res.json()["error"] == "bad_format"
+
+
+def test_render_pool_spawns_workers(main, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_WORKERS", 2)
+    monkeypatch.setattr(main, "BATCH_POOL_MIN", 1)
+    main._start_render_pool()
+    try:
+        assert main._render_pool._mp_context.get_start_method() == "spawn"
+        payloads = [f"BenimGiriş|spawn-{i}" for i in range(4)]
+        assert list(main._render_pngs(payloads)) == [qr_render.png_bytes(p) for p in payloads]
+    finally:
+        main._stop_render_pool()
@@ -0,0 +1,59 @@
+# tests/test_metrics.py
+import re
+
+from app import metrics
+from app.db import SessionLocal
+from app.tickets import ISSUER
+
+
+def _verify(main, payload):
+    with SessionLocal() as db:
+        return main.verify_qr({"payload": payload}, db)
+
+
+def _samples(text: str) -> dict[str, float]:
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in text.splitlines() if line and not line.startswith("#")}
+
+
+def test_stages_and_outcomes(main, issue):
+    before = {r: metrics.VERIFY_RESULTS.value(r) for r in ("allowed", "denied:passive", "denied:not_found")}
+    inserts = metrics.STAGES.count("db_insert")
+
+    _, payload = issue(max_scans=1)
+    _verify(main, payload)
+    _verify(main, payload)
+    _verify(main, f"{ISSUER}|missing")
+
+    assert metrics.STAGES.count("db_insert") == inserts + 1
+    assert metrics.VERIFY_RESULTS.value("allowed") == before["allowed"] + 1
+    assert metrics.VERIFY_RESULTS.value("denied:passive") == before["denied:passive"] + 1
+    assert metrics.VERIFY_RESULTS.value("denied:not_found") == before["denied:not_found"] + 1
+
+    s = _samples(main.get_metrics().body.decode())
+    for stage in ("db_insert", "qr_encode", "png_encode", "base64", "verify"):
+        assert s[f'qr_stage_seconds_count{{stage="{stage}"}}'] >= 1
+    assert s['qr_verify_results_total{result="allowed"}'] >= 1
+    assert 'qr_cache_hits_total{cache="qr_matrix"}' in s
+    assert 'qr_cache_misses_total{cache="png"}' in s
+
+
+def test_histogram_exposition():
+    h = metrics.Histogram("t_seconds", "test", ("stage",), buckets=(0.01, 0.1))
+    for v in (0.005, 0.05, 0.05, 3.0):
+        h.observe(v, "x")
+    text = "\n".join(h.lines())
+    assert 't_seconds_bucket{stage="x",le="0.01"} 1' in text
+    assert 't_seconds_bucket{stage="x",le="0.1"} 3' in text
+    assert 't_seconds_bucket{stage="x",le="+Inf"} 4' in text
+    assert 't_seconds_count{stage="x"} 4' in text
+    assert re.search(r't_seconds_sum\{stage="x"\} 3\.10*\d*', text)
+
+
+def test_families_are_contiguous(main):
+    seen = set()
+    for line in main.get_metrics().body.decode().splitlines():
+        if line.startswith("# TYPE "):
+            name = line.split()[2]
+            assert name not in seen, f"{name} exposed twice"
+            seen.add(name)
@@ -0,0 +1,48 @@
+# tests/test_migrations.py
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from app import migrations
+from app.db import make_engine
+
+
+def _engine(tmp_path, name):
+    return make_engine(f"sqlite:///{(tmp_path / name).as_posix()}")
+
+
+def test_fresh_db_then_noop(tmp_path):
+    eng = _engine(tmp_path, "fresh.db")
+    assert migrations.upgrade(eng) == [v for v, _, _ in migrations.MIGRATIONS]
+    assert migrations.upgrade(eng) == []
+    assert migrations.current(eng) == migrations.MIGRATIONS[-1][0]
+    assert migrations.pending(eng) == []
+
+    insp = inspect(eng)
+    assert {"qr_tokens", "scan_logs", "scan_rollup_hourly", "qr_tokens_archive",
+            "scan_logs_archive", "schema_version"} <= set(insp.get_table_names())
+    assert "ix_qr_tokens_status_expires_at" in {i["name"] for i in insp.get_indexes("qr_tokens")}
+
+
+def test_adopts_pre_migration_db(tmp_path):
+    """A DB created by create_all before scan_logs.gate / the rollup existed."""
+    eng = _engine(tmp_path, "legacy.db")
+    with eng.begin() as conn:
+        conn.execute(text("CREATE TABLE qr_tokens (id INTEGER PRIMARY KEY, token VARCHAR NOT NULL UNIQUE, "
+                          "issued_at DATETIME NOT NULL, expires_at DATETIME, status VARCHAR, max_scans INTEGER, "
+                          "scan_count INTEGER, employee_id VARCHAR, full_name VARCHAR, email VARCHAR, "
+                          "role VARCHAR, department VARCHAR)"))
+        conn.execute(text("CREATE TABLE scan_logs (id INTEGER PRIMARY KEY, token VARCHAR, ts DATETIME, "
+                          "result VARCHAR, user_hint VARCHAR)"))
+        ts = datetime(2024, 5, 1, 9, 15)
+        conn.execute(text("INSERT INTO scan_logs (token, ts, result) VALUES ('a', :ts, 'allowed'), "
+                          "('b', :ts, 'allowed'), ('c', :ts, 'denied:expired')"), {"ts": ts})
+
+    assert migrations.upgrade(eng) == [v for v, _, _ in migrations.MIGRATIONS]
+
+    insp = inspect(eng)
+    assert "gate" in {c["name"] for c in insp.get_columns("scan_logs")}
+    assert "ix_scan_logs_ts_id" in {i["name"] for i in insp.get_indexes("scan_logs")}
+    with eng.connect() as conn:
+        rollup = dict(conn.execute(text("SELECT result, count FROM scan_rollup_hourly")).all())
+    assert rollup == {"allowed": 2, "denied:expired": 1}
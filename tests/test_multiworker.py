@@ -0,0 +1,202 @@
+# tests/test_multiworker.py
+# WORKERS > 1 building blocks: DB leases, the lease-elected print dispatcher
+# and atomic verify across real processes sharing one SQLite file.
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+from fake_printer import FakePrinter  # noqa: E402
+
+from app import leases, print_dispatch, print_queue  # noqa: E402
+from app.db import SessionLocal  # noqa: E402
+from app.models import PrintJobRecord, QRToken  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+INFO = {"Kullancı Adı": "Test", "Görev": "Visitor", "Bölüm": "Other", "Maksımum Okuma": 1}
+
+
+def test_lease_exclusive_until_expiry(main):
+    now = datetime.utcnow()
+    assert leases.acquire("t:exclusive", "a", ttl_sec=10, now=now)
+    assert not leases.acquire("t:exclusive", "b", ttl_sec=10, now=now)
+    assert leases.acquire("t:exclusive", "a", ttl_sec=10, now=now + timedelta(seconds=5))    # renew
+    assert not leases.acquire("t:exclusive", "b", ttl_sec=10, now=now + timedelta(seconds=12))
+    assert leases.acquire("t:exclusive", "b", ttl_sec=10, now=now + timedelta(seconds=16))   # a stopped renewing
+    leases.release("t:exclusive", "b")
+    assert leases.acquire("t:exclusive", "a", ttl_sec=10)
+
+
+def test_failing_callbacks_do_not_stop_the_keeper(main):
+    calls = []
+
+    def flaky():
+        calls.append("acquired")
+        if len(calls) == 1:
+            raise RuntimeError("db down")
+
+    def broken():
+        raise RuntimeError("db down")
+
+    keeper = leases.LeaseKeeper(ttl_sec=10, holder="flaky")
+    keeper.want("t:callbacks", flaky, broken)
+    keeper.tick()
+    assert not keeper.held("t:callbacks")              # on_acquired failed: retried next round
+    keeper.tick()
+    assert keeper.held("t:callbacks") and calls == ["acquired", "acquired"]
+    assert leases.acquire("t:callbacks", "thief", ttl_sec=10, now=datetime.utcnow() + timedelta(seconds=30))
+    keeper.tick()                                      # on_lost raises: logged, lease dropped
+    assert not keeper.held("t:callbacks")
+    leases.release("t:callbacks", "thief")
+
+
+def _dispatcher(fp, holder):
+    keeper = leases.LeaseKeeper(ttl_sec=30, holder=holder)
+    q = print_queue.PrintQueue(print_queue.PrinterLink(fp.host, fp.port, timeout=1), name="mw-printer")
+    shared = print_dispatch.SharedPrintQueue([q], keeper, poll_ms=20)
+    shared.start()
+    keeper.start()
+    return keeper, shared
+
+
+def _statuses(ids):
+    with SessionLocal() as db:
+        return db.execute(select(PrintJobRecord.status).where(PrintJobRecord.id.in_(ids))).scalars().all()
+
+
+def test_one_dispatcher_per_printer_and_handover(main):
+    fp = FakePrinter().start()
+    try:
+        keeper_a, a = _dispatcher(fp, "worker-a")
+        keeper_b, b = _dispatcher(fp, "worker-b")
+        assert [q.name for q in a.queues] == ["mw-printer"] and b.queues == []
+
+        ids = [b.submit(f"BenimGiriş|mw{i}", INFO) for i in range(10)]      # issued on the other worker
+        assert fp.wait_for(10)
+        keeper_a.stop()                                    # a shuts down: lease released, b takes over
+        keeper_b.tick()
+        assert [q.name for q in b.queues] == ["mw-printer"]
+        ids += [a.submit(f"BenimGiriş|mw-late{i}", INFO) for i in range(5)]
+        assert fp.wait_for(15)
+        keeper_b.stop()
+        assert fp.tickets == 15
+        assert _statuses(ids) == ["printed"] * 15
+    finally:
+        fp.stop()
+
+
+def test_lost_lease_stops_printing_at_once(main):
+    dead = FakePrinter()
+    dead.stop()                                        # every send fails: jobs sit in backoff
+    keeper = leases.LeaseKeeper(ttl_sec=30, holder="loser")
+    q = print_queue.PrintQueue(print_queue.PrinterLink(dead.host, dead.port, timeout=1), name="mw-lost",
+                               backoff_sec=10, breaker=print_queue.CircuitBreaker(threshold=100))
+    shared = print_dispatch.SharedPrintQueue([q], keeper, poll_ms=20)
+    shared.start()
+    keeper.start()
+    try:
+        ids = [shared.submit(f"BenimGiriş|lost{i}", INFO) for i in range(3)]
+        deadline = time.monotonic() + 5
+        while q.retries < 1 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert q.depth() == 3 and _statuses(ids) == ["sending"] * 3
+        assert leases.acquire("print:mw-lost", "thief", ttl_sec=30, now=datetime.utcnow() + timedelta(seconds=60))
+        t0 = time.monotonic()
+        keeper.tick()                                  # renewal fails: the thief owns the printer
+        assert time.monotonic() - t0 < 2               # no drain after the lease is gone
+        assert shared.queues == [] and q.depth() == 0
+        assert _statuses(ids) == ["queued"] * 3         # for the new holder, printed once there
+    finally:
+        keeper.stop()
+        leases.release("print:mw-lost", "thief")
+
+
+def _idle_shared(*names):
+    queues = [print_queue.PrintQueue(print_queue.PrinterLink("127.0.0.1", 9), name=n) for n in names]
+    return queues, print_dispatch.SharedPrintQueue(queues, leases.LeaseKeeper(ttl_sec=30, holder="idle"))
+
+
+def test_failover_db_error_keeps_the_jobs(main, monkeypatch, capsys):
+    (broken, _), shared = _idle_shared("mw-fo-a", "mw-fo-b")
+    jobs = [print_queue.PrintJob(i, f"BenimGiriş|fo{i}", INFO) for i in range(3)]
+    for job in jobs:
+        broken.enqueue(job)
+
+    def db_down():
+        raise OperationalError("SELECT", {}, Exception("db down"))
+
+    monkeypatch.setattr(shared, "_waiting", db_down)
+    assert broken._fail_over() is False                # logged; the worker thread carries on
+    assert "Print failover fail:" in capsys.readouterr().out
+    assert broken.take_all() == jobs                   # back in order, none lost
+
+
+def test_no_failover_when_every_printer_is_down(main):
+    (a, b), shared = _idle_shared("mw-down-a", "mw-down-b")
+    for q in (a, b):
+        for _ in range(q.breaker.threshold):
+            q.breaker.record_failure()
+    job = print_queue.PrintJob(1, "BenimGiriş|down", INFO)
+    a.enqueue(job)
+    assert shared._failover(a) is False                # nowhere healthy: a keeps retrying its own
+    assert a.take_all() == [job] and shared.failovers == 0
+
+
+_SCANNER = """
+import random, sys
+from app import atomic_verify
+from app.db import SessionLocal
+tokens = sys.argv[1:]
+random.shuffle(tokens)
+allowed = []
+for t in tokens:
+    with SessionLocal() as db:
+        if atomic_verify.consume_scan(db, t)[1] == "allowed":
+            allowed.append(t)
+print(" ".join(allowed))
+"""
+
+
+def test_no_double_admission_across_processes(main, issue):
+    tokens = [issue(max_scans=1)[0] for _ in range(30)]
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "WORKERS": "4"}
+    procs = [subprocess.Popen([sys.executable, "-c", _SCANNER, *tokens], env=env,
+                              stdout=subprocess.PIPE, text=True) for _ in range(4)]
+    allowed = [t for p in procs for t in p.communicate(timeout=60)[0].split()]
+    assert sorted(allowed) == sorted(tokens)          # every pass admitted exactly once
+    with SessionLocal() as db:
+        counts = db.execute(select(QRToken.scan_count).where(QRToken.token.in_(tokens))).scalars().all()
+    assert counts == [1] * len(tokens)
+
+
+def test_async_dispatch_submits_off_the_event_loop(main):
+    import asyncio
+    import threading
+    from app import async_api
+
+    seen = []
+
+    class Recorder(print_dispatch.SharedPrintQueue):
+        def __init__(self):
+            pass
+
+        def submit(self, payload, info):
+            seen.append(threading.current_thread())
+            return 1
+
+    async def run():
+        async_api._dispatch_print("BenimGiriş|async", INFO)
+        await asyncio.gather(*async_api._tasks)
+
+    old, print_queue.queue = print_queue.queue, Recorder()
+    try:
+        asyncio.run(run())
+    finally:
+        print_queue.queue = old
+    assert len(seen) == 1 and seen[0] is not threading.main_thread()
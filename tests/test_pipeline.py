@@ -0,0 +1,143 @@
+# tests/test_pipeline.py
+# gate_scanner's capture/decode/verify threads with a fake camera: no device, no OpenCV window.
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "gate_scanner"))
+from pipeline import CaptureThread, DecodeWorker, LatestFrame, VerifyWorker  # noqa: E402
+
+from app import qr_render  # noqa: E402
+
+
+class FakeCamera:
+    """cv2.VideoCapture stand-in: hands out `frames` every `frame_sec`, then reports end of stream."""
+
+    def __init__(self, frames, frame_sec: float = 0.0, endless: bool = False):
+        self.frames = list(frames)
+        self.frame_sec = frame_sec
+        self.endless = endless
+        self.reads = 0
+
+    def read(self):
+        if self.frame_sec:
+            time.sleep(self.frame_sec)
+        if self.reads >= len(self.frames) and not self.endless:
+            return False, None
+        frame = self.frames[self.reads % len(self.frames)]
+        self.reads += 1
+        return True, frame
+
+    def get(self, prop):
+        return 0.0
+
+
+class SlowDecoder(DecodeWorker):
+    """Every frame 'contains' a QR whose text is the frame's pixel value; decoding takes `sec`."""
+
+    def __init__(self, buf, on_detect, sec: float):
+        super().__init__(buf, on_detect)
+        self.sec = sec
+
+    def decode(self, frame):
+        time.sleep(self.sec)
+        return str(int(frame[0, 0])), np.zeros((4, 2), np.float32), False
+
+
+def _frames(n: int):
+    return [np.full((8, 8), i, np.uint8) for i in range(1, n + 1)]
+
+
+def test_latest_frame_keeps_only_the_newest():
+    buf = LatestFrame()
+    for i, frame in enumerate(_frames(5)):
+        buf.put(frame, float(i))
+    seq, frame, ts = buf.get(0, timeout=0)
+    assert (seq, int(frame[0, 0]), ts) == (5, 5, 4.0)
+    assert buf.get(seq, timeout=0.01)[1] is None     # nothing newer
+    buf.close()
+    assert buf.get(seq, timeout=5)[1] is None         # close wakes a waiting reader at once
+
+
+def test_slow_decoder_drops_old_frames():
+    buf = LatestFrame()
+    seen = []
+    cap = CaptureThread(FakeCamera(_frames(30), frame_sec=0.002), buf)
+    dec = SlowDecoder(buf, seen.append, sec=0.03)
+    dec.start()
+    cap.start()
+    cap.join(5)
+    dec.join(5)
+    assert not cap.is_alive() and not dec.is_alive()  # end of stream closes the buffer, decoder exits
+    assert cap.frames == 30 and dec.decoded == len(seen)
+    assert 0 < len(seen) < 30                         # frames were dropped, not queued up
+    seqs = [d.seq for d in seen]
+    assert seqs == sorted(set(seqs))                  # never an older frame after a newer one
+    assert seen[-1].seq == 30 and seen[-1].data == "30"
+
+
+def test_decodes_a_real_qr():
+    img = cv2.imdecode(np.frombuffer(qr_render.png_bytes("gate-test|pipe"), np.uint8), cv2.IMREAD_COLOR)
+    buf = LatestFrame()
+    seen = []
+    dec = DecodeWorker(buf, seen.append)
+    dec.start()
+    buf.put(img, time.monotonic())
+    buf.close()
+    dec.join(5)
+    assert [d.data for d in seen] == ["gate-test|pipe"] and seen[0].points is not None
+
+
+def test_stop_ends_capture_and_decode():
+    buf = LatestFrame()
+    cap = CaptureThread(FakeCamera(_frames(3), frame_sec=0.001, endless=True), buf)
+    dec = SlowDecoder(buf, lambda d: None, sec=0.001)
+    cap.start()
+    dec.start()
+    time.sleep(0.05)
+    cap.stop()
+    cap.join(5)
+    assert not cap.is_alive() and buf.closed
+    dec.join(5)
+    assert not dec.is_alive() and dec.decoded > 0
+
+
+def test_video_file_ends_at_first_failed_read():
+    buf = LatestFrame()
+    cap = CaptureThread(FakeCamera(_frames(2)), buf, realtime=True)
+    cap.frame_sec = 0.001                              # FakeCamera reports no fps
+    cap.start()
+    cap.join(5)
+    assert not cap.is_alive() and (cap.frames, cap.failures) == (2, 1) and buf.closed
+
+
+def test_verify_worker_takes_one_payload_at_a_time():
+    release = threading.Event()
+    results = []
+
+    def verify(payload):
+        release.wait(5)
+        return {"ok": True}, 200
+
+    worker = VerifyWorker(verify, lambda *r: results.append(r[:3]))
+    worker.start()
+    assert worker.submit("a")
+    assert not worker.submit("b")                     # busy: dropped, not queued
+    release.set()
+    deadline = time.monotonic() + 5
+    while worker.busy and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert results == [("a", {"ok": True}, 200)]
+    assert worker.submit("c")
+    deadline = time.monotonic() + 5
+    while worker.busy and time.monotonic() < deadline:
+        time.sleep(0.005)
+    worker.stop()
+    worker.join(5)
+    assert not worker.is_alive() and [r[0] for r in results] == ["a", "c"]
@@ -0,0 +1,134 @@
+# tests/test_postgres.py
+# The PostgreSQL-specific paths against a real server: migrations under the
+# advisory lock, concurrent atomic consumption, the rollup upsert, batch verify.
+#
+# Uses TEST_PG_URL (e.g. postgresql+psycopg://postgres@localhost/qr_test - the
+# database is wiped) or, with initdb/pg_ctl on PATH, a throwaway cluster in a
+# temp dir. Skipped when neither is available or no driver is installed.
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import importlib.util
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app import atomic_verify, batch_verify, migrations, scan_analytics, scan_log_sink, token_index
+from app.db import make_engine
+from app.models import QRToken, ScanLog, ScanRollupHourly
+from app.tickets import token_row
+
+_DRIVER = next((d for d in ("psycopg", "psycopg2") if importlib.util.find_spec(d)), None)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def pg_url():
+    if os.environ.get("TEST_PG_URL"):
+        yield os.environ["TEST_PG_URL"]
+        return
+    if _DRIVER is None or not (shutil.which("initdb") and shutil.which("pg_ctl")):
+        pytest.skip("no PostgreSQL: set TEST_PG_URL or put initdb/pg_ctl + psycopg on PATH")
+
+    data = Path(tempfile.mkdtemp(prefix="qr-pg-")) / "data"
+    port = _free_port()
+    subprocess.run(["initdb", "-D", str(data), "-U", "postgres", "--auth=trust"],
+                   check=True, capture_output=True)
+    subprocess.run(["pg_ctl", "-D", str(data), "-w", "-l", str(data.parent / "pg.log"),
+                    "-o", f"-p {port} -k {data.parent} -c listen_addresses=127.0.0.1", "start"],
+                   check=True, capture_output=True)
+    try:
+        yield f"postgresql+{_DRIVER}://postgres@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run(["pg_ctl", "-D", str(data), "-m", "immediate", "stop"], capture_output=True)
+        shutil.rmtree(data.parent, ignore_errors=True)
+
+
+@pytest.fixture(scope="module")
+def pg(pg_url):
+    eng = make_engine(pg_url)
+    with eng.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture
+def Session(pg, monkeypatch):
+    monkeypatch.setattr(scan_log_sink, "sink", None)      # log straight into pg, not the test SQLite sink
+    monkeypatch.setattr(token_index, "index", None)
+    migrations.upgrade(pg)
+    return sessionmaker(bind=pg, autoflush=False, autocommit=False)
+
+
+def _tokens(Session, n, **overrides) -> list[str]:
+    now = datetime.now(timezone.utc)
+    rows = []
+    for _ in range(n):
+        row, _ = token_row(now, 60, 1, {"employee_id": "PG-1"})
+        rows.append({**row, **overrides})
+    with Session() as db:
+        db.execute(insert(QRToken), rows)
+        db.commit()
+    return [r["token"] for r in rows]
+
+
+def test_upgrade_concurrent_nodes(pg):
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: migrations.upgrade(pg), range(4)))
+    assert sum(len(r) for r in results) in (0, len(migrations.MIGRATIONS))    # each step once, in total
+    assert migrations.pending(pg) == []
+
+
+def test_atomic_consume_one_winner(Session):
+    token, = _tokens(Session, 1, max_scans=1)
+
+    def scan(_):
+        with Session() as db:
+            return atomic_verify.consume_scan(db, token)[1]
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(scan, range(16)))
+    assert results.count("allowed") == 1
+    with Session() as db:
+        assert db.execute(select(QRToken.scan_count, QRToken.status).where(QRToken.token == token)).one() \
+            == (1, "passive")
+
+
+def test_rollup_upsert(Session):
+    ts = datetime(2024, 5, 1, 10, 20)
+    rows = [{"ts": ts, "gate": "PG", "result": "allowed"}] * 3
+    with Session() as db:
+        scan_analytics.record_rollup(db, rows)
+        scan_analytics.record_rollup(db, rows[:1])
+        db.commit()
+        count = db.execute(select(ScanRollupHourly.count).where(ScanRollupHourly.gate == "PG")).scalar()
+    assert count == 4
+
+
+def test_batch_verify_concurrent(Session):
+    tokens = _tokens(Session, 20, max_scans=1)
+
+    def batch(_):
+        with Session() as db:
+            return batch_verify.verify_batch(db, [(t, None) for t in tokens], gate="PG-batch")
+
+    with ThreadPoolExecutor(4) as pool:
+        results = [b for res in pool.map(batch, range(4)) for b in res]
+    assert sum(1 for r in results if r["ok"]) == len(tokens)
+    with Session() as db:
+        logged = db.execute(select(func.count()).select_from(ScanLog).where(ScanLog.gate == "PG-batch")).scalar()
+    assert logged == 4 * len(tokens)
@@ -0,0 +1,107 @@
+# tests/test_print_queue.py
+# One PrintQueue / PrinterLink / CircuitBreaker against a local fake ESC/POS printer.
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+from fake_printer import FakePrinter  # noqa: E402
+
+from app import print_queue  # noqa: E402
+
+INFO = {"Kullancı Adı": "Test", "Görev": "Visitor", "Bölüm": "Other", "Maksımum Okuma": 1}
+TICKET = b"ticket\x1dVA\x00"          # ends with a cut: one ticket for the fake printer
+
+
+@pytest.fixture
+def fp():
+    printer = FakePrinter().start()
+    yield printer
+    printer.stop()
+
+
+def _dead_printer() -> FakePrinter:
+    dead = FakePrinter()
+    dead.stop()                       # nothing listens there any more
+    return dead
+
+
+def _wait(cond, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return cond()
+
+
+def test_link_reconnects_after_the_printer_closes(fp):
+    link = print_queue.PrinterLink(fp.host, fp.port, timeout=1)
+    link.send(TICKET)
+    assert fp.wait_for(1) and link.connects == 1
+    link.send(TICKET)                           # same connection
+    assert fp.wait_for(2) and link.connects == 1
+    fp.drop_connections()
+    assert _wait(lambda: link._peer_closed())
+    link.send(TICKET)
+    assert fp.wait_for(3) and link.connects == 2
+    link.close()
+
+
+def test_breaker_transitions():
+    b = print_queue.CircuitBreaker(threshold=2, reset_sec=0.05)
+    assert b.state == "closed"
+    b.record_failure()
+    assert b.state == "closed"
+    b.record_failure()
+    assert b.state == "open" and b.retry_in() > 0
+    time.sleep(0.06)
+    assert b.state == "half_open"
+    b.record_failure()                          # the trial failed: open again at once
+    assert b.state == "open"
+    time.sleep(0.06)
+    b.record_success()
+    assert b.state == "closed" and b.failures == 0
+
+
+def test_retries_with_backoff_then_fails():
+    q = print_queue.PrintQueue(print_queue.PrinterLink("127.0.0.1", _dead_printer().port, timeout=1),
+                               max_retries=2, backoff_sec=0.01,
+                               breaker=print_queue.CircuitBreaker(threshold=100))
+    q.start()
+    job_id = q.submit("BenimGiriş|retry", INFO)
+    assert _wait(lambda: q.failed == 1)
+    q.stop()
+    assert q.retries == 2 and q.printed == 0
+    job = q._recent[-1]
+    assert (job.id, job.status, job.attempts) == (job_id, "failed", 3) and job.error
+
+
+def test_max_jobs_rejects_when_full(fp):
+    q = print_queue.PrintQueue(print_queue.PrinterLink(fp.host, fp.port), max_jobs=2)   # not started
+    assert q.submit("BenimGiriş|a", INFO) is not None
+    assert q.submit("BenimGiriş|b", INFO) is not None
+    assert q.submit("BenimGiriş|c", INFO) is None
+    assert q.rejected == 1 and q.depth() == 2
+
+
+def test_stop_drains_the_queue(fp):
+    q = print_queue.PrintQueue(print_queue.PrinterLink(fp.host, fp.port, timeout=1))
+    q.start()
+    for i in range(10):
+        q.submit(f"BenimGiriş|drain{i}", INFO)
+    q.stop(timeout=10)
+    assert fp.tickets == 10 and q.printed == 10 and q.depth() == 0
+
+
+def test_stop_leaves_unprintable_jobs_queued():
+    q = print_queue.PrintQueue(print_queue.PrinterLink("127.0.0.1", _dead_printer().port, timeout=1),
+                               backoff_sec=10, breaker=print_queue.CircuitBreaker(threshold=100))
+    q.start()
+    for i in range(3):
+        q.submit(f"BenimGiriş|left{i}", INFO)
+    assert _wait(lambda: q.retries == 1)       # first job backing off
+    t0 = time.monotonic()
+    q.stop(timeout=0.2)
+    assert time.monotonic() - t0 < 5
+    assert [j.payload for j in q.take_all()] == [f"BenimGiriş|left{i}" for i in range(3)]
@@ -0,0 +1,84 @@
+# tests/test_printer_pool.py
+# PrinterPool against several local fake ESC/POS printers (tools/fake_printer.py).
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+from fake_printer import FakePrinter  # noqa: E402
+
+from app import print_queue  # noqa: E402
+
+INFO = {"Kullancı Adı": "Test", "Görev": "Visitor", "Bölüm": "Other", "Maksımum Okuma": 1}
+
+
+def _queue(fp, **kw):
+    link = print_queue.PrinterLink(fp.host, fp.port, timeout=1)
+    return print_queue.PrintQueue(link, backoff_sec=0.01,
+                                  breaker=print_queue.CircuitBreaker(threshold=1, reset_sec=60), **kw)
+
+
+@pytest.fixture
+def printers():
+    fps = [FakePrinter(delay_ms=5).start() for _ in range(3)]
+    yield fps
+    for fp in fps:
+        fp.stop()
+
+
+def test_least_busy_spreads_load_by_weight(printers):
+    a, b, c = printers
+    pool = print_queue.PrinterPool([_queue(a, name="a"), _queue(b, name="b", weight=2), _queue(c, name="c")])
+    pool.start()
+    for i in range(40):
+        pool.submit(f"BenimGiriş|t{i}", INFO)
+    assert FakePrinter.wait_total(printers, 40)
+    pool.stop()
+    assert b.tickets >= a.tickets and b.tickets >= c.tickets
+    status = pool.status()
+    assert status["printed"] == 40 and status["failed"] == 0
+    assert sum(p["printed"] for p in status["printers"]) == 40
+
+
+def test_affinity_routes_matching_tickets(printers):
+    a, hr, _ = printers
+    pool = print_queue.PrinterPool([_queue(a, name="main"), _queue(hr, name="hr", department="HR")])
+    pool.start()
+    for i in range(5):
+        pool.submit(f"BenimGiriş|hr{i}", {**INFO, "Bölüm": "HR"})
+    for i in range(5):
+        pool.submit(f"BenimGiriş|x{i}", INFO)
+    assert FakePrinter.wait_total([a, hr], 10)
+    pool.stop()
+    assert hr.tickets == 5 and a.tickets == 5
+
+
+def test_failover_when_a_printer_drops(printers):
+    good = printers[0]
+    dead = FakePrinter()
+    dead.stop()                           # nothing listens there any more
+    q_dead = _queue(dead, name="dead", weight=10)   # would win every pick while healthy
+    pool = print_queue.PrinterPool([q_dead, _queue(good, name="good")])
+    pool.start()
+    for i in range(10):
+        pool.submit(f"BenimGiriş|f{i}", INFO)
+    assert good.wait_for(10)
+    pool.stop()
+    status = pool.status()
+    assert status["failovers"] >= 1
+    assert status["printed"] == 10
+    assert {p["name"]: p["breaker"] for p in status["printers"]}["dead"] == "open"
+
+
+def test_failover_overflow_is_finished_as_failed(printers):
+    finished = []
+    broken = _queue(printers[0], name="broken")
+    full = _queue(printers[1], name="full", max_jobs=1)     # not started: keeps what it gets
+    pool = print_queue.PrinterPool([broken, full])
+    broken.on_finish = finished.append
+    for i in range(3):
+        broken.submit(f"BenimGiriş|o{i}", INFO)
+    assert pool._failover(broken)
+    assert full.depth() == 1
+    assert [j.status for j in finished] == ["failed", "failed"] and broken.failed == 2
@@ -0,0 +1,51 @@
+# tests/test_qr_png.py
+from io import BytesIO
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app import image_store, qr_render
+from app.config import settings
+
+
+@pytest.fixture
+def client(main):
+    return TestClient(main.app)
+
+
+def test_png_served_without_disk_file(main, issue, client, monkeypatch):
+    monkeypatch.setattr(settings, "QR_SAVE_PNG", False)
+    token, payload = issue()
+    assert not image_store.store.path(token).exists()
+
+    r = client.get(f"/qr/png/{token}")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/png"
+    assert "immutable" in r.headers["cache-control"]
+    assert r.content == qr_render.png_bytes(payload)
+
+
+def test_if_none_match_returns_304(issue, client):
+    token, _ = issue()
+    etag = client.get(f"/qr/png/{token}").headers["etag"]
+    r = client.get(f"/qr/png/{token}", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert client.get(f"/qr/png/{token}?size=300", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_size_and_svg_variants(issue, client):
+    token, _ = issue()
+    img = Image.open(BytesIO(client.get(f"/qr/png/{token}?size=200").content))
+    assert img.width <= 200 and img.width == img.height
+
+    r = client.get(f"/qr/png/{token}?format=svg&size=256")
+    assert r.headers["content-type"].startswith("image/svg+xml")
+    assert r.content.startswith(b"<svg") and b'width="256"' in r.content
+
+
+def test_unknown_token_and_bad_format(issue, client):
+    assert client.get("/qr/png/does-not-exist").status_code == 404
+    token, _ = issue()
+    assert client.get(f"/qr/png/{token}?format=gif").status_code == 400
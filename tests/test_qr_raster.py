@@ -0,0 +1,35 @@
+# tests/test_qr_raster.py
+# The NumPy renderers must produce exactly what the Pillow / python-escpos path does.
+from io import BytesIO
+
+import pytest
+from escpos.printer import Dummy
+from PIL import Image
+
+from app import qr_raster, qr_render
+
+pytest.importorskip("numpy")
+
+PAYLOADS = ["BenimGiriş|0b9c7f4e-2a51-4c55-9d7e-6f0c9a1b2c3d", "BenimGiriş|" + "x" * 300]
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+@pytest.mark.parametrize("box,border", [(qr_render.PRINT_BOX_SIZE, qr_render.PRINT_BORDER), (3, 0), (20, 4)])
+def test_raster_matches_escpos_bit_image_raster(payload, box, border):
+    p = Dummy()
+    p.image(qr_render.qr_image(payload, box, border).convert("RGB"), impl="bitImageRaster")   # (20, 4): > 960 rows
+    assert qr_raster.escpos_raster(qr_render.qr_array(payload), box, border) == p.output
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_png_same_pixels_as_pillow(payload):
+    png = Image.open(BytesIO(qr_raster.png_1bit(qr_render.qr_array(payload), 10, 4)))
+    ref = qr_render.qr_image(payload, 10, 4)
+    assert png.mode == "1" and png.size == ref.size
+    assert png.tobytes() == ref.tobytes()
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_svg_path_same_runs(payload):
+    assert qr_raster.svg_path(qr_render.qr_array(payload), 4) == \
+        "".join(qr_render._svg_runs(qr_render.qr_matrix(payload), 4))
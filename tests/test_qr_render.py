@@ -0,0 +1,42 @@
+# tests/test_qr_render.py
+# One encode per payload: every output comes from the cached qr_matrix().
+import base64
+from uuid import uuid4
+
+import pytest
+
+from app import qr_raster, qr_render
+
+
+def _payload() -> str:
+    return f"BenimGiris|{uuid4()}"       # ASCII: OpenCV's decoder misses non-ASCII QR text
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_every_output_from_one_matrix(numpy, monkeypatch):
+    if numpy and not qr_raster.available():
+        pytest.skip("NumPy not installed")
+    monkeypatch.setattr(qr_raster, "available", lambda: numpy)
+    payload = _payload()
+    misses = qr_render.qr_matrix.cache_info().misses
+
+    png = qr_render.cached_png(payload)
+    preview = qr_render.png_b64(png)
+    bitmap = qr_render.print_image(payload)
+    if numpy:
+        qr_render.print_raster(payload)
+    qr_render.svg_bytes(payload)
+
+    assert qr_render.qr_matrix.cache_info().misses == misses + 1
+    assert qr_render.cached_png(payload) is png               # served from the PNG LRU
+    assert base64.b64decode(preview) == png
+    n = len(qr_render.qr_matrix(payload))
+    assert bitmap.size == ((n + 2 * qr_render.PRINT_BORDER) * qr_render.PRINT_BOX_SIZE,) * 2
+
+
+def test_cached_png_decodes_to_the_payload():
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+    payload = _payload()
+    img = cv2.imdecode(np.frombuffer(qr_render.cached_png(payload), np.uint8), cv2.IMREAD_GRAYSCALE)
+    assert cv2.QRCodeDetector().detectAndDecode(img)[0] == payload
@@ -0,0 +1,107 @@
+# tests/test_scan_analytics.py
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import scan_analytics, scan_log_sink
+from app.db import SessionLocal, engine
+from app.models import ScanRollupHourly
+from app.tickets import ISSUER
+
+
+def _verify(main, payload, gate):
+    with SessionLocal() as db:
+        return main.verify_qr({"payload": payload, "gate": gate}, db)
+
+
+def _rollup(gate):
+    with engine.connect() as conn:
+        rows = conn.execute(select(ScanRollupHourly.result, ScanRollupHourly.count)
+                            .where(ScanRollupHourly.gate == gate)).all()
+    return {r.result: r.count for r in rows}
+
+
+def test_rollup_follows_verify(main, issue):
+    gate = f"G-{uuid4().hex[:6]}"
+    _, payload = issue(max_scans=1)
+    _verify(main, payload, gate)
+    _verify(main, payload, gate)
+    _verify(main, f"{ISSUER}|missing", gate)
+    with SessionLocal() as db:
+        main.verify_qr_batch({"payloads": [payload, "garbage"], "gate": gate}, db)
+
+    assert _rollup(gate) == {"allowed": 1, "denied:passive": 2, "denied:not_found": 1,
+                             "denied:bad_payload": 1}
+
+    client = TestClient(main.app)
+    lines = client.get("/scans/hourly", params={"gate": gate}).text.splitlines()
+    assert len(lines) == 1
+    bucket = json.loads(lines[0])
+    assert bucket["gate"] == gate and bucket["allowed"] == 1 and bucket["denied"] == 4
+
+    rows = list(csv.reader(io.StringIO(client.get("/scans/hourly", params={"gate": gate, "format": "csv"}).text)))
+    assert rows[0] == ["hour", "gate", "allowed", "denied"] and rows[1][1:] == [gate, "1", "4"]
+
+
+def test_buffered_sink_updates_rollup():
+    gate = f"G-{uuid4().hex[:6]}"
+    sink = scan_log_sink.ScanLogSink(flush_ms=10)
+    sink.start()
+    for _ in range(3):
+        sink.put("tok", "allowed", "", gate)
+    sink.put("tok", "denied:expired", "", gate)
+    sink.stop()
+    assert _rollup(gate) == {"allowed": 3, "denied:expired": 1}
+
+
+def test_export_keyset_pages_and_resume(main, issue):
+    gate = f"G-{uuid4().hex[:6]}"
+    for _ in range(7):
+        _verify(main, f"{ISSUER}|missing-{uuid4().hex[:4]}", gate)
+
+    pages = list(scan_analytics.iter_scans(gate=gate, page=3))
+    assert [len(p) for p in pages] == [3, 3, 1]
+    rows = [r for p in pages for r in p]
+    assert [(r.ts, r.id) for r in rows] == sorted((r.ts, r.id) for r in rows)
+
+    client = TestClient(main.app)
+    got = [json.loads(l) for l in client.get("/scans/export", params={"gate": gate}).text.splitlines()]
+    assert [g["id"] for g in got] == [r.id for r in rows]
+    assert all(g["result"] == "denied:not_found" and g["gate"] == gate for g in got)
+
+    cursor = f"{rows[2].ts.isoformat()},{rows[2].id}"
+    res = client.get("/scans/export", params={"gate": gate, "after": cursor, "limit": 2, "format": "csv"})
+    table = list(csv.reader(io.StringIO(res.text)))
+    assert table[0] == list(scan_analytics.EXPORT_COLUMNS)
+    assert [int(r[0]) for r in table[1:]] == [rows[3].id, rows[4].id]
+
+    assert client.get("/scans/export", params={"since": "yesterday"}).status_code == 400
+
+
+def test_result_prefix_and_time_filters(main, issue):
+    gate = f"G-{uuid4().hex[:6]}"
+    _, payload = issue(max_scans=1)
+    _verify(main, payload, gate)
+    _verify(main, payload, gate)
+    denied = [r for p in scan_analytics.iter_scans(gate=gate, result="denied:") for r in p]
+    assert [r.result for r in denied] == ["denied:passive"]
+    for wild in ("%:", "d_nied:", "denied%:"):      # LIKE wildcards in the prefix are literal
+        assert list(scan_analytics.iter_scans(gate=gate, result=wild)) == []
+    future = datetime.utcnow() + timedelta(hours=1)
+    assert list(scan_analytics.iter_scans(gate=gate, since=future)) == []
+
+
+def test_rebuild_matches_incremental(main, issue):
+    gate = f"G-{uuid4().hex[:6]}"
+    _, payload = issue(max_scans=2)
+    _verify(main, payload, gate)
+    _verify(main, payload, gate)
+    _verify(main, payload, gate)
+    before = _rollup(gate)
+    scan_analytics.rebuild()
+    assert _rollup(gate) == before == {"allowed": 2, "denied:passive": 1}
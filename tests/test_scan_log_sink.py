@@ -0,0 +1,109 @@
+# tests/test_scan_log_sink.py
+# Write-behind scan log buffer: backpressure policies, flush triggers, drain, rollup, DB failures.
+import threading
+import time
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import func, select
+
+from app import scan_log_sink
+from app.db import engine
+from app.models import ScanLog, ScanRollupHourly
+
+
+def _wait(cond, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return cond()
+
+
+def _logged(prefix: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).where(ScanLog.token.like(f"{prefix}%"))).scalar_one()
+
+
+def _put(sink, prefix: str, n: int, gate: str | None = None):
+    for i in range(n):
+        assert sink.put(f"{prefix}{i}", "allowed", "", gate)
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        scan_log_sink.ScanLogSink(policy="wait")
+
+
+def test_drop_policy_counts_rejected_rows():
+    sink = scan_log_sink.ScanLogSink(queue_max=2, policy="drop")      # not started
+    assert sink.put("a", "allowed", "") and sink.put("b", "allowed", "")
+    t0 = time.monotonic()
+    assert not sink.put("c", "allowed", "")
+    assert time.monotonic() - t0 < 0.05                                  # never waits
+    assert sink.dropped == 1 and sink.depth() == 2
+
+
+def test_block_policy_waits_for_room():
+    sink = scan_log_sink.ScanLogSink(queue_max=1, policy="block", block_ms=50)
+    assert sink.put("a", "allowed", "")
+    t0 = time.monotonic()
+    assert not sink.put("b", "allowed", "")                              # no room within block_ms
+    assert time.monotonic() - t0 >= 0.04 and sink.dropped == 1
+
+    sink.block_sec = 5
+    threading.Timer(0.05, sink._q.get).start()                           # the writer frees a slot
+    assert sink.put("c", "allowed", "") and sink.dropped == 1
+
+
+def test_flush_when_batch_is_full(main):
+    prefix = f"batch-{uuid4().hex[:8]}-"
+    sink = scan_log_sink.ScanLogSink(flush_ms=60_000, batch=3)
+    sink.start()
+    try:
+        _put(sink, prefix, 3)
+        assert _wait(lambda: sink.written == 3)                         # long before the interval
+        assert sink.flushes == 1 and _logged(prefix) == 3
+    finally:
+        sink.stop()
+
+
+def test_flush_after_interval(main):
+    prefix = f"interval-{uuid4().hex[:8]}-"
+    sink = scan_log_sink.ScanLogSink(flush_ms=50, batch=1000)
+    sink.start()
+    try:
+        _put(sink, prefix, 2)
+        assert _wait(lambda: sink.written == 2, timeout=2)
+        assert _logged(prefix) == 2
+    finally:
+        sink.stop()
+
+
+def test_stop_drains_and_updates_rollup(main):
+    prefix = f"drain-{uuid4().hex[:8]}-"
+    gate = f"gate-{prefix}"
+    sink = scan_log_sink.ScanLogSink(flush_ms=60_000, batch=4)
+    sink.start()
+    _put(sink, prefix, 10, gate=gate)
+    sink.put(f"{prefix}x", "denied:passive", "", gate)
+    sink.stop()
+    assert sink.written == 11 and sink.depth() == 0 and _logged(prefix) == 11
+    with engine.connect() as conn:
+        rollup = dict(conn.execute(select(ScanRollupHourly.result, func.sum(ScanRollupHourly.count))
+                                   .where(ScanRollupHourly.gate == gate)
+                                   .group_by(ScanRollupHourly.result)).all())
+    assert rollup == {"allowed": 10, "denied:passive": 1}
+
+
+def test_write_failure_is_counted_apart_from_drops(main, monkeypatch, capsys):
+    class DownEngine:
+        def begin(self):
+            raise RuntimeError("db down")
+
+    monkeypatch.setattr(scan_log_sink, "engine", DownEngine())
+    sink = scan_log_sink.ScanLogSink(flush_ms=60_000, batch=100)
+    sink.start()
+    _put(sink, "fail-", 3)
+    sink.stop()
+    assert (sink.failed, sink.dropped, sink.written) == (3, 0, 0)
+    assert "Scan log flush fail:" in capsys.readouterr().out
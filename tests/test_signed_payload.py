@@ -0,0 +1,88 @@
+# tests/test_signed_payload.py
+# Signed payloads: server-side checks and gate_scanner's offline validator.
+from datetime import datetime, timedelta, timezone
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from app import signed_payload
+from app.config import settings
+from app.db import SessionLocal
+from app.tickets import ISSUER
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "gate_scanner"))
+from offline import OfflineValidator  # noqa: E402
+
+KEY = "test-signing-key"
+
+
+@pytest.fixture
+def signing(monkeypatch):
+    monkeypatch.setattr(settings, "QR_SIGNING_KEY", KEY)
+
+
+def _verify(main, payload):
+    with SessionLocal() as db:
+        return main.verify_qr({"payload": payload}, db)
+
+
+def _tamper(payload, field, value):
+    parts = payload.split("|")
+    parts[field] = value
+    return "|".join(parts)
+
+
+def test_issue_signs_and_server_accepts(main, issue, signing):
+    token, payload = issue(max_scans=1)
+    sp = signed_payload.unpack(payload)
+    assert (sp.issuer, sp.token, sp.max_scans) == (ISSUER, token, 1)
+    assert signed_payload.valid(KEY.encode(), sp)
+    assert _verify(main, payload)["ok"] is True
+    assert _verify(main, payload)["reason"] == "passive"
+    assert _verify(main, f"{ISSUER}|{token}")["reason"] == "passive"   # plain form still accepted
+
+
+@pytest.mark.parametrize("field,value", [(1, "other-token"), (2, "0"), (3, "99"), (4, "AAAAAAAAAAAAAAAAAAAAAA")])
+def test_tampered_payload_is_rejected(main, issue, signing, field, value):
+    _, payload = issue(max_scans=1)
+    bad = _tamper(payload, field, value)
+    assert _verify(main, bad) == {"ok": False, "reason": "bad_signature"}
+    assert _verify(main, payload)["ok"] is True          # the tampered attempt consumed nothing
+
+
+def test_offline_rejects_tampered_and_expired(tmp_path):
+    gate = OfflineValidator(KEY, "BenimGiriş", tmp_path / "journal.jsonl")
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    expired = signed_payload.sign(KEY.encode(), "BenimGiriş", "t-exp", past, 5)
+    assert gate.check(expired)[0]["reason"] == "expired"
+
+    future = datetime.now(timezone.utc) + timedelta(hours=1)
+    good = signed_payload.sign(KEY.encode(), "BenimGiriş", "t-ok", future, 5)
+    assert gate.check(_tamper(good, 3, "50"))[0]["reason"] == "bad_signature"
+    assert gate.check("BenimGiriş|plain-token") is None   # not signed: ask the server
+    assert gate.pending() == 0
+
+
+def test_offline_scan_survives_restart_and_reconciles(main, issue, signing, tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    token, payload = issue(max_scans=1)
+
+    offline = lambda p: ({"ok": False, "reason": "network_error"}, 0)
+    gate = OfflineValidator(KEY, ISSUER, journal, send=offline)
+    t0 = time.perf_counter()
+    resp, _ = gate.check(payload)
+    assert resp["ok"] and resp["offline"] and time.perf_counter() - t0 < 0.05
+    assert gate.reconcile() == 0 and gate.pending() == 1          # server unreachable
+
+    # gate restarts: the journal still knows the pass is used up
+    gate = OfflineValidator(KEY, ISSUER, journal, send=offline)
+    assert gate.pending() == 1
+    assert gate.check(payload)[0]["reason"] == "max_scans_reached"
+
+    # network back: the offline scan reaches the server exactly once
+    gate.send = lambda p: (_verify(main, p), 200)
+    assert gate.reconcile() == 1 and gate.pending() == 0 and gate.conflicts == 0
+    assert _verify(main, payload)["reason"] == "passive"           # replay at an online gate
+    assert OfflineValidator(KEY, ISSUER, journal).check(payload)[0]["reason"] == "max_scans_reached"
@@ -0,0 +1,50 @@
+# tests/test_ticket_template.py
+# The precompiled ticket must be byte-for-byte what the python-escpos call
+# sequence in app.printer._write_ticket produces.
+from escpos.constants import QR_ECLEVEL_M
+from escpos.printer import Dummy
+import pytest
+
+from app import printer, ticket_template
+
+INFOS = [
+    {   # what issue_qr sends
+        "Kullancı Adı": "Ayşe Yılmaz", "Eposta": "ayse@example.com", "Görev": "Visitor",
+        "Kullancı No": "E00042", "Bölüm": "İnsan Kaynakları", "Aktif Okuma Sureci(Local)": "2025-01-01 10:00:00",
+        "Maksımum Okuma": 2,
+    },
+    {   # anonymous pass: all person fields None
+        "Kullancı Adı": None, "Eposta": None, "Görev": None, "Kullancı No": None, "Bölüm": None,
+        "Aktif Okuma Sureci(Local)": "No expiry", "Maksımum Okuma": 1,
+    },
+    {"Name": "plain ascii only", "Count": 3},
+    {"Ad": "Çağrı Öztürk ĞÜŞİÖÇ ğüşıöç", "Not": "Grüße, café, naïve", "Euro": "€ 10", "x": "ñ ø å"},
+    {"Emoji": "gate 🚪 ok", "Greek": "Ωμέγα", "Cyrillic": "Привет", "CJK": "访客"},
+    {},
+]
+
+
+def _reference(payload, info):
+    p = Dummy()
+    printer._write_ticket(p, payload, info)
+    return p.output
+
+
+@pytest.mark.parametrize("info", INFOS)
+def test_bitmap_template_matches_escpos_output(info):
+    payload = "BenimGiriş|0b9c7f4e-2a51-4c55-9d7e-6f0c9a1b2c3d"
+    assert ticket_template.TicketTemplate("bitmap").render(payload, info) == _reference(payload, info)
+
+
+def test_template_state_does_not_leak_between_tickets():
+    t = ticket_template.TicketTemplate("bitmap")
+    for info in INFOS + INFOS[::-1]:
+        assert t.render("BenimGiriş|abc", info) == _reference("BenimGiriş|abc", info)
+
+
+@pytest.mark.parametrize("info", INFOS[:2])
+def test_native_template_matches_escpos_native_qr(info, monkeypatch):
+    monkeypatch.setattr(printer, "_native_qr",
+                        lambda p, payload: p.qr(payload, size=8, ec=QR_ECLEVEL_M, model=2, native=True))
+    payload = "BenimGiriş|" + "x" * 300      # store-data length > 255 needs both pL and pH
+    assert ticket_template.TicketTemplate("native").render(payload, info) == _reference(payload, info)
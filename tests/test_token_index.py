@@ -0,0 +1,104 @@
+# tests/test_token_index.py
+# VERIFY_MODE="index": decisions in memory, scan_count / status written back later.
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import threading
+
+import pytest
+from sqlalchemy import select
+
+from app import token_index
+from app.db import SessionLocal
+from app.models import QRToken
+
+
+def _db(token):
+    with SessionLocal() as db:
+        return tuple(db.execute(select(QRToken.scan_count, QRToken.status)
+                                .where(QRToken.token == token)).one())
+
+
+@pytest.mark.parametrize("max_scans", [1, 3])
+def test_concurrent_verifies_never_over_admit(issue, max_scans):
+    token, _ = issue(max_scans=max_scans)
+    idx = token_index.TokenIndex()
+    start = threading.Barrier(16)
+
+    def hit(_):
+        start.wait()
+        return idx.verify(token)[1]
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(hit, range(16)))
+    assert results.count("allowed") == max_scans
+    assert set(results) - {"allowed"} <= {"denied:passive", "denied:max_scans_reached"}
+
+
+def test_miss_loads_from_db_then_hits(issue):
+    token, _ = issue(max_scans=2)
+    idx = token_index.TokenIndex()
+    assert token not in idx
+    assert idx.verify(token)[1] == "allowed" and idx.misses == 1 and token in idx
+    assert idx.verify(token)[1] == "allowed" and idx.hits == 1
+    assert idx.verify("no-such-token")[1] == "denied:not_found"
+
+
+def test_flush_writes_back_and_evicts_passive(issue):
+    token, _ = issue(max_scans=2)
+    idx = token_index.TokenIndex()
+    idx.verify(token)
+    assert _db(token) == (0, "active")            # not written yet
+    assert idx.flush() == 1
+    assert _db(token) == (1, "active") and token in idx
+    idx.verify(token)
+    assert idx.flush() == 1
+    assert _db(token) == (2, "passive") and token not in idx
+    assert idx.flush() == 0
+
+
+def test_expired_entries_are_evicted(issue):
+    expired, _ = issue()
+    live, _ = issue()
+    never, _ = issue(minutes_valid=0)
+    idx = token_index.TokenIndex()
+    idx.start()
+    idx.stop()                                    # loaded, writer thread not needed here
+    later = datetime.utcnow() + timedelta(days=365 * 100)
+    with SessionLocal() as db:
+        db.query(QRToken).filter(QRToken.token == live).update({"expires_at": later})
+        db.commit()
+    idx.put({"token": live, "status": "active", "expires_at": later, "scan_count": 0, "max_scans": 1})
+    keep = {t for t, e in idx._entries.items() if e.expires_at is None or e.expires_at == later}
+    assert idx.evict_expired(now=later - timedelta(days=1)) > 0
+    assert set(idx._entries) == keep and {live, never} <= keep
+    assert expired not in idx and live in idx and never in idx
+    assert idx.verify(expired, now=later)[1] == "denied:expired"             # reloaded, still denied
+    assert idx.evict_expired(now=later) == 0     # pending write-back: kept until flushed
+    idx.flush()
+    assert _db(expired) == (0, "passive") and expired not in idx
+
+
+def test_stop_drains_pending_writes(issue):
+    token, _ = issue(max_scans=3)
+    idx = token_index.TokenIndex(flush_ms=60_000)     # the writer thread never gets to it
+    idx.start()
+    idx.verify(token)
+    idx.verify(token)
+    idx.stop()
+    assert _db(token) == (2, "active")
+
+
+def test_failed_flush_is_retried_with_newest_values(issue, monkeypatch):
+    token, _ = issue(max_scans=3)
+    idx = token_index.TokenIndex()
+    idx.verify(token)
+
+    def db_down():
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(token_index, "SessionLocal", db_down)
+    assert idx.flush() == 0
+    idx.verify(token)                                 # newer value while the write is pending
+    monkeypatch.undo()
+    assert idx.flush() == 1
+    assert _db(token) == (2, "active")
@@ -0,0 +1,117 @@
+# tests/test_token_pool.py
+# Pre-issued tokens: not passes while pooled, bound once on issue, adopted after a restart.
+import time
+
+from sqlalchemy import func, select
+
+from app import atomic_verify, batch_verify, qr_render, ticket_template, token_pool
+from app.db import SessionLocal
+from app.models import QRToken
+from app.tickets import POOLED, qr_payload
+
+
+def _pooled_count() -> int:
+    with SessionLocal() as db:
+        return db.execute(select(func.count()).where(QRToken.status == POOLED)).scalar_one()
+
+
+def _fresh_pool(**kw) -> token_pool.TokenPool:
+    token_pool.discard_all()
+    return token_pool.TokenPool(**{"high": 10, "low": 2, "batch": 5, "idle_ms": 0, **kw})
+
+
+def test_pooled_token_is_not_a_pass(main):
+    pool = _fresh_pool()
+    pool.refill_batch()
+    token = pool._ready[0].token
+    payload = qr_payload(token)
+    with SessionLocal() as db:
+        assert main.verify_qr({"payload": payload}, db=db) == {"ok": False, "reason": "not_found"}
+        assert atomic_verify.consume_scan(db, token)[1] == "denied:not_found"
+        assert batch_verify.verify_batch(db, [(token, None)])[0]["reason"] == "not_found"
+        assert main.qr_status(token, db=db) == {"ok": False, "reason": "not_found"}
+    assert _pooled_count() == 5
+
+
+def test_issue_binds_a_pooled_token(main, issue):
+    pool = _fresh_pool(prime_tickets=True)
+    pool.refill_batch()
+    tokens = [e.token for e in pool._ready]
+    main.token_pool.pool = pool
+    try:
+        token, payload = issue(full_name="Pool Person", max_scans=2)
+    finally:
+        main.token_pool.pool = None
+    assert token == tokens[0] and pool.hits == 1 and len(pool) == 4
+    # the ticket's bitmap QR was handed over, and it is what the printer would render
+    assert ticket_template._take_primed(payload) == ticket_template.bitmap_qr(payload)
+    with SessionLocal() as db:
+        rec = db.execute(select(QRToken).where(QRToken.token == token)).scalar_one()
+        assert (rec.status, rec.full_name, rec.max_scans) == ("active", "Pool Person", 2)
+        assert rec.expires_at is not None
+        assert main.verify_qr({"payload": payload}, db=db)["ok"]
+    assert _pooled_count() == 4
+
+
+def test_preview_png_is_the_pre_rendered_one(main):
+    pool = _fresh_pool()
+    pool.refill_batch()
+    token = pool._ready[0].token
+    row, exp, png = pool.take(token_pool._utcnow(), 60, 1, {})
+    assert row["token"] == token and png == qr_render.png_bytes(qr_payload(token))
+
+
+def test_empty_pool_falls_back(main, issue):
+    pool = _fresh_pool()
+    main.token_pool.pool = pool
+    try:
+        token, _ = issue()
+    finally:
+        main.token_pool.pool = None
+    assert pool.misses == 1 and pool.hits == 0
+    with SessionLocal() as db:
+        assert db.execute(select(QRToken.status).where(QRToken.token == token)).scalar_one() == "active"
+
+
+def test_restart_adopts_and_trims_pooled_rows(main):
+    old = _fresh_pool(high=10)
+    old.refill_batch()
+    old.refill_batch()
+    assert _pooled_count() == 10
+
+    new = token_pool.TokenPool(high=4, low=1)         # restarted with a smaller pool
+    assert new.reclaim() == 4
+    assert [e.token for e in new._ready] == [e.token for e in old._ready][:4]
+    assert new.discarded == 6 and _pooled_count() == 4
+
+
+def test_workers_adopting_the_same_row_issue_it_once(main):
+    a = _fresh_pool(high=3, workers=2)
+    a.refill_batch()
+    b = token_pool.TokenPool(high=3, low=1, workers=2)
+    b.reclaim()
+    now = token_pool._utcnow()
+    first = b.take(now, 60, 1, {})[0]["token"]
+    second = a.take(now, 60, 1, {})[0]["token"]        # a's first entry is gone: moves on
+    assert first != second and a.conflicts == 1
+
+
+def test_refills_between_watermarks(main):
+    pool = _fresh_pool(high=8, low=3, batch=4)
+    pool.start()
+    try:
+        deadline = time.monotonic() + 10
+        while len(pool) < 8 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(pool) == 8 and pool.refills == 2
+        now = token_pool._utcnow()
+        for _ in range(5):                           # 3 left: not below low yet
+            pool.take(now, 60, 1, {})
+        time.sleep(0.1)
+        assert len(pool) == 3 and pool.refills == 2
+        pool.take(now, 60, 1, {})                    # 2 < low: back up to high
+        while len(pool) < 8 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(pool) == 8 and pool.created == 14
+    finally:
+        pool.stop()
@@ -0,0 +1,73 @@
+# tests/test_verify.py
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import threading
+
+import pytest
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import QRToken
+from app.tickets import ISSUER
+
+
+@pytest.fixture
+def atomic_mode():
+    old = settings.VERIFY_MODE
+    settings.VERIFY_MODE = "atomic"
+    yield
+    settings.VERIFY_MODE = old
+
+
+def _verify(main, payload):
+    with SessionLocal() as db:
+        return main.verify_qr({"payload": payload}, db)
+
+
+def _row(token):
+    with SessionLocal() as db:
+        return db.query(QRToken).filter(QRToken.token == token).first()
+
+
+@pytest.mark.parametrize("max_scans", [1, 3])
+def test_atomic_parallel_verifies_never_over_admit(main, issue, atomic_mode, max_scans):
+    token, payload = issue(max_scans=max_scans)
+    start = threading.Barrier(16)
+
+    def hit(_):
+        start.wait()          # release all turnstiles at the same moment
+        return _verify(main, payload)
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(hit, range(64)))
+
+    allowed = [r for r in results if r["ok"]]
+    assert len(allowed) == max_scans
+    assert sorted(r["scan_count"] for r in allowed) == list(range(1, max_scans + 1))
+    assert {r["reason"] for r in results if not r["ok"]} <= {"passive", "max_scans_reached"}
+
+    rec = _row(token)
+    assert rec.scan_count == max_scans
+    assert rec.status == "passive"
+
+
+def test_atomic_denial_reasons(main, issue, atomic_mode):
+    assert _verify(main, "no-separator") == {"ok": False, "reason": "bad_payload"}
+    assert _verify(main, "Other|x")["reason"] == "wrong_issuer"
+    assert _verify(main, f"{ISSUER}|missing")["reason"] == "not_found"
+
+    token, payload = issue(max_scans=2)
+    with SessionLocal() as db:
+        db.query(QRToken).filter(QRToken.token == token).update(
+            {"expires_at": datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=1)})
+        db.commit()
+    assert _verify(main, payload)["reason"] == "expired"
+    assert _row(token).status == "passive"
+    assert _verify(main, payload)["reason"] == "passive"
+
+
+def test_atomic_matches_classic_path(main, issue, atomic_mode):
+    token, payload = issue(max_scans=2)
+    assert _verify(main, payload) == {"ok": True, "scan_count": 1, "status": "active"}
+    assert _verify(main, payload) == {"ok": True, "scan_count": 2, "status": "passive"}
+    assert _verify(main, payload) == {"ok": False, "reason": "passive"}
@@ -0,0 +1,78 @@
+# tests/test_verify_batch.py
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+from app import batch_verify
+from app.db import SessionLocal
+from app.models import QRToken, ScanLog
+from app.tickets import ISSUER
+
+
+def _batch(main, payloads):
+    with SessionLocal() as db:
+        return main.verify_qr_batch({"payloads": payloads}, db)
+
+
+def _verify(main, payload):
+    with SessionLocal() as db:
+        return main.verify_qr({"payload": payload}, db)
+
+
+def test_results_in_order_with_duplicates(main, issue):
+    _, once = issue(max_scans=1)
+    _, twice = issue(max_scans=2)
+    res = _batch(main, [once, twice, once, "garbage", twice, twice, f"{ISSUER}|missing"])
+    assert res["ok"] is True
+    assert res["results"] == [
+        {"ok": True, "scan_count": 1, "status": "passive"},
+        {"ok": True, "scan_count": 1, "status": "active"},
+        {"ok": False, "reason": "passive"},
+        {"ok": False, "reason": "bad_payload"},
+        {"ok": True, "scan_count": 2, "status": "passive"},
+        {"ok": False, "reason": "passive"},
+        {"ok": False, "reason": "not_found"},
+    ]
+
+
+def test_matches_sequential_verify(main, issue):
+    def fresh():
+        tokens = [issue(max_scans=2), issue(max_scans=1), issue(max_scans=1)]
+        expired = tokens[2][0]
+        with SessionLocal() as db:
+            db.query(QRToken).filter(QRToken.token == expired).update(
+                {"expires_at": datetime.utcnow() - timedelta(minutes=1)})
+            db.commit()
+        p = [t[1] for t in tokens]
+        return [p[0], p[1], p[2], p[0], p[0], p[1], p[2]]
+
+    batch = _batch(main, fresh())["results"]
+    sequential = [_verify(main, p) for p in fresh()]
+    assert batch == sequential
+
+
+def test_state_and_logs_written(main, issue):
+    token, payload = issue(max_scans=3)
+    _batch(main, [payload, payload])
+    with SessionLocal() as db:
+        rec = db.query(QRToken).filter(QRToken.token == token).first()
+        assert (rec.scan_count, rec.status) == (2, "active")
+    with SessionLocal() as db:      # no sink in tests: logs go in with the batch
+        n = db.execute(select(func.count()).select_from(ScanLog).where(ScanLog.token == token)).scalar()
+    assert n == 2
+
+
+def test_concurrent_batches_never_over_admit(main, issue):
+    _, payload = issue(max_scans=3)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: _batch(main, [payload, payload])["results"], range(8)))
+    allowed = sum(r["ok"] for batch in results for r in batch)
+    assert allowed == 3
+
+
+def test_batch_limits(main):
+    with SessionLocal() as db:
+        assert main.verify_qr_batch({"payloads": "x"}, db).status_code == 400
+        too_many = {"payloads": ["x"] * (batch_verify.BATCH_VERIFY_MAX + 1)}
+        assert main.verify_qr_batch(too_many, db).status_code == 413
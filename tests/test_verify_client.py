@@ -0,0 +1,70 @@
+# tests/test_verify_client.py
+# gate_scanner's verify client against a tiny local HTTP/1.1 server.
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "gate_scanner"))
+from verify_client import VerifyClient  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    seen = {"requests": 0, "peers": set()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"       # keep-alive
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            seen["requests"] += 1
+            seen["peers"].add(self.client_address[1])
+            out = json.dumps({"ok": True, "payload": body["payload"], "scan_count": 1}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", seen
+    httpd.shutdown()
+
+
+def test_reuses_one_connection(server):
+    base, seen = server
+    client = VerifyClient(base)
+    for i in range(5):
+        resp, status = client.verify(f"X|t{i}")
+        assert status == 200 and resp["payload"] == f"X|t{i}"
+    assert seen["requests"] == 5 and len(seen["peers"]) == 1
+    assert client.histogram.total == 5
+    client.close()
+
+
+def test_duplicate_payload_is_answered_from_cache(server):
+    base, seen = server
+    client = VerifyClient(base, dedup_ttl_sec=60)
+    first, _ = client.verify("X|same")
+    again, status = client.verify("X|same")
+    assert seen["requests"] == 1 and client.dedup_hits == 1
+    assert status == 200 and again["cached"] and "cached" not in first
+
+    client.dedup_ttl_sec = 0
+    client.verify("X|same")
+    assert seen["requests"] == 2
+
+
+def test_network_error_is_not_cached():
+    client = VerifyClient("http://127.0.0.1:9", retries=1, backoff_sec=0)
+    resp, status = client.verify("X|t")
+    assert status == 0 and resp["reason"].startswith("network_error")
+    assert client.verify("X|t")[1] == 0 and client.dedup_hits == 0
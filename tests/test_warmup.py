@@ -0,0 +1,54 @@
+# tests/test_warmup.py
+import json
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from app import warmup
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_heavy_libraries_not_imported_with_the_app():
+    code = "import sys, app.main; print(sorted(m for m in ('escpos', 'PIL', 'qrcode') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_ready_after_all_steps(main):
+    gate = threading.Event()
+    old = warmup.runner
+    warmup.runner = warmup.Warmup({"db": lambda: None, "slow": gate.wait}).start()
+    try:
+        res = main.ready()
+        assert res.status_code == 503
+        assert json.loads(res.body)["steps"]["slow"]["state"] == "running"
+        gate.set()
+        assert warmup.runner.wait(5)
+        res = main.ready()
+        body = json.loads(res.body)
+        assert res.status_code == 200 and body["ready"] is True
+        assert body["steps"]["db"]["state"] == "done" and body["total_ms"] is not None
+    finally:
+        warmup.runner = old
+
+
+def test_optional_step_failure_still_ready_but_db_failure_is_not():
+    def boom():
+        raise RuntimeError("no printer profile")
+
+    w = warmup.Warmup({"db": lambda: None, "ticket": boom}).start()
+    assert w.wait(5) and w.ready
+    step = w.report()["steps"]["ticket"]
+    assert step["state"] == "failed" and step["error"] == "no printer profile"
+
+    w = warmup.Warmup({"db": boom}).start()
+    assert w.wait(5) and not w.ready
+
+
+def test_default_steps_run():
+    w = warmup.Warmup().start()
+    assert w.wait(30)
+    assert {n: s["state"] for n, s in w.report()["steps"].items()} == {
+        "db": "done", "tz": "done", "qr": "done", "ticket": "done"}
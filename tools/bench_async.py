@@ -0,0 +1,95 @@
+# tools/bench_async.py
+# Sync (/qr/*) vs async (/async/qr/*) endpoints under C concurrent clients,
+# against a real uvicorn server on localhost (temp SQLite, printer stubbed).
+# Each client loops: issue 1 : verify 4 : status 1.
+#
+#   python tools/bench_async.py [requests_per_level] [levels...]
+#   python tools/bench_async.py 3000 50 200 1000
+
+import asyncio
+import socket
+import sys
+import threading
+import time
+
+import bench_common
+from bench_common import percentiles
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+LEVELS = [int(a) for a in sys.argv[2:]] or [50, 200, 1000]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           backlog=4096, limit_concurrency=None))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_level(base: str, prefix: str, clients: int, payloads: list[str]) -> dict:
+    import httpx
+
+    lat = []
+    errors = 0
+    per_client = max(1, REQUESTS // clients)
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as http:
+        async def client(i: int):
+            nonlocal errors
+            for n in range(per_client):
+                step = n % 6
+                t0 = time.perf_counter()
+                try:
+                    if step == 0:
+                        r = await http.post(f"{prefix}/qr/issue", data={"max_scans": 10**6})
+                    elif step == 5:
+                        r = await http.get(f"{prefix}/qr/status/{payloads[(i + n) % len(payloads)].split('|')[1]}")
+                    else:
+                        r = await http.post(f"{prefix}/qr/verify", json={"payload": payloads[(i * 7 + n) % len(payloads)]})
+                    if r.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                lat.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(clients)))
+        wall = time.perf_counter() - t0
+
+    return {"path": prefix or "/sync", "clients": clients, "requests": len(lat),
+            "req_per_s": round(len(lat) / wall, 1), "errors": errors, **percentiles(lat)}
+
+
+def main():
+    app = bench_common.make_app()
+    port = _free_port()
+    server = start_server(app, port)
+    base = f"http://127.0.0.1:{port}"
+
+    import httpx
+    with httpx.Client(base_url=base) as c:
+        payloads = [c.post("/qr/issue", data={"max_scans": 10**6}).json()["payload"] for _ in range(200)]
+
+    results = []
+    for clients in LEVELS:
+        for prefix in ("", "/async"):
+            r = asyncio.run(run_level(base, prefix, clients, payloads))
+            results.append(r)
+            print(f"{r['path']:7s} clients={clients:5d} {r['req_per_s']:8.1f} req/s "
+                  f"p50={r['p50']}ms p95={r['p95']}ms p99={r['p99']}ms errors={r['errors']}")
+    server.should_exit = True
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# tools/bench_common.py
+# Shared setup for the offline benchmarks in tools/bench_*.py:
+# a throwaway SQLite DB + working dir, and a stubbed printer.
+#
+# Import this module BEFORE anything from `app` - the DB URL is read from the
+# environment when app.config is first imported.
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+WORK_DIR = Path(tempfile.mkdtemp(prefix="qr-bench-"))
+
+os.environ.setdefault("DB_URL", f"sqlite:///{(WORK_DIR / 'bench.db').as_posix()}")
+sys.path.insert(0, str(ROOT))
+os.chdir(WORK_DIR)          # qr_images/ etc. land in the temp dir
+
+
+def make_app(stub_printer: bool = True):
+    """Create the tables and return the FastAPI app (printer stubbed by default)."""
+    from app.init_db import init
+    import app.main as main
+
+    init()
+    if stub_printer:
+        from app.config import settings
+        settings.PRINT_QUEUE = False
+        main.print_qr_ticket = lambda payload, info: True
+        try:
+            from app import async_api
+            async_api._dispatch_print = lambda payload, info: None
+        except ImportError:
+            pass
+    return main.app
+
+
+def percentiles(samples: list[float], qs=(50, 95, 99)) -> dict:
+    """Latency percentiles in milliseconds from a list of seconds."""
+    if not samples:
+        return {f"p{q}": None for q in qs}
+    s = sorted(samples)
+    return {f"p{q}": round(s[min(len(s) - 1, int(len(s) * q / 100))] * 1000, 3) for q in qs}
+
+
+class Timer:
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.t0
@@ -0,0 +1,106 @@
+# tools/bench_db_profile.py
+# Mixed issue/verify load against each SQLite storage profile (DB_PROFILE).
+# Each profile runs in its own process with its own temp DB, because the
+# engine (and its pragmas) is built when app.db is imported.
+#
+#   python tools/bench_db_profile.py [seconds] [issuers] [verifiers] [profiles...]
+#   python tools/bench_db_profile.py 10 2 6 default wal
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+ISSUERS = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+VERIFIERS = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+PROFILES = sys.argv[4:] or ["default", "wal"]
+
+
+def child():
+    import bench_common
+    from bench_common import percentiles
+
+    import app.main as main
+    from app.config import settings
+    from app.db import SessionLocal
+
+    bench_common.make_app()
+    settings.SCANLOG_BUFFERED = False      # measure the raw per-scan write cost
+    payloads = []
+    lock = threading.Lock()
+    for _ in range(50):
+        with SessionLocal() as db:
+            payloads.append(main.issue_qr(None, None, None, None, None, 60, 10**6, None, db)["payload"])
+
+    stop = time.monotonic() + SECONDS
+    lat = {"issue": [], "verify": []}
+    errors = []
+
+    def issuer():
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            try:
+                with SessionLocal() as db:
+                    p = main.issue_qr(None, "Bench", None, None, None, 60, 10**6, None, db)["payload"]
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            lat["issue"].append(time.perf_counter() - t0)
+            with lock:
+                payloads.append(p)
+
+    def verifier(i):
+        n = i
+        while time.monotonic() < stop:
+            with lock:
+                p = payloads[n % len(payloads)]
+            n += 7
+            t0 = time.perf_counter()
+            try:
+                with SessionLocal() as db:
+                    main.verify_qr({"payload": p}, db)
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            lat["verify"].append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=issuer) for _ in range(ISSUERS)]
+    threads += [threading.Thread(target=verifier, args=(i,)) for i in range(VERIFIERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(json.dumps({
+        "profile": settings.DB_PROFILE,
+        "issue_per_s": round(len(lat["issue"]) / SECONDS, 1),
+        "verify_per_s": round(len(lat["verify"]) / SECONDS, 1),
+        "issue": percentiles(lat["issue"]),
+        "verify": percentiles(lat["verify"]),
+        "errors": len(errors),
+    }))
+
+
+def main():
+    for profile in PROFILES:
+        env = {**os.environ, "DB_PROFILE": profile, "BENCH_CHILD": "1"}
+        env.pop("DB_URL", None)
+        out = subprocess.run([sys.executable, __file__, *sys.argv[1:4]],
+                             env=env, capture_output=True, text=True)
+        lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+        if not lines:
+            print(profile, "failed:\n", out.stderr[-2000:])
+            continue
+        r = json.loads(lines[-1])
+        print(f"{r['profile']:8s} issue {r['issue_per_s']:7.1f}/s p99={r['issue']['p99']}ms | "
+              f"verify {r['verify_per_s']:7.1f}/s p99={r['verify']['p99']}ms | errors={r['errors']}")
+
+
+if __name__ == "__main__":
+    if os.environ.get("BENCH_CHILD"):
+        child()
+    else:
+        main()
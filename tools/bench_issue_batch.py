@@ -0,0 +1,41 @@
+# tools/bench_issue_batch.py
+# Tickets/second: N x POST /qr/issue  vs  one POST /qr/issue/batch.
+# Fully offline (temp SQLite, printer stubbed).
+#
+#   python tools/bench_issue_batch.py [N]
+
+import sys
+import bench_common
+from bench_common import Timer, make_app
+from fastapi.testclient import TestClient
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+
+def main():
+    app = make_app()
+    records = [{"employee_id": f"E{i:05d}", "full_name": f"Visitor {i}", "department": "Other"}
+               for i in range(N)]
+
+    with TestClient(app) as c:
+        with Timer() as single:
+            for r in records:
+                assert c.post("/qr/issue", data=r).json()["ok"]
+
+        with Timer() as batch:
+            res = c.post("/qr/issue/batch", json=records)
+            lines = res.text.splitlines()
+        assert res.status_code == 200 and len(lines) == N
+
+        with Timer() as batch_zip:
+            res = c.post("/qr/issue/batch?format=zip", json=records)
+        assert res.status_code == 200
+
+    print(f"tickets: {N}")
+    print(f"single endpoint loop : {N / single.elapsed:8.1f} tickets/s ({single.elapsed:.2f}s)")
+    print(f"batch  (ndjson)      : {N / batch.elapsed:8.1f} tickets/s ({batch.elapsed:.2f}s)")
+    print(f"batch  (zip)         : {N / batch_zip.elapsed:8.1f} tickets/s ({batch_zip.elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# tools/bench_multiworker.py
+# Multi-process load test for WORKERS > 1 (see app/leases.py).
+# For each worker count a fresh `uvicorn app.main:app --workers N` runs on one
+# temp SQLite DB (or DB_URL) with a fake printer; CLIENTS client processes
+# then POST /qr/verify for every seeded max_scans=1 pass SCANS_PER_PASS times,
+# in a different order per client, so the same pass hits several workers at
+# the same moment. Reports verify/s per worker count and fails (exit 1) if any
+# pass was admitted more than once.
+#
+#   python tools/bench_multiworker.py [passes] [workers...]
+#   python tools/bench_multiworker.py 2000 1 2 4
+#
+# Throughput can only scale up to the number of CPUs (printed in the report).
+
+from multiprocessing import Pool
+from pathlib import Path
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_printer import FakePrinter
+
+ROOT = Path(__file__).resolve().parent.parent
+PASSES = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+WORKERS = [int(w) for w in sys.argv[2:]] or [1, 2, 4]
+CLIENTS = int(os.environ.get("CLIENTS", "8"))
+SCANS_PER_PASS = 2
+TIMEOUT_SEC = 60
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _env(db_url: str, printer: FakePrinter, workers: int) -> dict:
+    return {**os.environ, "PYTHONPATH": str(ROOT), "DB_URL": db_url, "WORKERS": str(workers),
+            "PRINTER_HOST": printer.host, "PRINTER_PORT": str(printer.port), "WARMUP": "off"}
+
+
+def _seed(env: dict, cwd: Path, n: int) -> list[str]:
+    code = f"""
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from app.init_db import init
+from app.db import SessionLocal
+from app.models import QRToken
+from app.tickets import qr_payload, token_row
+init()
+rows = [token_row(datetime.now(timezone.utc), 60, 1, {{}})[0] for _ in range({n})]
+with SessionLocal() as db:
+    db.execute(insert(QRToken), rows)
+    db.commit()
+for r in rows:
+    print(qr_payload(r["token"], r["expires_at"], r["max_scans"]))
+"""
+    out = subprocess.run([sys.executable, "-c", code], env=env, cwd=cwd, check=True,
+                         capture_output=True, text=True)
+    return [line for line in out.stdout.splitlines() if "|" in line]     # skip init()'s messages
+
+
+def _client(args) -> tuple[int, list[str]]:
+    """One client process: verify every payload (shuffled) over a keep-alive connection."""
+    port, payloads, seed = args
+    random.Random(seed).shuffle(payloads)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    allowed = []
+    for p in payloads:
+        conn.request("POST", "/qr/verify", json.dumps({"payload": p}), {"Content-Type": "application/json"})
+        body = json.loads(conn.getresponse().read())
+        if body.get("ok"):
+            allowed.append(p)
+    conn.close()
+    return len(payloads), allowed
+
+
+def _wait_up(port: int, proc: subprocess.Popen):
+    deadline = time.monotonic() + TIMEOUT_SEC
+    while True:
+        try:
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            c.request("GET", "/health")
+            if c.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline or proc.poll() is not None:
+            raise RuntimeError("server did not come up")
+        time.sleep(0.05)
+
+
+def one_run(workers: int, work: Path, printer: FakePrinter) -> dict:
+    db_url = os.environ.get("DB_URL") or f"sqlite:///{(work / f'mw{workers}.db').as_posix()}"
+    env = _env(db_url, printer, workers)
+    payloads = _seed(env, work, PASSES)
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--workers", str(workers), "--log-level", "warning"],
+                            env=env, cwd=work, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_up(port, proc)
+        jobs = [(port, [p for _ in range(SCANS_PER_PASS) for p in payloads][i::CLIENTS], i)
+                for i in range(CLIENTS)]
+        t0 = time.perf_counter()
+        with Pool(CLIENTS) as pool:
+            results = pool.map(_client, jobs)
+        elapsed = time.perf_counter() - t0
+    finally:
+        proc.terminate()
+        proc.wait(15)
+    requests = sum(n for n, _ in results)
+    allowed = [p for _, a in results for p in a]
+    return {"workers": workers, "requests": requests, "seconds": round(elapsed, 3),
+            "verify_per_s": round(requests / elapsed, 1), "admitted": len(allowed),
+            "double_admissions": len(allowed) - len(set(allowed)),
+            "never_admitted": len(set(payloads) - set(allowed))}
+
+
+def main():
+    work = Path(tempfile.mkdtemp(prefix="qr-multiworker-"))
+    printer = FakePrinter().start()
+    try:
+        runs = [one_run(w, work, printer) for w in WORKERS]
+    finally:
+        printer.stop()
+    base = runs[0]["verify_per_s"] / runs[0]["workers"]
+    for r in runs:
+        r["scaling"] = round(r["verify_per_s"] / (base * r["workers"]), 2)     # 1.0 = linear
+        print(f"workers={r['workers']:2d} {r['verify_per_s']:8.1f} verify/s  scaling={r['scaling']:.2f}  "
+              f"admitted={r['admitted']} double={r['double_admissions']} missed={r['never_admitted']}",
+              file=sys.stderr)
+    print(json.dumps({"passes": PASSES, "clients": CLIENTS, "cpus": os.cpu_count(), "runs": runs}, indent=2))
+    sys.exit(1 if any(r["double_admissions"] or r["never_admitted"] for r in runs) else 0)
+
+
+if __name__ == "__main__":
+    main()
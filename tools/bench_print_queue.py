@@ -0,0 +1,73 @@
+# tools/bench_print_queue.py
+# Ticket throughput against a local fake ESC/POS printer:
+#   legacy  - print_qr_ticket(): new connection per ticket
+#   queue   - PrintQueue over one persistent PrinterLink
+# plus the "printer down" case: how fast jobs fail once the breaker opens.
+#
+#   python tools/bench_print_queue.py [tickets]
+
+import sys
+import bench_common
+from bench_common import Timer
+from fake_printer import FakePrinter
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+INFO = {
+    "Kullancı Adı": "Ayşe Yılmaz", "Eposta": "ayse@example.com", "Görev": "Visitor",
+    "Kullancı No": "E00042", "Bölüm": "HR", "Aktif Okuma Sureci(Local)": "2025-01-01 10:00:00",
+    "Maksımum Okuma": 2,
+}
+
+
+def main():
+    import app.printer as printer
+    from app import print_queue
+
+    payloads = [f"BenimGiriş|bench-{i:06d}" for i in range(N)]
+
+    fp = FakePrinter().start()
+    printer.PRINTER_IP, printer.PRINTER_PORT = fp.host, fp.port
+    with Timer() as legacy:
+        for p in payloads:
+            assert printer.print_qr_ticket(p, INFO)
+    assert fp.wait_for(N)
+    legacy_conns = fp.connections
+    fp.stop()
+
+    fp = FakePrinter().start()
+    q = print_queue.PrintQueue(print_queue.PrinterLink(fp.host, fp.port), max_jobs=N)
+    q.start()
+    with Timer() as queued:
+        for p in payloads:
+            q.submit(p, INFO)
+        assert fp.wait_for(N, timeout=120)
+    queue_conns = q.link.connects
+    q.stop()
+    fp.stop()
+
+    # printer down: nothing listens on this port
+    dead = FakePrinter()
+    port = dead.port
+    dead.stop()
+    q = print_queue.PrintQueue(print_queue.PrinterLink("127.0.0.1", port, timeout=1),
+                               max_retries=0, backoff_sec=0.01,
+                               breaker=print_queue.CircuitBreaker(threshold=3, reset_sec=60))
+    q.start()
+    with Timer() as down:
+        for p in payloads[:20]:
+            q.submit(p, INFO)
+        while q.failed < 3:
+            pass
+    status = q.status()
+    q.stop()
+
+    print(f"tickets: {N}")
+    print(f"legacy (connect per ticket): {N / legacy.elapsed:8.1f} tickets/s, {legacy_conns} connections")
+    print(f"queue  (persistent link)   : {N / queued.elapsed:8.1f} tickets/s, {queue_conns} connection(s)")
+    print(f"printer down: breaker={status['breaker']} after {down.elapsed * 1000:.0f} ms, "
+          f"{status['depth']} jobs held for retry")
+
+
+if __name__ == "__main__":
+    main()
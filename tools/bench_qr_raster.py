@@ -0,0 +1,74 @@
+# tools/bench_qr_raster.py
+# Matrix -> output conversion only (matrices already encoded): the Pillow /
+# python-escpos path vs the NumPy renderers of app/qr_raster.py. Offline.
+#
+#   receipt bitmap  print_image() + p.image(bitImageColumn)  (old fallback)
+#                   print_image() + p.image(bitImageRaster)  (same bytes as NumPy)
+#                   print_raster()                           (NumPy GS v 0)
+#   png             qr_image() + PIL PNG save  vs  qr_raster.png_1bit()
+#   svg             per-module loop            vs  qr_raster.svg_path()
+#
+#   python tools/bench_qr_raster.py [payloads]
+
+from io import BytesIO, StringIO
+import contextlib
+import sys
+
+import bench_common  # noqa: F401  (sys.path, temp working dir)
+from bench_common import Timer
+from escpos.printer import Dummy
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+
+def _per_call(fn, payloads) -> float:
+    with Timer() as t:
+        for p in payloads:
+            fn(p)
+    return t.elapsed / len(payloads) * 1e6
+
+
+def main():
+    from app import qr_raster, qr_render
+
+    if not qr_raster.available():
+        sys.exit("NumPy is not installed")
+    payloads = [f"BenimGiriş|bench-{i:06d}-{'x' * (i % 40)}" for i in range(N)]
+    for p in payloads:                  # encode once, build the array views once
+        qr_render.qr_array(p)
+
+    def escpos_image(impl):
+        def run(p):
+            d = Dummy()
+            d.image(qr_render.print_image(p), impl=impl)
+            return d.output
+        return run
+
+    def pil_png(p):
+        buf = BytesIO()
+        qr_render.qr_image(p).save(buf, format="PNG")
+        return buf.getvalue()
+
+    rows = [
+        ("receipt: escpos bitImageColumn", escpos_image("bitImageColumn")),
+        ("receipt: escpos bitImageRaster", escpos_image("bitImageRaster")),
+        ("receipt: numpy GS v 0", qr_render.print_raster),
+        ("png: pillow", pil_png),
+        ("png: numpy 1-bit", lambda p: qr_raster.png_1bit(qr_render.qr_array(p), qr_render.PNG_BOX_SIZE,
+                                                          qr_render.PNG_BORDER)),
+        ("svg: per-module loop", lambda p: "".join(qr_render._svg_runs(qr_render.qr_matrix(p), 4))),
+        ("svg: numpy runs", lambda p: qr_raster.svg_path(qr_render.qr_array(p), 4)),
+    ]
+    results = {}
+    for name, fn in rows:
+        with contextlib.redirect_stdout(StringIO()):     # python-escpos' "media.width" notice
+            fn(payloads[0])
+            results[name] = _per_call(fn, payloads)
+    base = {"receipt": results["receipt: escpos bitImageColumn"], "png": results["png: pillow"],
+            "svg": results["svg: per-module loop"]}
+    for name, us in results.items():
+        print(f"{name:32s} {us:9.1f} us/call  x{base[name.split(':')[0]] / us:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# tools/bench_startup.py
+# Cold-start time of the server per WARMUP mode (see app/warmup.py).
+# Each run starts a fresh `uvicorn app.main:app` on a temp SQLite DB (printer =
+# tools/fake_printer.py) and polls it; times are from process spawn:
+#
+#   import_ms   `import app.main` in a fresh interpreter (no server)
+#   health_ms   first 200 from GET /health      (server accepting requests)
+#   verify_ms   first answer from POST /qr/verify
+#   ready_ms    first 200 from GET /ready       (all warm-ups finished)
+#   issue_ms    latency of the first POST /qr/issue, sent right after /health
+#
+#   python tools/bench_startup.py [runs] [modes...]
+#   python tools/bench_startup.py 5 background blocking off
+
+from pathlib import Path
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from fake_printer import FakePrinter
+
+ROOT = Path(__file__).resolve().parent.parent
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+MODES = sys.argv[2:] or ["background", "blocking", "off"]
+TIMEOUT_SEC = 60
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _request(url: str, data: bytes | None = None, json_body: bool = False) -> int:
+    """HTTP status, or 0 while the server is not answering."""
+    headers = {"Content-Type": "application/json"} if json_body else {}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=5) as r:
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def _env(work: Path, printer: FakePrinter, mode: str) -> dict:
+    return {**os.environ, "PYTHONPATH": str(ROOT), "WARMUP": mode,
+            "DB_URL": f"sqlite:///{(work / 'startup.db').as_posix()}",
+            "PRINTER_HOST": printer.host, "PRINTER_PORT": str(printer.port)}
+
+
+def import_ms(env: dict, cwd: Path) -> float:
+    code = "import time; t = time.perf_counter(); import app.main; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run([sys.executable, "-c", code], env=env, cwd=cwd, capture_output=True, text=True)
+    return round(float(out.stdout.strip().splitlines()[-1]), 1)
+
+
+def one_run(mode: str, work: Path, printer: FakePrinter) -> dict:
+    env = _env(work, printer, mode)
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--log-level", "warning"], env=env, cwd=work,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    ms = lambda: round((time.perf_counter() - t0) * 1000, 1)   # noqa: E731
+    res = {"mode": mode}
+    try:
+        deadline = time.monotonic() + TIMEOUT_SEC
+        while _request(f"{base}/health") != 200:
+            if time.monotonic() > deadline or proc.poll() is not None:
+                raise RuntimeError(f"server did not come up ({mode})")
+            time.sleep(0.005)
+        res["health_ms"] = ms()
+
+        _request(f"{base}/qr/verify", json.dumps({"payload": "BenimGiriş|startup"}).encode(), json_body=True)
+        res["verify_ms"] = ms()
+
+        t_issue = time.perf_counter()
+        status = _request(f"{base}/qr/issue", urllib.parse.urlencode({"max_scans": 1}).encode())
+        res["issue_ms"] = round((time.perf_counter() - t_issue) * 1000, 1)
+        assert status == 200, status
+
+        while _request(f"{base}/ready") != 200:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"never ready ({mode})")
+            time.sleep(0.005)
+        res["ready_ms"] = ms()
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return res
+
+
+def main():
+    work = Path(tempfile.mkdtemp(prefix="qr-startup-"))
+    printer = FakePrinter().start()
+    try:
+        env = _env(work, printer, "off")
+        subprocess.run([sys.executable, "-c", "from app.init_db import init; init()"],
+                       env=env, cwd=work, check=True, capture_output=True)
+        report = {"runs": RUNS, "import_ms": statistics.median(import_ms(env, work) for _ in range(RUNS)),
+                  "modes": []}
+        for mode in MODES:
+            runs = [one_run(mode, work, printer) for _ in range(RUNS)]
+            report["modes"].append({"mode": mode, **{k: statistics.median(r[k] for r in runs)
+                                                     for k in ("health_ms", "verify_ms", "issue_ms", "ready_ms")}})
+    finally:
+        printer.stop()
+
+    print(f"import app.main: {report['import_ms']} ms (median of {RUNS})", file=sys.stderr)
+    for m in report["modes"]:
+        print(f"{m['mode']:10s} health={m['health_ms']:7.1f}ms verify={m['verify_ms']:7.1f}ms "
+              f"ready={m['ready_ms']:7.1f}ms first issue={m['issue_ms']:6.1f}ms", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+# tools/bench_suite.py
+# Offline benchmark suite: every hot path of the backend against a temp SQLite
+# DB (or DB_URL, e.g. a PostgreSQL test database) and a local fake ESC/POS
+# printer (tools/fake_printer.py), with one JSON document as output so runs
+# from different commits or backends can be diffed.
+#
+#   python tools/bench_suite.py [--n N] [--threads T] [--only a,b] [--out FILE]
+#   python tools/bench_suite.py --compare base.json new.json [--tolerance 0.10]
+#
+# Scenarios (handlers are called directly - no HTTP client - except /qr/png,
+# which needs a Request; "threads" > 1 means concurrent callers):
+#   issue_single / issue_concurrent     issue_qr()
+#   issue_pooled                        issue_qr() from a full token pool (app/token_pool.py)
+#   verify_allowed / verify_not_found / verify_expired / verify_max_scans
+#   qr_png_cold / qr_png_warm / qr_png_304
+#   print_per_ticket                    printer.print_qr_ticket(), new connection each
+#   print_persistent                    render_ticket() + PrinterLink.send()
+#
+# Each result: ops, seconds, ops_per_s, p50/p95/p99 (ms), rss_mb after the run.
+# --compare exits 1 when any ops_per_s dropped or p95 grew by more than the tolerance.
+
+from pathlib import Path
+
+START_DIR = Path.cwd()     # bench_common moves into a temp dir; --out / --compare are relative to here
+
+import bench_common
+from bench_common import Timer, make_app, percentiles
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from fake_printer import FakePrinter
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss     # KB on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc), else the peak so far."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def measure(name: str, fn, n: int, threads: int = 1) -> dict:
+    """Call fn(i) for i in range(n) from `threads` threads; fn's own duration is sampled."""
+    def timed(i):
+        t0 = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - t0
+
+    with Timer() as wall:
+        if threads == 1:
+            samples = [timed(i) for i in range(n)]
+        else:
+            with ThreadPoolExecutor(threads) as pool:
+                samples = list(pool.map(timed, range(n)))
+    return {"scenario": name, "ops": n, "threads": threads, "seconds": round(wall.elapsed, 4),
+            "ops_per_s": round(n / wall.elapsed, 1), **percentiles(samples), "rss_mb": rss_mb()}
+
+
+# ---------- fixtures ----------
+def _issue_form(**kw) -> dict:
+    return {"employee_id": "B-1", "full_name": "Bench User", "email": None, "role": "Visitor",
+            "department": "Other", "minutes_valid": 60, "max_scans": 1, "background": None, **kw}
+
+
+def _seed(n: int, **row_overrides) -> list[str]:
+    """n tokens straight into qr_tokens (one bulk INSERT); returns their payloads."""
+    from sqlalchemy import insert
+    from app.db import SessionLocal
+    from app.models import QRToken
+    from app.tickets import qr_payload, token_row
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    for _ in range(n):
+        row, _ = token_row(now, 60, 1, {"employee_id": "B-1"})
+        row.update(row_overrides)
+        rows.append(row)
+    with SessionLocal() as db:
+        db.execute(insert(QRToken), rows)
+        db.commit()
+    return [qr_payload(r["token"], r["expires_at"], r["max_scans"]) for r in rows]
+
+
+# ---------- scenarios ----------
+def issue_scenarios(args):
+    import app.main as main
+    from app.db import SessionLocal
+
+    def issue(i):
+        with SessionLocal() as db:
+            assert main.issue_qr(**_issue_form(), db=db)["ok"]
+
+    yield measure("issue_single", issue, args.n)
+    yield measure("issue_concurrent", issue, args.n, args.threads)
+
+    from app import token_pool
+    pool = token_pool.TokenPool(high=args.n, low=0, batch=500)
+    while pool.refill_batch():           # filled up front: measures the take path only
+        pass
+    token_pool.pool = pool
+    try:
+        yield measure("issue_pooled", issue, args.n)
+    finally:
+        token_pool.pool = None
+        token_pool.discard_all()
+
+
+def verify_scenarios(args):
+    import app.main as main
+    from app.db import SessionLocal
+    from app.tickets import ISSUER
+
+    def verifier(payloads, expect):
+        def scan(i):
+            with SessionLocal() as db:
+                res = main.verify_qr({"payload": payloads[i]}, db)
+            assert (res.get("reason") == expect) if expect else res["ok"], res
+        return scan
+
+    past = (datetime.now(timezone.utc) - timedelta(minutes=5)).replace(tzinfo=None)
+    cases = [
+        ("verify_allowed", _seed(args.n), None),
+        ("verify_not_found", [f"{ISSUER}|missing-{i}" for i in range(args.n)], "not_found"),
+        ("verify_expired", _seed(args.n, expires_at=past), "expired"),
+        ("verify_max_scans", _seed(args.n, scan_count=1), "max_scans_reached"),
+    ]
+    for name, payloads, expect in cases:
+        yield measure(name, verifier(payloads, expect), args.n, args.threads)
+
+
+def png_scenarios(args, client):
+    from app import qr_render
+
+    tokens = [p.split("|")[1] for p in _seed(args.n)]
+    qr_render.cached_png.cache_clear()
+    qr_render.qr_matrix.cache_clear()
+
+    def get(i):
+        r = client.get(f"/qr/png/{tokens[i]}")
+        assert r.status_code == 200, r.status_code
+
+    def revalidate(i):
+        r = client.get(f"/qr/png/{tokens[i]}", headers={"If-None-Match": etags[i]})
+        assert r.status_code == 304, r.status_code
+
+    yield measure("qr_png_cold", get, args.n)
+    yield measure("qr_png_warm", get, args.n)
+    etags = [client.get(f"/qr/png/{t}").headers["etag"] for t in tokens]
+    yield measure("qr_png_304", revalidate, args.n)
+
+
+def print_scenarios(args):
+    from app import print_queue, printer
+    from app.printer import render_ticket
+    from app.tickets import expiry_local_str, ticket_info, token_row
+
+    row, exp = token_row(datetime.now(timezone.utc), 60, 1, {"employee_id": "B-1", "full_name": "Bench User"})
+    info = ticket_info(row, expiry_local_str(exp))
+    payloads = _seed(2 * args.n)         # a fresh half per scenario: both pay the QR render
+    fp = FakePrinter().start()
+    try:
+        printer.PRINTER_IP, printer.PRINTER_PORT = fp.host, fp.port
+
+        def per_ticket(i):
+            assert printer.print_qr_ticket(payloads[i], info)
+
+        res = measure("print_per_ticket", per_ticket, args.n)
+        fp.wait_for(args.n)
+        yield res
+
+        link = print_queue.PrinterLink(fp.host, fp.port)
+        res = measure("print_persistent", lambda i: link.send(render_ticket(payloads[args.n + i], info)), args.n)
+        link.close()
+        fp.wait_for(2 * args.n)
+        yield {**res, "tickets_received": fp.tickets}
+    finally:
+        fp.stop()
+
+
+SCENARIOS = ("issue", "verify", "png", "print")
+
+
+def run(args) -> dict:
+    from fastapi.testclient import TestClient
+    from app.config import settings
+    from app.db import engine
+
+    app = make_app()
+    results = []
+    only = set(args.only.split(",")) if args.only else set(SCENARIOS)
+    with TestClient(app) as client:          # runs the startup hooks (scan log sink, warm-up...)
+        if "issue" in only:
+            results += issue_scenarios(args)
+        if "verify" in only:
+            results += verify_scenarios(args)
+        if "png" in only:
+            results += png_scenarios(args, client)
+        if "print" in only:
+            results += print_scenarios(args)
+    return {
+        "commit": _git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "db": engine.dialect.name,
+        "settings": {k: getattr(settings, k) for k in
+                     ("VERIFY_MODE", "DB_PROFILE", "SCANLOG_BUFFERED", "PRINT_QR_MODE", "QR_SAVE_PNG")},
+        "n": args.n,
+        "threads": args.threads,
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=bench_common.ROOT,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ---------- compare two runs ----------
+def compare(base_path: str, new_path: str, tolerance: float) -> int:
+    base = {r["scenario"]: r for r in json.loads((START_DIR / base_path).read_text())["results"]}
+    new = {r["scenario"]: r for r in json.loads((START_DIR / new_path).read_text())["results"]}
+    worse = 0
+    print(f"{'scenario':20s} {'ops/s base':>11s} {'new':>9s} {'Δ':>7s}   {'p95 base':>9s} {'new':>8s} {'Δ':>7s}")
+    for name, b in base.items():
+        n = new.get(name)
+        if n is None:
+            continue
+        d_ops = n["ops_per_s"] / b["ops_per_s"] - 1 if b["ops_per_s"] else 0.0
+        d_p95 = n["p95"] / b["p95"] - 1 if b["p95"] else 0.0
+        flag = d_ops < -tolerance or d_p95 > tolerance
+        worse += flag
+        print(f"{name:20s} {b['ops_per_s']:11.1f} {n['ops_per_s']:9.1f} {d_ops:+7.1%}   "
+              f"{b['p95']:9.3f} {n['p95']:8.3f} {d_p95:+7.1%}{'  <-- regression' if flag else ''}")
+    return 1 if worse else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline benchmark suite (JSON output).")
+    ap.add_argument("--n", type=int, default=500, help="operations per scenario")
+    ap.add_argument("--threads", type=int, default=8, help="callers for the concurrent scenarios")
+    ap.add_argument("--only", help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    ap.add_argument("--out", help="write the JSON here instead of stdout")
+    ap.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"))
+    ap.add_argument("--tolerance", type=float, default=0.10)
+    args = ap.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.tolerance))
+
+    report = run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        (START_DIR / args.out).write_text(text + "\n", encoding="utf-8")
+        for r in report["results"]:
+            print(f"{r['scenario']:20s} {r['ops_per_s']:9.1f} ops/s  p50={r['p50']}ms "
+                  f"p95={r['p95']}ms p99={r['p99']}ms  rss={r['rss_mb']}MB", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# tools/bench_ticket_template.py
+# Per-ticket CPU: python-escpos call chain (printer._write_ticket on a Dummy)
+# vs the precompiled template (ticket_template.render). Offline.
+#
+#   python tools/bench_ticket_template.py [tickets]
+
+import sys
+import bench_common
+from bench_common import Timer
+from escpos.printer import Dummy
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+INFO = {
+    "Kullancı Adı": "Ayşe Yılmaz", "Eposta": "ayse@example.com", "Görev": "Visitor",
+    "Kullancı No": "E00042", "Bölüm": "HR", "Aktif Okuma Sureci(Local)": "2025-01-01 10:00:00",
+    "Maksımum Okuma": 2,
+}
+
+
+def main():
+    from app import printer, qr_render, ticket_template
+
+    payloads = [f"BenimGiriş|bench-{i:06d}" for i in range(N)]
+    for p in payloads:                  # same starting point: matrices already encoded
+        qr_render.qr_matrix(p)
+
+    with Timer() as chain:
+        for p in payloads:
+            d = Dummy()
+            printer._write_ticket(d, p, INFO)
+            d.output
+
+    for mode in ("bitmap", "native"):
+        t = ticket_template.TicketTemplate(mode)
+        with Timer() as tpl:
+            for p in payloads:
+                t.render(p, INFO)
+        print(f"template ({mode:6s}): {tpl.elapsed / N * 1e6:9.1f} us/ticket")
+    print(f"escpos call chain : {chain.elapsed / N * 1e6:9.1f} us/ticket")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# tools/bench_verify.py
+# Latency of the /qr/verify decision path per VERIFY_MODE, offline (temp SQLite).
+# Calls verify_qr() directly from T turnstile threads so the numbers show the
+# decision + DB cost, not HTTP overhead. Mode "batch" sends BATCH scans per
+# verify_qr_batch() call (latency percentiles are then per batch).
+#
+#   python tools/bench_verify.py [scans] [threads] [modes...]
+#   python tools/bench_verify.py 5000 4 db atomic index batch
+
+import sys
+import bench_common
+from bench_common import Timer, make_app, percentiles
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+THREADS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+MODES = sys.argv[3:] or ["db", "atomic", "index", "batch"]
+BATCH = 20
+
+
+def run_mode(mode: str, client) -> dict:
+    import app.main as main
+    from app.config import settings
+    from app.db import SessionLocal
+
+    # fresh tokens for this mode; max_scans high enough that every scan is "allowed"
+    payloads = []
+    for _ in range(N // 10):
+        res = client.post("/qr/issue", data={"max_scans": 20, "minutes_valid": 60}).json()
+        payloads.append(res["payload"])
+
+    settings.VERIFY_MODE = "db" if mode == "batch" else mode
+    main._start_token_index()
+
+    def scan_batch(i):
+        batch = [payloads[(i * BATCH + k) % len(payloads)] for k in range(BATCH)]
+        with SessionLocal() as db:
+            t0 = time.perf_counter()
+            res = main.verify_qr_batch({"payloads": batch}, db)
+            dt = time.perf_counter() - t0
+        assert all(r["ok"] for r in res["results"]), res
+        return dt
+
+    def scan(i):
+        with SessionLocal() as db:
+            t0 = time.perf_counter()
+            res = main.verify_qr({"payload": payloads[i % len(payloads)]}, db)
+            dt = time.perf_counter() - t0
+        assert res["ok"], res
+        return dt
+
+    with Timer() as wall, ThreadPoolExecutor(THREADS) as pool:
+        if mode == "batch":
+            samples = list(pool.map(scan_batch, range(N // BATCH)))
+        else:
+            samples = list(pool.map(scan, range(N)))
+    main._stop_token_index()
+
+    return {"mode": mode, "scans": N, "threads": THREADS,
+            "scans_per_s": round(N / wall.elapsed, 1), **percentiles(samples)}
+
+
+def main():
+    from fastapi.testclient import TestClient
+    app = make_app()
+    with TestClient(app) as c:
+        for mode in MODES:
+            r = run_mode(mode, c)
+            print(f"{r['mode']:6s} {r['scans_per_s']:9.1f} scans/s  "
+                  f"p50={r['p50']}ms p95={r['p95']}ms p99={r['p99']}ms")
+
+
+if __name__ == "__main__":
+    main()
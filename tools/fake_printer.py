@@ -0,0 +1,124 @@
+# tools/fake_printer.py
+# Local stand-in for an ESC/POS network printer (raw TCP, port 9100 style).
+# Accepts any number of connections, swallows the bytes and counts tickets
+# by their cut command, so the print path can be tested without hardware.
+#
+#   python tools/fake_printer.py [port] [--delay-ms N]
+#
+# In-process use (tests / benchmarks):
+#   fp = FakePrinter().start(); ... fp.port, fp.tickets, fp.received ...; fp.stop()
+
+import socket
+import sys
+import threading
+import time
+
+CUT = b"\x1dV"        # GS V - every ticket ends with a cut
+
+
+class FakePrinter:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay_ms: int = 0):
+        self.host = host
+        self.delay_sec = delay_ms / 1000.0      # simulated print time per ticket
+        self._srv = socket.create_server((host, port))
+        self.port = self._srv.getsockname()[1]
+        self._lock = threading.Lock()
+        self._conns: list[socket.socket] = []
+        self._stopped = threading.Event()
+        self.received = bytearray()
+        self.tickets = 0
+        self.connections = 0
+
+    def start(self) -> "FakePrinter":
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._srv.close()
+        with self._lock:
+            for c in self._conns:
+                try:
+                    c.close()
+                except OSError:
+                    pass
+
+    def drop_connections(self):
+        """Simulate the printer closing idle sockets (power save, reboot...)."""
+        with self._lock:
+            for c in self._conns:
+                try:
+                    c.shutdown(socket.SHUT_RDWR)
+                    c.close()
+                except OSError:
+                    pass
+            self._conns.clear()
+
+    def wait_for(self, tickets: int, timeout: float = 10.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.tickets >= tickets:
+                return True
+            time.sleep(0.005)
+        return self.tickets >= tickets
+
+    @staticmethod
+    def wait_total(printers: list["FakePrinter"], tickets: int, timeout: float = 10.0) -> bool:
+        """Wait until several fake printers together have printed `tickets`."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if sum(fp.tickets for fp in printers) >= tickets:
+                return True
+            time.sleep(0.005)
+        return sum(fp.tickets for fp in printers) >= tickets
+
+    def _accept(self):
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self._srv.accept()
+            except OSError:
+                return
+            with self._lock:
+                self._conns.append(conn)
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket):
+        tail = b""
+        while True:
+            try:
+                chunk = conn.recv(65536)
+            except OSError:
+                break
+            if not chunk:
+                break
+            data = tail + chunk
+            cuts = data.count(CUT)
+            tail = data[-(len(CUT) - 1):]
+            if cuts and self.delay_sec:
+                time.sleep(self.delay_sec * cuts)
+            with self._lock:
+                self.received += chunk
+                self.tickets += cuts
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    delay = 0
+    if "--delay-ms" in args:
+        i = args.index("--delay-ms")
+        delay = int(args[i + 1])
+        del args[i:i + 2]
+    port = int(args[0]) if args else 9100
+    fp = FakePrinter("0.0.0.0", port, delay).start()
+    print(f"Fake ESC/POS printer on port {fp.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"tickets={fp.tickets} bytes={len(fp.received)} connections={fp.connections}")
+    except KeyboardInterrupt:
+        fp.stop()
@@ -41,10 +41,10 @@
         return;
       }
 
-      // Show QR image (add cache-buster so it always refreshes)
+      // Show QR image (immutable per token, so the browser may cache it)
       const token = data.token;
       const img = document.createElement('img');
-      img.src = apiBase + "/qr/png/" + token + "?t=" + Date.now();
+      img.src = apiBase + "/qr/png/" + encodeURIComponent(token);
       img.alt = 'QR Code';
       qrBox.innerHTML = '';
       qrBox.appendChild(img);